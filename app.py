@@ -1,17 +1,21 @@
-from flask import Flask, render_template, request, jsonify, send_file, session
+import time
+IMPORT_STARTED = time.perf_counter()
+
+from flask import Flask, render_template, request, jsonify, send_file, session, Response, stream_with_context, g
 from werkzeug.utils import secure_filename
 import os
 import json
-import uuid
-from pipeline import Pipeline
-from reportlab.lib.pagesizes import letter, A4
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.units import inch
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, PageBreak
-from reportlab.lib import colors
-from reportlab.lib.enums import TA_CENTER, TA_LEFT, TA_JUSTIFY
-import io
-from datetime import datetime
+from pipeline import Pipeline, PipelineCancelled
+import jobs
+from jobs import JobManager, QueueFullError
+import metrics
+import exports
+from store import SessionStore
+from uploads import UploadManager, UploadError, OffsetMismatch
+from result_index import ResultIndex
+import columnar
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
 app = Flask(__name__)
 app.config['SECRET_KEY'] = 'your-secret-key-here'
@@ -23,8 +27,113 @@ app.config['OUTPUT_FOLDER'] = 'outputs'
 for folder in [app.config['UPLOAD_FOLDER'], app.config['OUTPUT_FOLDER']]:
     os.makedirs(folder, exist_ok=True)
 
-# Initialize pipeline
-pipeline = Pipeline()
+# The pipeline is built by the first job (or warm_up()), so importing this module stays fast
+_pipeline = None
+_pipeline_lock = threading.Lock()
+
+def get_pipeline():
+    """Returns the shared Pipeline, building it on first use."""
+    global _pipeline
+    with _pipeline_lock:
+        if _pipeline is None:
+            start = time.perf_counter()
+            _pipeline = Pipeline()
+            metrics.record_startup('pipeline_init', time.perf_counter() - start)
+        return _pipeline
+
+def warm_up():
+    """Builds the pipeline and preloads PDF/image libraries, the tokenizer, Groq clients and
+    markdown workers. Runs at import with WARM_UP=1; can also be called from a server hook."""
+    start = time.perf_counter()
+    steps = get_pipeline().warm_up()
+    metrics.record_startup('warm_up', time.perf_counter() - start)
+    return steps
+
+def init_services():
+    """Opens the stores and starts the background threads the routes rely on.
+
+    Runs once when this module is imported by the app itself (python app.py or a WSGI
+    server), but not in the markdown worker processes: they are spawned, and spawn
+    re-imports the script that started them as __mp_main__.
+    """
+    global store, upload_manager, result_index, parquet_exporter, job_manager, report_executor
+
+    # Sessions, upload paths, file hashes, job state and results (SESSION_DB, SESSION_TTL_HOURS);
+    # expired sessions are deleted with their files every SESSION_SWEEP_SECONDS
+    store = SessionStore()
+    store.start_sweeper()
+
+    # Uploads are hashed as they stream in and stored once per distinct file (UPLOAD_CHUNK_BYTES)
+    upload_manager = UploadManager(store, app.config['UPLOAD_FOLDER'], app.config['MAX_CONTENT_LENGTH'])
+
+    # Cross-document index of entities, states, schemes and statistics, updated as results are saved
+    # (RESULT_INDEX_DB); documents are keyed by file hash, so reprocessing a file replaces its entry
+    result_index = ResultIndex()
+
+    # Optional Parquet datasets of statistics and table cells for analysts (PARQUET_EXPORT=1, needs pyarrow)
+    parquet_exporter = None
+    if os.getenv('PARQUET_EXPORT', '0') == '1':
+        if columnar.HAS_PYARROW:
+            parquet_exporter = columnar.ColumnarExporter()
+            parquet_exporter.start_flusher()
+        else:
+            print("Warning: PARQUET_EXPORT is set but pyarrow is not installed. Parquet export is off.")
+
+    # Background workers for /process (JOB_WORKERS, JOB_QUEUE_LIMIT, JOB_TTL_SECONDS)
+    job_manager = JobManager()
+
+    # PDF reports are rendered on their own thread as soon as a result is saved, so the job
+    # finishes without waiting for it and /download/pdf only has to send the file
+    report_executor = ThreadPoolExecutor(max_workers=int(os.getenv('REPORT_WORKERS', '1')),
+                                         thread_name_prefix='report')
+
+store = upload_manager = result_index = parquet_exporter = job_manager = report_executor = None
+report_futures = {}
+report_lock = threading.Lock()
+
+def artifact_path(session_id, suffix):
+    """Where a rendered download for a session is kept; registered so it is swept with the session."""
+    path = os.path.join(app.config['OUTPUT_FOLDER'], f"{session_id}_{suffix}")
+    store.add_file(session_id, path)
+    return path
+
+def render_report(session_id, pdf_file):
+    """Renders the PDF report for a saved result."""
+    result, _ = store.get_result(session_id)
+    if result is not None:
+        exports.render_pdf_report(result, pdf_file)
+
+def schedule_report(session_id, pdf_file):
+    """Queues background rendering of a session's PDF report."""
+    future = report_executor.submit(render_report, session_id, pdf_file)
+    with report_lock:
+        report_futures[session_id] = future
+    
+    def done(f):
+        if f.exception() is not None:
+            print(f"Report rendering failed for {session_id}: {f.exception()}")
+        with report_lock:
+            if report_futures.get(session_id) is f:
+                del report_futures[session_id]
+    future.add_done_callback(done)
+
+# Latency of the first request this process serves, including anything loaded lazily for it
+_first_request_lock = threading.Lock()
+_first_request_done = False
+
+@app.before_request
+def start_timer():
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def record_first_request(response):
+    global _first_request_done
+    if not _first_request_done and 'request_started' in g:
+        with _first_request_lock:
+            if not _first_request_done:
+                _first_request_done = True
+                metrics.record_startup('first_request', time.perf_counter() - g.request_started)
+    return response
 
 @app.route('/')
 def index():
@@ -40,23 +149,97 @@ def upload_file():
         return jsonify({'error': 'No file selected'}), 400
     
     if file and file.filename.endswith('.pdf'):
-        # Generate unique session ID
-        session_id = str(uuid.uuid4())
-        session['session_id'] = session_id
-        
-        # Save uploaded file
+        # Save uploaded file, hashing it on the way
         filename = secure_filename(file.filename)
-        filepath = os.path.join(app.config['UPLOAD_FOLDER'], f"{session_id}_{filename}")
-        file.save(filepath)
+        try:
+            uploaded = upload_manager.save_stream(file.stream, filename)
+        except UploadError as e:
+            return jsonify({'error': str(e)}), e.status
+        session['session_id'] = uploaded['session_id']
         
         return jsonify({
-            'session_id': session_id,
-            'filename': filename,
+            **uploaded,
             'message': 'File uploaded successfully'
         })
     
     return jsonify({'error': 'Invalid file type. Please upload a PDF file.'}), 400
 
+def upload_error(e):
+    body = {'error': str(e)}
+    if isinstance(e, OffsetMismatch):
+        body['offset'] = e.offset
+    return jsonify(body), e.status
+
+@app.route('/uploads', methods=['POST'])
+def begin_upload():
+    """Starts a chunked upload: {"filename": ..., "size": bytes}."""
+    data = request.json or {}
+    filename = secure_filename(data.get('filename') or '')
+    if not filename.endswith('.pdf'):
+        return jsonify({'error': 'Invalid file type. Please upload a PDF file.'}), 400
+    try:
+        return jsonify(upload_manager.begin(filename, int(data.get('size') or 0))), 201
+    except (TypeError, ValueError):
+        return jsonify({'error': 'Upload size must be a number of bytes'}), 400
+    except UploadError as e:
+        return upload_error(e)
+
+@app.route('/uploads/<upload_id>', methods=['GET'])
+def upload_status(upload_id):
+    """Bytes received so far, so an interrupted upload can resume from there."""
+    try:
+        return jsonify(upload_manager.status(upload_id))
+    except UploadError as e:
+        return upload_error(e)
+
+@app.route('/uploads/<upload_id>', methods=['PUT'])
+def upload_chunk(upload_id):
+    """Appends the raw request body at ?offset=<bytes>; the last chunk returns the session_id."""
+    try:
+        offset = int(request.args.get('offset', ''))
+    except ValueError:
+        return jsonify({'error': 'offset query parameter required'}), 400
+    try:
+        uploaded = upload_manager.write_chunk(upload_id, offset, request.stream)
+    except UploadError as e:
+        return upload_error(e)
+    if 'session_id' in uploaded:
+        session['session_id'] = uploaded['session_id']
+    return jsonify(uploaded)
+
+def run_processing(session_id, filepath, file_hash=None, use_cache=True, cancel_event=None, progress=None):
+    """Runs the pipeline for an uploaded file and stores the result for download."""
+    store.set_status(session_id, jobs.RUNNING)
+    try:
+        result = get_pipeline().run(filepath, save_json=False, use_cache=use_cache,
+                              cancel_event=cancel_event, progress=progress, file_hash=file_hash)
+    except PipelineCancelled:
+        store.set_status(session_id, jobs.CANCELLED)
+        raise
+    except Exception as e:
+        store.set_status(session_id, jobs.FAILED, str(e))
+        raise
+    
+    # Ensure result is a dictionary
+    if not isinstance(result, dict):
+        result = {'summary': 'Processing completed', 'raw_data': str(result)}
+    
+    # Save result for later download
+    store.save_result(session_id, result)
+    try:
+        record = store.get_session(session_id)
+        result_index.add(file_hash or session_id, result, session_id, record['filename'] if record else None)
+    except Exception as e:
+        print(f"Indexing failed for {session_id}: {e}")
+    if parquet_exporter is not None:
+        try:
+            parquet_exporter.add(file_hash or session_id, result, file_hash=file_hash, session_id=session_id,
+                                 source='web', source_path=record['filename'] if record else None)
+        except Exception as e:
+            print(f"Parquet export failed for {session_id}: {e}")
+    schedule_report(session_id, artifact_path(session_id, 'report.pdf'))
+    return result
+
 @app.route('/process', methods=['POST'])
 def process_file():
     data = request.json
@@ -66,37 +249,188 @@ def process_file():
         return jsonify({'error': 'Session ID required'}), 400
     
     # Find the uploaded file
-    upload_dir = app.config['UPLOAD_FOLDER']
-    files = [f for f in os.listdir(upload_dir) if f.startswith(session_id)]
-    
-    if not files:
+    record = store.get_session(session_id)
+    if record is None or not os.path.exists(record['upload_path']):
         return jsonify({'error': 'File not found'}), 404
     
-    filepath = os.path.join(upload_dir, files[0])
+    filepath = record['upload_path']
     
+    # Queue the work and return immediately; clients poll /jobs/<job_id>
+    store.start_job(session_id)
     try:
-        # Process the file
-        result = pipeline.run(filepath, save_json=False)
-        
-        # Ensure result is a dictionary
-        if not isinstance(result, dict):
-            result = {'summary': 'Processing completed', 'raw_data': str(result)}
-        
-        # Save result for later download
-        output_file = os.path.join(app.config['OUTPUT_FOLDER'], f"{session_id}_result.json")
-        with open(output_file, 'w', encoding='utf-8') as f:
-            json.dump(result, f, indent=4, ensure_ascii=False)
-        
+        job = job_manager.submit(
+            run_processing, session_id, filepath,
+            file_hash=record['file_hash'],
+            use_cache=not data.get('no_cache', False),
+            meta={'session_id': session_id},
+        )
+    except QueueFullError as e:
+        store.set_status(session_id, None)
+        return jsonify({'error': str(e)}), 503
+    store.attach_job(session_id, job.id)
+    
+    return jsonify({
+        'success': True,
+        'job_id': job.id,
+        'session_id': session_id,
+        'status': job.status
+    }), 202
+
+@app.route('/jobs', methods=['GET'])
+def jobs_stats():
+    return jsonify(job_manager.stats())
+
+def stored_job(job_id):
+    """Job state from the session store, for jobs this process no longer (or never) held."""
+    record = store.get_by_job(job_id)
+    if record is None:
+        return None
+    return {'job_id': job_id, 'status': record['status'], 'error': record['error'],
+            'session_id': record['id']}
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    job = job_manager.get(job_id)
+    if job is None:
+        stored = stored_job(job_id)
+        if stored is None:
+            return jsonify({'error': 'Job not found'}), 404
+        return jsonify(stored)
+    status = job.to_dict()
+    status['queue_position'] = job_manager.queue_position(job_id)
+    return jsonify(status)
+
+@app.route('/jobs/<job_id>/events', methods=['GET'])
+def job_events(job_id):
+    """Server-sent events stream of the job's stage progress."""
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    
+    # Resume after the last event the client saw
+    try:
+        start = int(request.headers.get('Last-Event-ID', -1)) + 1
+    except ValueError:
+        start = 0
+    
+    def stream():
+        index = start
+        while True:
+            events, finished = job.wait_events(index, timeout=15)
+            for data in events:
+                yield f"id: {index}\ndata: {data}\n\n"
+                index += 1
+            if finished and not events:
+                yield "event: end\ndata: {}\n\n"
+                return
+            if not events:
+                # Keep proxies from closing an idle connection
+                yield ": keep-alive\n\n"
+    
+    return Response(stream_with_context(stream()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@app.route('/jobs/<job_id>/result', methods=['GET'])
+def job_result(job_id):
+    job = job_manager.get(job_id)
+    if job is None:
+        stored = stored_job(job_id)
+        if stored is None:
+            return jsonify({'error': 'Job not found'}), 404
+        if stored['status'] == jobs.DONE:
+            result, _ = store.get_result(stored['session_id'])
+            return jsonify({'success': True, 'data': result, 'session_id': stored['session_id']})
+        if stored['status'] == jobs.FAILED:
+            return jsonify({'error': f"Processing failed: {stored['error']}"}), 500
+        if stored['status'] == jobs.CANCELLED:
+            return jsonify({'error': 'Job was cancelled'}), 410
+        return jsonify(stored), 202
+    if job.status == jobs.DONE:
         return jsonify({
             'success': True,
-            'data': result,
-            'session_id': session_id
+            'data': job.result,
+            'session_id': job.meta.get('session_id')
         })
-    except Exception as e:
-        import traceback
-        error_details = traceback.format_exc()
-        print(f"Error processing file: {error_details}")
-        return jsonify({'error': f'Processing failed: {str(e)}'}), 500
+    if job.status == jobs.FAILED:
+        return jsonify({'error': f'Processing failed: {job.error}'}), 500
+    if job.status == jobs.CANCELLED:
+        return jsonify({'error': 'Job was cancelled'}), 410
+    return jsonify(job.to_dict()), 202
+
+@app.route('/jobs/<job_id>/cancel', methods=['POST'])
+def job_cancel(job_id):
+    job = job_manager.cancel(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    if job.status == jobs.CANCELLED:
+        # Queued jobs are cancelled without ever running, so record it here
+        store.set_status(job.meta['session_id'], jobs.CANCELLED)
+    return jsonify(job.to_dict())
+
+@app.route('/cache/stats', methods=['GET'])
+def cache_stats():
+    return jsonify(get_pipeline().result_cache.stats())
+
+@app.route('/cache/clear', methods=['POST'])
+def cache_clear():
+    removed = get_pipeline().result_cache.invalidate()
+    return jsonify({'success': True, 'removed': removed})
+
+def limit_arg(default, maximum=500):
+    try:
+        return max(1, min(maximum, int(request.args.get('limit', default))))
+    except ValueError:
+        return default
+
+@app.route('/search', methods=['GET'])
+def search_documents():
+    """Documents matching every given filter: entity, state, scheme, metric, type."""
+    start = time.perf_counter()
+    documents = result_index.search(
+        entity=request.args.get('entity'),
+        state=request.args.get('state'),
+        scheme=request.args.get('scheme'),
+        metric=request.args.get('metric'),
+        document_type=request.args.get('type'),
+        limit=limit_arg(50),
+    )
+    return jsonify({'documents': documents, 'count': len(documents),
+                    'took_ms': round((time.perf_counter() - start) * 1000, 2)})
+
+@app.route('/search/statistics', methods=['GET'])
+def search_statistics():
+    """Values of one metric across documents, optionally for one state."""
+    metric = request.args.get('metric')
+    if not metric:
+        return jsonify({'error': 'metric required'}), 400
+    start = time.perf_counter()
+    values = result_index.statistic_values(metric, state=request.args.get('state'), limit=limit_arg(200, 5000))
+    return jsonify({'values': values, 'count': len(values),
+                    'took_ms': round((time.perf_counter() - start) * 1000, 2)})
+
+@app.route('/search/terms/<kind>', methods=['GET'])
+def search_terms(kind):
+    """Most common indexed entities, states, schemes, metric words or document types."""
+    try:
+        terms = result_index.top_terms(kind, prefix=request.args.get('prefix', ''), limit=limit_arg(50))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify({'terms': terms})
+
+@app.route('/search/stats', methods=['GET'])
+def search_stats():
+    return jsonify(result_index.stats())
+
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    """Prometheus scrape endpoint: pipeline, Groq and cache counters plus job queue gauges."""
+    stats = job_manager.stats()
+    gauges = {
+        'jobs_queued': ('Jobs waiting for a worker', '', stats['queue_depth']),
+        'jobs_running': ('Jobs currently running', '', stats['running']),
+        'job_workers': ('Configured job worker threads', '', stats['workers']),
+    }
+    return Response(metrics.REGISTRY.render(gauges), mimetype='text/plain; version=0.0.4')
 
 @app.route('/download/csv', methods=['GET'])
 def download_csv():
@@ -105,58 +439,23 @@ def download_csv():
         return jsonify({'error': 'Session ID required'}), 400
     
     # Load result
-    result_file = os.path.join(app.config['OUTPUT_FOLDER'], f"{session_id}_result.json")
-    if not os.path.exists(result_file):
+    record = store.get_session(session_id)
+    if record is None or record['result_at'] is None:
         return jsonify({'error': 'Result not found'}), 404
     
-    with open(result_file, 'r', encoding='utf-8') as f:
-        result = json.load(f)
-    
-    import pandas as pd
-    from io import StringIO
-    
-    # Create CSV content
-    output = StringIO()
-    
-    # Summary
-    output.write("=== SUMMARY ===\n")
-    output.write(f"{result.get('summary', 'N/A')}\n\n")
-    
-    # Entities
-    if 'named_entities' in result and result['named_entities']:
-        output.write("=== NAMED ENTITIES ===\n")
-        try:
-            df_entities = pd.DataFrame(result['named_entities'])
-            df_entities.to_csv(output, index=False)
-        except Exception:
-            # Fallback if DataFrame creation fails
-            for entity in result['named_entities']:
-                output.write(f"{entity.get('text', 'N/A')},{entity.get('label', 'N/A')}\n")
-        output.write("\n")
-    
-    # Tables
-    if 'tables' in result:
-        for i, table in enumerate(result['tables']):
-            output.write(f"=== {table.get('title', f'Table {i+1}')} ===\n")
-            if isinstance(table.get('data'), list) and len(table['data']) > 0:
-                df_table = pd.DataFrame(table['data'])
-                df_table.to_csv(output, index=False)
-            output.write("\n")
+    download_name = f'extracted_data_{session_id}.csv'
+    csv_file = artifact_path(session_id, 'result.csv')
+    # Repeat downloads are served from the file rendered the first time
+    if exports.is_fresh(csv_file, record['result_at']):
+        return send_file(csv_file, mimetype='text/csv', as_attachment=True, download_name=download_name)
     
-    # Statistics
-    if 'key_statistics' in result:
-        output.write("=== KEY STATISTICS ===\n")
-        df_stats = pd.DataFrame(result['key_statistics'])
-        df_stats.to_csv(output, index=False)
-        output.write("\n")
+    result, _ = store.get_result(session_id)
     
-    output.seek(0)
-    
-    return send_file(
-        io.BytesIO(output.getvalue().encode('utf-8')),
+    # Stream rows as they are rendered, saving them for next time
+    return Response(
+        stream_with_context(exports.tee_to_file(exports.iter_csv(result), csv_file)),
         mimetype='text/csv',
-        as_attachment=True,
-        download_name=f'extracted_data_{session_id}.csv'
+        headers={'Content-Disposition': f'attachment; filename={download_name}'}
     )
 
 @app.route('/download/pdf', methods=['GET'])
@@ -166,159 +465,37 @@ def download_pdf():
         return jsonify({'error': 'Session ID required'}), 400
     
     # Load result
-    result_file = os.path.join(app.config['OUTPUT_FOLDER'], f"{session_id}_result.json")
-    if not os.path.exists(result_file):
+    record = store.get_session(session_id)
+    if record is None or record['result_at'] is None:
         return jsonify({'error': 'Result not found'}), 404
     
-    with open(result_file, 'r', encoding='utf-8') as f:
-        result = json.load(f)
-    
-    # Create PDF
-    buffer = io.BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=A4, rightMargin=72, leftMargin=72,
-                           topMargin=72, bottomMargin=18)
-    
-    # Container for the 'Flowable' objects
-    elements = []
-    
-    # Define styles
-    styles = getSampleStyleSheet()
-    title_style = ParagraphStyle(
-        'CustomTitle',
-        parent=styles['Heading1'],
-        fontSize=24,
-        textColor=colors.HexColor('#1a237e'),
-        spaceAfter=30,
-        alignment=TA_CENTER
-    )
-    
-    heading_style = ParagraphStyle(
-        'CustomHeading',
-        parent=styles['Heading2'],
-        fontSize=16,
-        textColor=colors.HexColor('#283593'),
-        spaceAfter=12,
-        spaceBefore=12
-    )
-    
-    # Title
-    elements.append(Paragraph("Education Data Extraction Report", title_style))
-    elements.append(Spacer(1, 0.2*inch))
-    elements.append(Paragraph(f"Generated on: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}", 
-                             styles['Normal']))
-    elements.append(Spacer(1, 0.3*inch))
-    
-    # Summary
-    if result.get('summary'):
-        elements.append(Paragraph("Summary", heading_style))
-        elements.append(Paragraph(result['summary'], styles['Normal']))
-        elements.append(Spacer(1, 0.2*inch))
-    
-    # Document Type
-    if result.get('document_type'):
-        elements.append(Paragraph("Document Type", heading_style))
-        elements.append(Paragraph(result['document_type'], styles['Normal']))
-        elements.append(Spacer(1, 0.2*inch))
-    
-    # Key Statistics
-    if result.get('key_statistics'):
-        elements.append(Paragraph("Key Statistics", heading_style))
-        stats_data = [['Metric', 'Value', 'Context']]
-        for stat in result['key_statistics']:
-            stats_data.append([
-                stat.get('metric', 'N/A'),
-                stat.get('value', 'N/A'),
-                stat.get('context', 'N/A')
-            ])
-        stats_table = Table(stats_data, colWidths=[2*inch, 1.5*inch, 2.5*inch])
-        stats_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#3949ab')),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, 0), 12),
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-            ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-            ('GRID', (0, 0), (-1, -1), 1, colors.black)
-        ]))
-        elements.append(stats_table)
-        elements.append(Spacer(1, 0.2*inch))
-    
-    # Policies and Schemes
-    if result.get('policies_schemes'):
-        elements.append(Paragraph("Policies & Schemes", heading_style))
-        for policy in result['policies_schemes']:
-            elements.append(Paragraph(f"<b>{policy.get('name', 'N/A')}</b>", styles['Normal']))
-            elements.append(Paragraph(f"Description: {policy.get('description', 'N/A')}", styles['Normal']))
-            elements.append(Paragraph(f"Target: {policy.get('target_audience', 'N/A')}", styles['Normal']))
-            elements.append(Spacer(1, 0.1*inch))
-        elements.append(Spacer(1, 0.2*inch))
-    
-    # Named Entities
-    if result.get('named_entities'):
-        elements.append(Paragraph("Named Entities", heading_style))
-        entities_data = [['Entity', 'Type']]
-        for entity in result['named_entities'][:50]:  # Limit to first 50
-            entities_data.append([
-                entity.get('text', 'N/A'),
-                entity.get('label', 'N/A')
-            ])
-        entities_table = Table(entities_data, colWidths=[4*inch, 2*inch])
-        entities_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#3949ab')),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, 0), 12),
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-            ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-            ('GRID', (0, 0), (-1, -1), 1, colors.black)
-        ]))
-        elements.append(entities_table)
-        elements.append(Spacer(1, 0.2*inch))
-    
-    # Tables
-    if result.get('tables'):
-        elements.append(PageBreak())
-        elements.append(Paragraph("Extracted Tables", heading_style))
-        for table in result['tables']:
-            elements.append(Paragraph(f"<b>{table.get('title', 'Untitled Table')}</b>", styles['Heading3']))
-            if isinstance(table.get('data'), list) and len(table['data']) > 0:
-                # Convert table data to ReportLab table format
-                table_data = []
-                # Get headers from first row
-                if table['data']:
-                    headers = list(table['data'][0].keys())
-                    table_data.append(headers)
-                    for row in table['data']:
-                        table_data.append([str(row.get(h, '')) for h in headers])
-                    
-                    pdf_table = Table(table_data)
-                    pdf_table.setStyle(TableStyle([
-                        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#3949ab')),
-                        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-                        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-                        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                        ('FONTSIZE', (0, 0), (-1, 0), 10),
-                        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-                        ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-                        ('GRID', (0, 0), (-1, -1), 1, colors.black),
-                        ('FONTSIZE', (0, 1), (-1, -1), 9),
-                    ]))
-                    elements.append(pdf_table)
-            elements.append(Spacer(1, 0.3*inch))
-    
-    # Build PDF
-    doc.build(elements)
-    buffer.seek(0)
+    pdf_file = artifact_path(session_id, 'report.pdf')
+    # Normally rendered in the background when processing finished; wait if it is still going
+    with report_lock:
+        pending = report_futures.get(session_id)
+    if pending is not None:
+        try:
+            pending.result()
+        except Exception:
+            pass
+    if not exports.is_fresh(pdf_file, record['result_at']):
+        render_report(session_id, pdf_file)
     
     return send_file(
-        buffer,
+        pdf_file,
         mimetype='application/pdf',
         as_attachment=True,
         download_name=f'extracted_data_{session_id}.pdf'
     )
 
+if __name__ != '__mp_main__':
+    init_services()
+    metrics.record_startup('import', time.perf_counter() - IMPORT_STARTED)
+
+    # Pay the cold-start cost before this process takes traffic rather than on the first job
+    if os.getenv('WARM_UP', '0') == '1':
+        warm_up()
+
 if __name__ == '__main__':
     app.run(debug=True, host='0.0.0.0', port=5000)
 
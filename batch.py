@@ -0,0 +1,248 @@
+import os
+import sys
+import glob
+import json
+import time
+import hashlib
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import List, Dict, Optional, Tuple
+
+from cache import file_sha256
+
+MANIFEST_NAME = "manifest.jsonl"
+RESULTS_NAME = "results.jsonl"
+
+# One pipeline per worker process, built once by the pool initializer
+_worker_pipeline = None
+
+
+def _init_worker(pipeline_kwargs: Dict):
+    global _worker_pipeline
+    from pipeline import Pipeline
+    _worker_pipeline = Pipeline(**pipeline_kwargs)
+
+
+def _process_one(file_path: str,
+                 use_cache: bool) -> Tuple[str, Optional[dict], Optional[str], float, Optional[str]]:
+    """Runs the pipeline on one file inside a worker. Returns (path, result, error, seconds, file_hash)."""
+    start = time.time()
+    file_hash = None
+    try:
+        # Hashed here rather than inside the pipeline so the parent gets the hash back
+        file_hash = file_sha256(file_path)
+        result = _worker_pipeline.run(file_path, save_json=False, use_cache=use_cache, file_hash=file_hash)
+        return file_path, result, None, time.time() - start, file_hash
+    except Exception as e:
+        return file_path, None, f"{type(e).__name__}: {e}", time.time() - start, file_hash
+
+
+def collect_files(source: str) -> List[str]:
+    """Expands a directory (recursively) or glob pattern into a sorted list of PDFs."""
+    if os.path.isdir(source):
+        pattern = os.path.join(source, "**", "*.pdf")
+    else:
+        pattern = source
+    files = [f for f in glob.glob(pattern, recursive=True)
+             if os.path.isfile(f) and f.lower().endswith(".pdf")]
+    return sorted(os.path.abspath(f) for f in files)
+
+
+def file_signature(file_path: str) -> str:
+    """Identifies a file version by path, size and mtime, so edited files are reprocessed."""
+    stat = os.stat(file_path)
+    return f"{file_path}:{stat.st_size}:{stat.st_mtime_ns}"
+
+
+def load_manifest(manifest_path: str) -> Dict[str, Dict]:
+    """Reads the manifest, returning the latest entry per file signature."""
+    entries = {}
+    if not os.path.exists(manifest_path):
+        return entries
+    with open(manifest_path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                # A crash can leave a truncated last line
+                continue
+            entries[entry["signature"]] = entry
+    return entries
+
+
+def _append_line(path: str, record: Dict):
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def _output_name(file_path: str) -> str:
+    # Suffix with a path hash so same-named files from different folders don't collide
+    stem = os.path.splitext(os.path.basename(file_path))[0]
+    return f"{stem}_{hashlib.sha1(file_path.encode('utf-8')).hexdigest()[:8]}.json"
+
+
+def run_batch(source: str, output_dir: str, workers: Optional[int] = None,
+              output_format: str = "jsonl", use_cache: bool = True,
+              retry_failed: bool = True, pipeline_kwargs: Optional[Dict] = None,
+              parquet_dir: Optional[str] = None) -> Dict:
+    """Processes every PDF under source across a process pool.
+
+    Results go to output_dir as results.jsonl or one JSON file per document.
+    manifest.jsonl records each finished file, so rerunning the same command
+    after a crash skips everything already done. With parquet_dir, statistics
+    and tables are also appended to partitioned Parquet datasets there.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    manifest_path = os.path.join(output_dir, MANIFEST_NAME)
+    results_path = os.path.join(output_dir, RESULTS_NAME)
+    manifest = load_manifest(manifest_path)
+
+    files = collect_files(source)
+    todo = []
+    for file_path in files:
+        entry = manifest.get(file_signature(file_path))
+        if entry and (entry["status"] == "done" or not retry_failed):
+            continue
+        todo.append(file_path)
+
+    print(f"Batch: {len(files)} files found, {len(files) - len(todo)} already done, {len(todo)} to process")
+    workers = workers or int(os.getenv("BATCH_WORKERS", str(os.cpu_count() or 2)))
+    summary = {"files": len(files), "skipped": len(files) - len(todo), "processed": 0,
+               "failed": 0, "failures": [], "unexported": [], "slowest": [], "seconds": 0.0, "docs_per_min": 0.0}
+    if not todo:
+        return summary
+
+    exporter = None
+    if parquet_dir:
+        from columnar import ColumnarExporter
+        exporter = ColumnarExporter(parquet_dir)
+
+    timings = []
+    # Manifest entries of files whose Parquet rows are still buffered; they are only
+    # written once those rows are on disk, so a crash leaves the files to be redone
+    unexported = []
+    start = time.time()
+    try:
+        with ProcessPoolExecutor(max_workers=min(workers, len(todo)), initializer=_init_worker,
+                                 initargs=(pipeline_kwargs or {},)) as executor:
+            futures = [executor.submit(_process_one, file_path, use_cache) for file_path in todo]
+            for done_count, future in enumerate(as_completed(futures), start=1):
+                file_path, result, error, seconds, file_hash = future.result()
+                output = None
+                if error is None:
+                    if output_format == "json":
+                        output = os.path.join(output_dir, _output_name(file_path))
+                        with open(output, "w", encoding="utf-8") as f:
+                            json.dump(result, f, indent=4, ensure_ascii=False)
+                    else:
+                        output = results_path
+                        # file_hash is the doc_id web results are indexed under, so both line up
+                        _append_line(results_path, {"file": file_path, "file_hash": file_hash, "result": result})
+                    summary["processed"] += 1
+                else:
+                    summary["failed"] += 1
+                    summary["failures"].append({"file": file_path, "error": error})
+
+                # Manifest is written last, so a file only counts as done once its output exists
+                entry = {
+                    "signature": file_signature(file_path),
+                    "file": file_path,
+                    "status": "done" if error is None else "failed",
+                    "error": error,
+                    "seconds": round(seconds, 3),
+                    "output": output,
+                    "finished_at": time.time(),
+                }
+                if exporter is not None and error is None:
+                    buffered = exporter.pending_docs
+                    try:
+                        exporter.add(file_hash, result, file_hash=file_hash, source="batch", source_path=file_path)
+                        unexported.append(entry)
+                    except Exception as e:
+                        print(f"Parquet export failed for {os.path.basename(file_path)}: {e}")
+                        # A failed write leaves the rows buffered for the next flush; if they were never
+                        # buffered, the file stays out of the manifest and is redone next run
+                        if exporter.pending_docs > buffered:
+                            unexported.append(entry)
+                        else:
+                            summary["unexported"].append(file_path)
+                    if not exporter.pending_docs:
+                        for pending in unexported:
+                            _append_line(manifest_path, pending)
+                        unexported = []
+                else:
+                    _append_line(manifest_path, entry)
+                timings.append((seconds, file_path))
+                status = "ok" if error is None else f"FAILED ({error})"
+                print(f"[{done_count}/{len(todo)}] {os.path.basename(file_path)} {seconds:.1f}s {status}")
+    finally:
+        if exporter is not None:
+            try:
+                exporter.close()
+            except Exception as e:
+                print(f"Parquet export failed: {e}")
+            if exporter.pending_docs:
+                summary["unexported"].extend(pending["file"] for pending in unexported)
+            else:
+                for pending in unexported:
+                    _append_line(manifest_path, pending)
+
+    elapsed = time.time() - start
+    summary["seconds"] = round(elapsed, 3)
+    summary["docs_per_min"] = round(len(todo) / elapsed * 60, 2) if elapsed else 0.0
+    summary["slowest"] = [{"file": f, "seconds": round(s, 3)} for s, f in sorted(timings, reverse=True)[:5]]
+    return summary
+
+
+def print_summary(summary: Dict):
+    print("--- Batch Summary ---")
+    print(f"Processed: {summary['processed']}  Failed: {summary['failed']}  "
+          f"Skipped (already done): {summary['skipped']}")
+    print(f"Elapsed: {summary['seconds']:.1f}s  Throughput: {summary['docs_per_min']} docs/min")
+    if summary["slowest"]:
+        print("Slowest files:")
+        for item in summary["slowest"]:
+            print(f"  {item['seconds']:.1f}s  {item['file']}")
+    if summary["failures"]:
+        print("Failures:")
+        for item in summary["failures"]:
+            print(f"  {item['file']}: {item['error']}")
+    if summary["unexported"]:
+        print("Not exported to Parquet (rerun to redo):")
+        for file_path in summary["unexported"]:
+            print(f"  {file_path}")
+
+
+def main(argv: Optional[List[str]] = None):
+    import argparse
+    parser = argparse.ArgumentParser(description="Batch AI Data Extraction over a directory of PDFs")
+    parser.add_argument("source", help="Directory (searched recursively) or glob pattern of PDFs")
+    parser.add_argument("-o", "--output-dir", default="batch_output", help="Where results and the manifest go")
+    parser.add_argument("-w", "--workers", type=int, default=None,
+                        help="Worker processes (default: $BATCH_WORKERS or CPU count)")
+    parser.add_argument("--format", choices=["jsonl", "json"], default="jsonl",
+                        help="One results.jsonl, or one JSON file per document")
+    parser.add_argument("--no-cache", action="store_true", help="Ignore cached results")
+    parser.add_argument("--skip-failed", action="store_true",
+                        help="Do not retry files that failed in a previous run")
+    parser.add_argument("--vision-workers", type=int, default=None,
+                        help="Concurrent vision calls inside each worker")
+    parser.add_argument("--parquet", metavar="DIR", default=None,
+                        help="Also append statistics and tables to partitioned Parquet datasets in DIR "
+                             "(needs pyarrow)")
+    args = parser.parse_args(argv)
+
+    summary = run_batch(
+        args.source, args.output_dir, workers=args.workers, output_format=args.format,
+        use_cache=not args.no_cache, retry_failed=not args.skip_failed,
+        # Documents already run in parallel across processes, so convert each one in-process
+        pipeline_kwargs={"vision_workers": args.vision_workers, "ingest_workers": 1},
+        parquet_dir=args.parquet,
+    )
+    print_summary(summary)
+    return 1 if summary["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,512 @@
+"""Offline benchmark for the extraction pipeline.
+
+Generates synthetic education-report PDFs, serves canned Groq responses
+from a local stand-in with configurable latency, and measures the
+single-file, batch and Flask /process paths without network access:
+
+    python benchmark.py --docs 8 --pages 30 --tables 6 --images 6 --latency-ms 400
+
+Each path runs in its own subprocess so peak RSS is reported per path.
+Use --json to keep the report and --max-p95 to fail CI on a regression.
+"""
+import os
+import sys
+import math
+import json
+import time
+import random
+import shutil
+import argparse
+import tempfile
+import threading
+import subprocess
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+
+try:
+    import resource
+    HAS_RESOURCE = True
+except ImportError:
+    # Not available on Windows; peak RSS is then omitted
+    HAS_RESOURCE = False
+
+PATHS = ("single", "batch", "flask")
+
+STATES = ["Bihar", "Kerala", "Uttar Pradesh", "Maharashtra", "Tamil Nadu", "Rajasthan", "Odisha", "Assam"]
+METRICS = ["Gross Enrolment Ratio", "Dropout Rate", "Pupil Teacher Ratio", "Transition Rate", "Literacy Rate"]
+SCHEMES = ["Samagra Shiksha", "PM POSHAN", "NIPUN Bharat", "PM SHRI"]
+
+STRUCTURE_RESPONSE = {
+    "summary": "Synthetic annual report on school education indicators across Indian states.",
+    "document_type": "Statistical Report",
+    "education_levels": ["Primary", "Upper Primary", "Secondary"],
+    "states_mentioned": STATES[:4],
+    "organizations": ["Ministry of Education", "NCERT"],
+    "key_statistics": [{"metric": "Gross Enrolment Ratio", "value": "97.2%", "context": "Primary, 2022-23"}],
+    "policies_schemes": [{"name": "Samagra Shiksha", "description": "Integrated scheme for school education",
+                          "target_audience": "Students from pre-school to class 12"}],
+    "tables": [{"title": "Enrolment by state", "data": [{"State": "Bihar", "GER": "92.1"}]}],
+    "key_dates": ["2023-24"],
+    "budget_financials": {"total_budget": "37,383 crore", "currency": "INR", "breakdown": ""},
+}
+NER_RESPONSE = {"entities": [
+    {"text": "Ministry of Education", "label": "ORGANIZATION"},
+    {"text": "Gross Enrolment Ratio", "label": "EDUCATION_TERM"},
+    {"text": "Rakesh Sharma", "label": "PERSON"},
+]}
+VISION_RESPONSE = "Bar chart of enrolment by state. Bihar 92.1, Kerala 99.4, Odisha 95.0, Assam 93.7."
+
+
+# --- Synthetic documents -------------------------------------------------------
+
+def chart_pixmap(width: int, height: int, seed: int):
+    """A bar chart on a lightly grained background, so it is kept by image triage and never deduplicated."""
+    import fitz
+    rng = random.Random(seed)
+    samples = bytearray(rng.randrange(238, 256) for _ in range(width * height * 3))
+    bars = rng.randint(4, 8)
+    bar_width = width // (bars * 2)
+    for b in range(bars):
+        colour = (rng.randrange(0, 160), rng.randrange(0, 160), rng.randrange(60, 220))
+        top = height - rng.randint(height // 5, height - 10)
+        left = bar_width // 2 + b * bar_width * 2
+        for y in range(top, height - 5):
+            row = (y * width + left) * 3
+            samples[row:row + bar_width * 3] = bytes(colour) * bar_width
+    return fitz.Pixmap(fitz.csRGB, width, height, bytes(samples), False)
+
+
+def _draw_table(page, top: float, rows: int, rng: random.Random, number: int) -> float:
+    """Draws a ruled table of state statistics and returns the y coordinate below it."""
+    import fitz
+    columns = ["State", "GER (%)", "Dropout (%)", "PTR", "Schools"]
+    left, col_width, row_height = 50, 100, 16
+    page.insert_text((left, top), f"Table {number}: Indicators by state, 2022-23", fontsize=10)
+    top += 6
+    for r in range(rows + 1):
+        y = top + r * row_height
+        cells = columns if r == 0 else [
+            rng.choice(STATES), f"{rng.uniform(70, 105):.1f}", f"{rng.uniform(0, 15):.1f}",
+            str(rng.randint(15, 45)), f"{rng.randint(1000, 90000):,}"]
+        for c, text in enumerate(cells):
+            page.insert_text((left + c * col_width + 3, y + 12), text, fontsize=8)
+    bottom = top + (rows + 1) * row_height
+    for r in range(rows + 2):
+        y = top + r * row_height
+        page.draw_line(fitz.Point(left, y), fitz.Point(left + col_width * len(columns), y))
+    for c in range(len(columns) + 1):
+        x = left + c * col_width
+        page.draw_line(fitz.Point(x, top), fitz.Point(x, bottom))
+    return bottom + 20
+
+
+def make_report_pdf(path: str, pages: int, tables: int, images: int, seed: int = 0):
+    """Writes a synthetic education report with running headers, prose, ruled tables and charts."""
+    import fitz
+    rng = random.Random(seed)
+    doc = fitz.open()
+    for p in range(pages):
+        page = doc.new_page(width=595, height=842)
+        page.insert_text((50, 30), "Unified District Information System for Education Plus | Report 2022-23",
+                         fontsize=8)
+        page.insert_text((50, 70), f"{p + 1}. Indicators for {rng.choice(STATES)}", fontsize=14)
+        y = 95
+        for _ in range(3):
+            state, metric, scheme = rng.choice(STATES), rng.choice(METRICS), rng.choice(SCHEMES)
+            text = (f"In {state}, the {metric} stood at {rng.uniform(5, 100):.1f} per cent in 2022-23, "
+                    f"compared with {rng.uniform(5, 100):.1f} per cent the previous year. Under {scheme}, "
+                    f"{rng.randint(100, 5000)} schools received support through the Ministry of Education.")
+            rect = fitz.Rect(50, y, 545, y + 60)
+            page.insert_textbox(rect, text, fontsize=9)
+            y += 62
+        for t in range(p, tables, pages):
+            y = _draw_table(page, y + 10, rng.randint(6, 12), rng, t + 1)
+        for i in range(p, images, pages):
+            if y > 600:
+                break
+            page.insert_image(fitz.Rect(50, y, 350, y + 180), pixmap=chart_pixmap(400, 240, seed * 1000 + i))
+            y += 190
+        page.insert_text((280, 820), f"Page {p + 1} of {pages}", fontsize=8)
+    doc.save(path)
+    doc.close()
+
+
+# --- Local Groq stand-in -------------------------------------------------------
+
+class _FakeGroqHandler(BaseHTTPRequestHandler):
+    server_version = "FakeGroq/1.0"
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        server = self.server
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        with server.lock:
+            server.requests += 1
+            delay = max(0.0, server.rng.gauss(server.latency, server.jitter))
+            fail = server.rng.random() < server.error_rate
+        time.sleep(delay)
+        if fail:
+            self._reply(429, {"error": {"message": "Rate limit reached (benchmark)", "type": "tokens"}},
+                        {"retry-after": "0"})
+            return
+
+        content = body["messages"][0]["content"]
+        if isinstance(content, list):
+            answer = VISION_RESPONSE
+            prompt_tokens = 1000
+        else:
+            answer = json.dumps(NER_RESPONSE if "named entities" in content else STRUCTURE_RESPONSE)
+            prompt_tokens = len(content) // 4
+        completion_tokens = len(answer) // 4
+        self._reply(200, {
+            "id": f"chatcmpl-bench-{server.requests}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", ""),
+            "choices": [{"index": 0, "finish_reason": "stop",
+                         "message": {"role": "assistant", "content": answer}}],
+            "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                      "total_tokens": prompt_tokens + completion_tokens},
+        })
+
+    def _reply(self, status: int, payload: Dict, headers: Optional[Dict] = None):
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+
+class FakeGroqServer:
+    """Serves OpenAI-style chat completions on localhost with a configurable delay.
+
+    Point the pipeline at it with GROQ_BASE_URL=server.url; error_rate is the
+    share of requests answered with 429 to exercise retries.
+    """
+
+    def __init__(self, latency_ms: float = 300, jitter_ms: float = 0, error_rate: float = 0.0, seed: int = 0):
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), _FakeGroqHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.latency = latency_ms / 1000.0
+        self.httpd.jitter = jitter_ms / 1000.0
+        self.httpd.error_rate = error_rate
+        self.httpd.rng = random.Random(seed)
+        self.httpd.lock = threading.Lock()
+        self.httpd.requests = 0
+        self.url = f"http://127.0.0.1:{self.httpd.server_address[1]}"
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def requests(self) -> int:
+        return self.httpd.requests
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+# --- Measurement ---------------------------------------------------------------
+
+def percentiles(values: List[float]) -> Dict[str, Optional[float]]:
+    """Nearest-rank p50/p90/p95/p99 plus mean and max."""
+    if not values:
+        return {"count": 0, "mean": None, "p50": None, "p90": None, "p95": None, "p99": None, "max": None}
+    ordered = sorted(values)
+
+    def rank(q):
+        return ordered[max(0, math.ceil(q * len(ordered)) - 1)]
+
+    return {
+        "count": len(ordered),
+        "mean": round(sum(ordered) / len(ordered), 3),
+        "p50": round(rank(0.50), 3),
+        "p90": round(rank(0.90), 3),
+        "p95": round(rank(0.95), 3),
+        "p99": round(rank(0.99), 3),
+        "max": round(ordered[-1], 3),
+    }
+
+
+def peak_rss_mb() -> Optional[float]:
+    """Peak resident set size of this process and its finished children, in MB."""
+    if not HAS_RESOURCE:
+        return None
+    scale = 1024 * 1024 if sys.platform == "darwin" else 1024
+    usage = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+                resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    return round(usage * 1024 / scale / 1024, 1)
+
+
+def summarize(path: str, latencies: List[float], results: List[Dict], elapsed: float,
+              pages: int, failures: int) -> Dict:
+    stages: Dict[str, List[float]] = {}
+    tokens = {"prompt": 0, "completion": 0}
+    retries = 0
+    for result in results:
+        timings = (result or {}).get("_timings", {})
+        for timing in timings.get("stages", []):
+            stages.setdefault(timing["stage"], []).append(timing["seconds"])
+        tokens["prompt"] += timings.get("tokens", {}).get("prompt", 0)
+        tokens["completion"] += timings.get("tokens", {}).get("completion", 0)
+        retries += timings.get("retries", 0)
+    docs = len(latencies)
+    return {
+        "path": path,
+        "docs": docs,
+        "failed": failures,
+        "elapsed_seconds": round(elapsed, 3),
+        "docs_per_min": round(docs / elapsed * 60, 2) if elapsed else 0.0,
+        "pages_per_sec": round(pages / elapsed, 2) if elapsed else 0.0,
+        "latency": percentiles(latencies),
+        "stages": {stage: percentiles(values) for stage, values in sorted(stages.items())},
+        "tokens": tokens,
+        "retries": retries,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+def _page_count(files: List[str]) -> int:
+    import fitz
+    total = 0
+    for file_path in files:
+        with fitz.open(file_path) as doc:
+            total += doc.page_count
+    return total
+
+
+def bench_single(files: List[str]) -> Dict:
+    t0 = time.perf_counter()
+    from pipeline import Pipeline
+    startup = {"import_seconds": time.perf_counter() - t0}
+    t0 = time.perf_counter()
+    pipeline = Pipeline()
+    startup["init_seconds"] = time.perf_counter() - t0
+    latencies, results, failures = [], [], 0
+    start = time.time()
+    for file_path in files:
+        t0 = time.time()
+        try:
+            results.append(pipeline.run(file_path, save_json=False, use_cache=False))
+            latencies.append(time.time() - t0)
+        except Exception as e:
+            print(f"single: {os.path.basename(file_path)} failed: {e}")
+            failures += 1
+        if "first_run_seconds" not in startup:
+            startup["first_run_seconds"] = time.time() - t0
+    summary = summarize("single", latencies, results, time.time() - start, _page_count(files), failures)
+    summary["startup"] = {name: round(value, 3) for name, value in startup.items()}
+    return summary
+
+
+def bench_batch(files: List[str], workdir: str, workers: Optional[int]) -> Dict:
+    import batch
+    source = os.path.dirname(files[0])
+    output_dir = os.path.join(workdir, "batch_output")
+    shutil.rmtree(output_dir, ignore_errors=True)
+    start = time.time()
+    summary = batch.run_batch(source, output_dir, workers=workers, use_cache=False,
+                              pipeline_kwargs={"ingest_workers": 1})
+    elapsed = time.time() - start
+    manifest = batch.load_manifest(os.path.join(output_dir, batch.MANIFEST_NAME))
+    latencies = [entry["seconds"] for entry in manifest.values() if entry["status"] == "done"]
+    results = []
+    with open(os.path.join(output_dir, batch.RESULTS_NAME), "r", encoding="utf-8") as f:
+        for line in f:
+            results.append(json.loads(line)["result"])
+    return summarize("batch", latencies, results, elapsed, _page_count(files), summary["failed"])
+
+
+def bench_flask(files: List[str], workdir: str) -> Dict:
+    # app.py creates uploads/ and outputs/ relative to the working directory
+    os.chdir(workdir)
+    t0 = time.perf_counter()
+    from app import app
+    startup = {"import_seconds": time.perf_counter() - t0}
+    client = app.test_client()
+    submitted = {}
+    start = time.time()
+    for file_path in files:
+        t0 = time.perf_counter()
+        with open(file_path, "rb") as f:
+            upload = client.post("/upload", data={"file": (f, os.path.basename(file_path))},
+                                 content_type="multipart/form-data").get_json()
+        startup.setdefault("first_request_seconds", time.perf_counter() - t0)
+        response = client.post("/process", json={"session_id": upload["session_id"], "no_cache": True})
+        submitted[response.get_json()["job_id"]] = time.time()
+
+    latencies, results, failures = [], [], 0
+    pending = dict(submitted)
+    while pending:
+        for job_id, t0 in list(pending.items()):
+            status = client.get(f"/jobs/{job_id}").get_json()["status"]
+            if status in ("done", "failed", "cancelled"):
+                del pending[job_id]
+                if status == "done":
+                    latencies.append(time.time() - t0)
+                    startup.setdefault("first_job_seconds", time.time() - t0)
+                    results.append(client.get(f"/jobs/{job_id}/result").get_json()["data"])
+                else:
+                    failures += 1
+        time.sleep(0.05)
+    summary = summarize("flask", latencies, results, time.time() - start, _page_count(files), failures)
+    summary["startup"] = {name: round(value, 3) for name, value in startup.items()}
+    return summary
+
+
+def _run_path(path: str, config: Dict) -> Dict:
+    files = config["files"]
+    if path == "single":
+        return bench_single(files)
+    if path == "batch":
+        return bench_batch(files, config["workdir"], config.get("batch_workers"))
+    return bench_flask(files, config["workdir"])
+
+
+# --- Orchestration -------------------------------------------------------------
+
+def benchmark_env(server_url: str, workdir: str, with_cache: bool) -> Dict[str, str]:
+    """Environment for the measured subprocesses: local Groq, no rate limits, isolated caches."""
+    env = dict(os.environ)
+    env.update({
+        "GROQ_API_KEY": "benchmark",
+        "GROQ_BASE_URL": server_url,
+        "GROQ_RPM": "0",
+        "GROQ_TPM": "0",
+        "GROQ_BACKOFF_BASE": "0.05",
+        "GROQ_BACKOFF_MAX": "0.5",
+    })
+    for name in ("RESULT", "VISION", "PAGE", "CHUNK"):
+        env[f"{name}_CACHE_DIR"] = os.path.join(workdir, ".cache", name.lower())
+        env[f"{name}_CACHE"] = "1" if with_cache else "0"
+    return env
+
+
+def print_report(report: Dict):
+    print("\n=== Benchmark ===")
+    print(f"{report['docs']} docs x {report['pages']} pages, {report['tables']} tables, "
+          f"{report['images']} images; Groq latency {report['latency_ms']}±{report['jitter_ms']} ms, "
+          f"error rate {report['error_rate']}; {report['groq_requests']} Groq requests served")
+    for result in report["paths"]:
+        if "error" in result:
+            print(f"\n[{result['path']}] FAILED: {result['error']}")
+            continue
+        latency = result["latency"]
+        print(f"\n[{result['path']}] {result['docs']} docs ({result['failed']} failed) in "
+              f"{result['elapsed_seconds']:.1f}s: {result['docs_per_min']} docs/min, "
+              f"{result['pages_per_sec']} pages/s, peak RSS {result['peak_rss_mb']} MB")
+        if result.get("startup"):
+            print("  startup     " + "  ".join(f"{name.replace('_seconds', '')} {value}s"
+                                               for name, value in result["startup"].items()))
+        print(f"  end-to-end  p50 {latency['p50']}s  p95 {latency['p95']}s  p99 {latency['p99']}s  "
+              f"max {latency['max']}s")
+        for stage, stats in result["stages"].items():
+            print(f"  {stage:<11} p50 {stats['p50']}s  p95 {stats['p95']}s  max {stats['max']}s")
+        print(f"  tokens: {result['tokens']['prompt']} prompt / {result['tokens']['completion']} completion, "
+              f"{result['retries']} retries")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Offline pipeline benchmark with a local Groq stand-in")
+    parser.add_argument("--docs", type=int, default=5, help="Synthetic documents per path")
+    parser.add_argument("--pages", type=int, default=20, help="Pages per document")
+    parser.add_argument("--tables", type=int, default=4, help="Ruled tables per document")
+    parser.add_argument("--images", type=int, default=4,
+                        help="Chart images per document (placed while they fit on their page)")
+    parser.add_argument("--latency-ms", type=float, default=300, help="Mean simulated Groq latency")
+    parser.add_argument("--jitter-ms", type=float, default=50, help="Standard deviation of the latency")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of Groq requests answered with 429")
+    parser.add_argument("--paths", default=",".join(PATHS), help="Comma-separated subset of single,batch,flask")
+    parser.add_argument("--batch-workers", type=int, default=None, help="Worker processes for the batch path")
+    parser.add_argument("--with-cache", action="store_true", help="Leave the result/vision/page/chunk caches on")
+    parser.add_argument("--workdir", default=None, help="Where PDFs and outputs go (default: a temp dir)")
+    parser.add_argument("--keep-workdir", action="store_true", help="Do not delete the work directory")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--quiet", action="store_true", help="Hide pipeline output from the measured runs")
+    parser.add_argument("--json", dest="json_out", default=None, help="Also write the report here")
+    parser.add_argument("--max-p95", type=float, default=None,
+                        help="Exit non-zero if any path's end-to-end p95 exceeds this many seconds")
+    parser.add_argument("--run-path", choices=PATHS, help=argparse.SUPPRESS)
+    parser.add_argument("--config", help=argparse.SUPPRESS)
+    parser.add_argument("--report", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.run_path:
+        # Child mode: measure one path and write its summary for the parent
+        with open(args.config, "r", encoding="utf-8") as f:
+            config = json.load(f)
+        summary = _run_path(args.run_path, config)
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump(summary, f)
+        return 0
+
+    paths = [p.strip() for p in args.paths.split(",") if p.strip()]
+    unknown = [p for p in paths if p not in PATHS]
+    if unknown:
+        parser.error(f"unknown paths: {unknown}")
+
+    workdir = os.path.abspath(args.workdir or tempfile.mkdtemp(prefix="pipeline-bench-"))
+    docs_dir = os.path.join(workdir, "docs")
+    os.makedirs(docs_dir, exist_ok=True)
+    print(f"Generating {args.docs} synthetic PDFs in {docs_dir}...")
+    files = []
+    for i in range(args.docs):
+        file_path = os.path.join(docs_dir, f"report_{i:03d}.pdf")
+        make_report_pdf(file_path, args.pages, args.tables, args.images, seed=args.seed + i)
+        files.append(file_path)
+    config_path = os.path.join(workdir, "config.json")
+    with open(config_path, "w", encoding="utf-8") as f:
+        json.dump({"files": files, "workdir": workdir, "batch_workers": args.batch_workers}, f)
+
+    report = {
+        "docs": args.docs, "pages": args.pages, "tables": args.tables, "images": args.images,
+        "latency_ms": args.latency_ms, "jitter_ms": args.jitter_ms, "error_rate": args.error_rate,
+        "paths": [],
+    }
+    here = os.path.dirname(os.path.abspath(__file__))
+    try:
+        with FakeGroqServer(args.latency_ms, args.jitter_ms, args.error_rate, args.seed) as server:
+            env = benchmark_env(server.url, workdir, args.with_cache)
+            env["PYTHONPATH"] = here + os.pathsep + env.get("PYTHONPATH", "")
+            for path in paths:
+                print(f"Running {path} path...")
+                result_path = os.path.join(workdir, f"result_{path}.json")
+                proc = subprocess.run(
+                    [sys.executable, os.path.abspath(__file__), "--run-path", path,
+                     "--config", config_path, "--report", result_path],
+                    cwd=here, env=env, stdout=subprocess.DEVNULL if args.quiet else None)
+                if proc.returncode == 0 and os.path.exists(result_path):
+                    with open(result_path, "r", encoding="utf-8") as f:
+                        report["paths"].append(json.load(f))
+                else:
+                    report["paths"].append({"path": path, "error": f"exit code {proc.returncode}"})
+            report["groq_requests"] = server.requests
+    finally:
+        if not args.keep_workdir and not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    print_report(report)
+    if args.json_out:
+        with open(args.json_out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=4)
+
+    failed = any("error" in result or result["failed"] for result in report["paths"])
+    if args.max_p95 is not None:
+        slow = [r["path"] for r in report["paths"]
+                if "error" not in r and (r["latency"]["p95"] or 0) > args.max_p95]
+        if slow:
+            print(f"p95 above {args.max_p95}s on: {', '.join(slow)}")
+            failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
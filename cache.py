@@ -0,0 +1,201 @@
+import os
+import json
+import time
+import hashlib
+import threading
+from typing import Optional, Dict, Any
+
+import metrics
+
+# Seconds between full scans of a cache directory, which pick up expired entries and other processes' writes
+EVICT_INTERVAL = 300
+# Size eviction trims to this share of max_bytes, so the next few writes do not trigger another scan
+EVICT_TO = 0.9
+
+
+def file_sha256(file_path: str, block_size: int = 1024 * 1024) -> str:
+    """Hashes a file in blocks so large PDFs are never fully loaded in memory."""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def make_key(*parts) -> str:
+    """Builds a stable cache key from any JSON-serializable parts."""
+    raw = json.dumps(parts, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class DiskCache:
+    """Persistent JSON cache on disk with size and age based eviction.
+
+    Entries are stored one file per key, so several processes can share a
+    directory. Writes are atomic (temp file + rename) and reads refresh the
+    entry's mtime, which makes size eviction least-recently-used.
+
+    Writes add to a running size rather than listing the directory, which is
+    only scanned when that size passes max_bytes or EVICT_INTERVAL has gone by.
+    """
+
+    def __init__(self, cache_dir: str, max_bytes: Optional[int] = None,
+                 max_age: Optional[float] = None, enabled: bool = True, name: Optional[str] = None):
+        self.cache_dir = cache_dir
+        # Label used for this cache in metrics
+        self.name = name or os.path.basename(os.path.normpath(cache_dir))
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._evict_lock = threading.Lock()
+        # On-disk bytes as of the last scan plus this process's writes since; None until the first scan
+        self._bytes: Optional[int] = None
+        self._scanned_at = 0.0
+        if self.enabled:
+            os.makedirs(self.cache_dir, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def _count(self, hit: bool):
+        metrics.record_cache(self.name, hit)
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def get(self, key: str) -> Optional[Any]:
+        """Returns the cached value for key, or None on a miss."""
+        if not self.enabled:
+            return None
+        path = self._path(key)
+        try:
+            if self.max_age and time.time() - os.path.getmtime(path) > self.max_age:
+                os.remove(path)
+                raise FileNotFoundError(path)
+            with open(path, "r", encoding="utf-8") as f:
+                value = json.load(f)
+            os.utime(path, None)
+        except (OSError, ValueError):
+            self._count(False)
+            return None
+        self._count(True)
+        return value
+
+    def put(self, key: str, value: Any):
+        """Stores value under key and evicts old entries if over budget."""
+        if not self.enabled:
+            return
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(value, f, ensure_ascii=False)
+            size = os.path.getsize(tmp_path)
+            try:
+                replaced = os.path.getsize(path)
+            except OSError:
+                replaced = 0
+            os.replace(tmp_path, path)
+        except (OSError, TypeError, ValueError) as e:
+            print(f"Cache write failed for {key}: {e}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return
+        with self._lock:
+            if self._bytes is not None:
+                self._bytes += size - replaced
+            due = (self._bytes is None or (self.max_bytes and self._bytes > self.max_bytes)
+                   or time.time() - self._scanned_at > EVICT_INTERVAL)
+        if due:
+            self.evict()
+
+    def invalidate(self, key: Optional[str] = None) -> int:
+        """Removes one entry, or every entry when key is None. Returns the count removed."""
+        if not self.enabled or not os.path.isdir(self.cache_dir):
+            return 0
+        names = [f"{key}.json"] if key else [
+            name for name in os.listdir(self.cache_dir) if name.endswith(".json")]
+        removed = 0
+        for name in names:
+            try:
+                os.remove(os.path.join(self.cache_dir, name))
+                removed += 1
+            except OSError:
+                pass
+        return removed
+
+    def evict(self):
+        """Drops expired entries, then least recently used ones until under max_bytes.
+
+        Over budget, the cache is trimmed to EVICT_TO of max_bytes. A thread
+        arriving while another is scanning returns at once.
+        """
+        if not (self.max_bytes or self.max_age):
+            return
+        if not self._evict_lock.acquire(blocking=False):
+            return
+        try:
+            total = self._scan()
+        finally:
+            self._evict_lock.release()
+        with self._lock:
+            self._bytes = total
+            self._scanned_at = time.time()
+
+    def _scan(self) -> int:
+        """One pass of evict() over the directory. Returns the bytes left."""
+        entries = []
+        now = time.time()
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(".json"):
+                continue
+            path = os.path.join(self.cache_dir, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            if self.max_age and now - stat.st_mtime > self.max_age:
+                self._remove(path)
+            else:
+                entries.append((stat.st_mtime, stat.st_size, path))
+
+        total = sum(size for _, size, _ in entries)
+        if self.max_bytes and total > self.max_bytes:
+            for _, size, path in sorted(entries):
+                if total <= self.max_bytes * EVICT_TO:
+                    break
+                self._remove(path)
+                total -= size
+        return total
+
+    @staticmethod
+    def _remove(path: str):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters plus the current on-disk footprint."""
+        entries = 0
+        size = 0
+        if self.enabled and os.path.isdir(self.cache_dir):
+            for entry in os.scandir(self.cache_dir):
+                if entry.name.endswith(".json"):
+                    entries += 1
+                    size += entry.stat().st_size
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "entries": entries,
+                "bytes": size,
+            }
@@ -0,0 +1,145 @@
+import re
+import json
+import zlib
+from typing import List, Dict, Optional
+
+# pymupdf4llm separates pages with a horizontal rule
+PAGE_SEPARATOR_RE = re.compile(r"\n-{5,}\n")
+# Split just before any markdown heading
+SECTION_RE = re.compile(r"\n(?=#{1,6} )")
+# Roughly one page in ANCHOR_EVERY starts a new chunk based on its own content, so chunk
+# boundaries after an edited page line up again with the previous version of the document
+ANCHOR_EVERY = 3
+
+
+def _hard_split(block: str, max_chars: int) -> List[str]:
+    """Splits an oversized block on paragraph, then line, then character boundaries."""
+    pieces = []
+    current = ""
+    for para in re.split(r"(\n\s*\n)", block):
+        if len(current) + len(para) <= max_chars:
+            current += para
+            continue
+        if current:
+            pieces.append(current)
+        current = ""
+        while len(para) > max_chars:
+            cut = para.rfind("\n", 0, max_chars)
+            if cut <= 0:
+                cut = max_chars
+            pieces.append(para[:cut])
+            para = para[cut:]
+        current = para
+    if current:
+        pieces.append(current)
+    return pieces
+
+
+def split_markdown(text: str, max_chars: int) -> List[str]:
+    """Splits markdown into chunks of at most max_chars on page and section boundaries."""
+    if len(text) <= max_chars:
+        return [text] if text.strip() else []
+
+    blocks = []
+    for page in PAGE_SEPARATOR_RE.split(text):
+        page_start = True
+        for section in SECTION_RE.split(page):
+            if len(section) > max_chars:
+                pieces = _hard_split(section, max_chars)
+            elif section.strip():
+                pieces = [section]
+            else:
+                continue
+            for piece in pieces:
+                blocks.append((piece, page_start))
+                page_start = False
+
+    # Greedily pack consecutive blocks so chunks stay close to max_chars,
+    # also cutting before anchor pages once a chunk is reasonably full
+    chunks = []
+    current = ""
+    for block, page_start in blocks:
+        anchor = (page_start and len(current) >= max_chars // 4
+                  and zlib.crc32(block.encode("utf-8")) % ANCHOR_EVERY == 0)
+        if current and (anchor or len(current) + len(block) + 2 > max_chars):
+            chunks.append(current)
+            current = ""
+        current = f"{current}\n\n{block}" if current else block
+    if current.strip():
+        chunks.append(current)
+    return chunks
+
+
+def _norm(value) -> str:
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, sort_keys=True, ensure_ascii=False).lower()
+    return " ".join(str(value or "").split()).lower()
+
+
+def _dedupe(items: list, key_fields: Optional[List[str]] = None) -> list:
+    """Order-preserving dedupe of strings or dicts (by key_fields, or whole dict)."""
+    seen = set()
+    unique = []
+    for item in items:
+        if isinstance(item, dict):
+            fields = key_fields or sorted(item.keys())
+            key = tuple(_norm(item.get(f)) for f in fields)
+            empty = not any(key)
+        else:
+            key = _norm(item)
+            empty = not key
+        if empty or key in seen:
+            continue
+        seen.add(key)
+        unique.append(item)
+    return unique
+
+
+# Fields used to decide whether two list entries describe the same thing
+LIST_KEYS = {
+    "key_statistics": ["metric", "value"],
+    "policies_schemes": ["name"],
+    "tables": ["title", "data"],
+    "table_titles": ["ref"],
+}
+
+
+def merge_extractions(results: List[dict]) -> dict:
+    """Reduces per-chunk structured extractions into a single result."""
+    results = [r for r in results if isinstance(r, dict) and r]
+    if not results:
+        return {}
+    if len(results) == 1:
+        return results[0]
+
+    merged = {}
+    summaries = []
+    for result in results:
+        for key, value in result.items():
+            if key == "summary":
+                if value:
+                    summaries.append(value)
+            elif isinstance(value, list):
+                merged.setdefault(key, []).extend(value)
+            elif isinstance(value, dict):
+                # Field-wise: keep the first non-empty value seen for each sub-key
+                target = merged.setdefault(key, {})
+                for sub_key, sub_value in value.items():
+                    if sub_value and not target.get(sub_key):
+                        target[sub_key] = sub_value
+            elif value and not merged.get(key):
+                merged[key] = value
+
+    for key, value in merged.items():
+        if isinstance(value, list):
+            merged[key] = _dedupe(value, LIST_KEYS.get(key))
+
+    if summaries:
+        merged["summary"] = " ".join(_dedupe(summaries))
+    return merged
+
+
+def merge_entities(entity_lists: List[List[Dict]]) -> List[Dict]:
+    """Concatenates per-chunk entity lists, dropping repeats of the same text and label."""
+    combined = [e for entities in entity_lists for e in (entities or []) if isinstance(e, dict)]
+    return _dedupe(combined, ["text", "label"])
@@ -0,0 +1,249 @@
+import os
+import re
+import json
+import time
+import uuid
+import atexit
+import threading
+import importlib.util
+from typing import Any, Dict, List, Optional, Tuple
+
+from gazetteer import GazetteerExtractor, clean_entity_text
+from result_index import parse_number
+
+# pyarrow is optional and imported when the first batch is written
+HAS_PYARROW = importlib.util.find_spec("pyarrow") is not None
+
+# Datasets written under the export root, one directory each
+DATASETS = ("statistics", "table_cells")
+# Hive-style partition directories, in nesting order
+PARTITION_COLUMNS = ("document_type", "state")
+UNKNOWN = "unknown"
+
+# Columns stored in every row, saying where it came from
+PROVENANCE_COLUMNS = [
+    ("doc_id", "string"), ("file_hash", "string"), ("session_id", "string"),
+    ("source", "string"), ("source_path", "string"), ("processed_at", "timestamp"),
+]
+DATASET_COLUMNS = {
+    "statistics": PROVENANCE_COLUMNS + [
+        ("stat_index", "int32"), ("metric", "string"), ("value", "string"), ("number", "float64"),
+        ("context", "string"), ("document_type_text", "string"),
+    ],
+    "table_cells": PROVENANCE_COLUMNS + [
+        ("table_index", "int32"), ("table_title", "string"), ("row_index", "int32"),
+        ("column", "string"), ("value", "string"), ("number", "float64"),
+        ("document_type_text", "string"),
+    ],
+}
+
+_SLUG_RE = re.compile(r"[^a-z0-9]+")
+
+
+def partition_value(text: Optional[str]) -> str:
+    """Directory-safe partition value: "Statistical Report" -> "statistical_report"."""
+    slug = _SLUG_RE.sub("_", clean_entity_text(text or "").lower()).strip("_")
+    return slug or UNKNOWN
+
+
+def _text(value: Any) -> Optional[str]:
+    if value is None:
+        return None
+    return value if isinstance(value, str) else json.dumps(value, ensure_ascii=False)
+
+
+def _schema(dataset: str):
+    import pyarrow as pa
+    types = {
+        "string": pa.string(), "int32": pa.int32(), "float64": pa.float64(),
+        "timestamp": pa.timestamp("ms", tz="UTC"),
+    }
+    return pa.schema([(name, types[kind]) for name, kind in DATASET_COLUMNS[dataset]])
+
+
+class ColumnarExporter:
+    """Appends key_statistics and tables from results to partitioned Parquet datasets.
+
+    Rows are buffered and written every batch_docs documents (and on
+    flush()/close()) as one file per partition, laid out as
+    <root>/<dataset>/document_type=<slug>/state=<slug>/part-*.parquet so
+    pyarrow, pandas, DuckDB or Spark can read a whole dataset, or prune to
+    one state, without touching per-document JSON. Tables are stored long
+    (one row per cell) because every extracted table has its own columns.
+    Files are only ever added, so a reprocessed document appears again with
+    a later processed_at.
+    """
+
+    def __init__(self, root: Optional[str] = None, batch_docs: Optional[int] = None,
+                 gazetteer: Optional[GazetteerExtractor] = None):
+        if not HAS_PYARROW:
+            raise ImportError("Parquet export needs pyarrow: pip install pyarrow")
+        self.root = root or os.getenv("PARQUET_DIR", os.path.join("exports", "parquet"))
+        self.batch_docs = max(1, batch_docs or int(os.getenv("PARQUET_BATCH_DOCS", "50")))
+        self.gazetteer = gazetteer or GazetteerExtractor()
+        self._rows: Dict[str, List[Dict]] = {name: [] for name in DATASETS}
+        self._pending_docs = 0
+        self._lock = threading.Lock()
+        self._flusher: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    def _document_state(self, result: Dict) -> Optional[str]:
+        """The document's state when it names exactly one."""
+        states = set()
+        for state in result.get("states_mentioned") or []:
+            if isinstance(state, str):
+                known = self.gazetteer.lookup(state, "state")
+                states.add(known["canonical"] if known else clean_entity_text(state))
+        return states.pop() if len(states) == 1 else None
+
+    def _row_state(self, row: Dict) -> Optional[str]:
+        """The state a table row names, trying each cell as a state column before the row's text."""
+        # State-wise tables name the state in one of the row's cells, often as a code such as "UP"
+        for value in row.values():
+            known = self.gazetteer.lookup(value, "state") if isinstance(value, str) else None
+            if known is not None and known["kind"] == "state":
+                return known["canonical"]
+        return self.gazetteer.state_in(" ".join(str(v) for v in row.values() if v is not None))
+
+    def rows(self, doc_id: str, result: Dict, **provenance) -> Dict[str, List[Dict]]:
+        """Rows a result contributes to each dataset; provenance fills the provenance columns."""
+        base = {name: provenance.get(name) for name, _ in PROVENANCE_COLUMNS}
+        base["doc_id"] = doc_id
+        base["processed_at"] = provenance.get("processed_at") or time.time()
+        document_type_text = _text(result.get("document_type"))
+        base["document_type_text"] = document_type_text
+        base["document_type"] = partition_value(document_type_text)
+        document_state = self._document_state(result)
+
+        statistics = []
+        for i, stat in enumerate(result.get("key_statistics") or []):
+            if not isinstance(stat, dict):
+                continue
+            metric, value, context = _text(stat.get("metric")), stat.get("value"), _text(stat.get("context"))
+            state = self.gazetteer.state_in(f"{metric or ''} {context or ''}") or document_state
+            statistics.append({**base, "stat_index": i, "metric": metric, "value": _text(value),
+                               "number": parse_number(value), "context": context,
+                               "state": partition_value(state)})
+
+        cells = []
+        for t, table in enumerate(result.get("tables") or []):
+            if not isinstance(table, dict) or not isinstance(table.get("data"), list):
+                continue
+            title = _text(table.get("title"))
+            for r, row in enumerate(table["data"]):
+                if not isinstance(row, dict):
+                    continue
+                state = partition_value(self._row_state(row) or document_state)
+                for column, value in row.items():
+                    cells.append({**base, "table_index": t, "table_title": title, "row_index": r,
+                                  "column": str(column), "value": _text(value),
+                                  "number": parse_number(value), "state": state})
+        return {"statistics": statistics, "table_cells": cells}
+
+    def add(self, doc_id: str, result: Dict, **provenance) -> int:
+        """Buffers a result's rows, writing the batch once batch_docs documents are waiting.
+
+        Returns the number of files written (0 while the batch is still filling).
+        """
+        rows = self.rows(doc_id, result, **provenance)
+        with self._lock:
+            for name, dataset_rows in rows.items():
+                self._rows[name].extend(dataset_rows)
+            self._pending_docs += 1
+            full = self._pending_docs >= self.batch_docs
+        return self.flush() if full else 0
+
+    @property
+    def pending_docs(self) -> int:
+        """Documents whose rows are buffered but not yet written."""
+        with self._lock:
+            return self._pending_docs
+
+    def flush(self) -> int:
+        """Writes every buffered row. Returns the number of files written.
+
+        If a write fails, the rows not yet written go back into the buffer,
+        so the next flush (or close) tries them again.
+        """
+        with self._lock:
+            rows, self._rows = self._rows, {name: [] for name in DATASETS}
+            pending_docs, self._pending_docs = self._pending_docs, 0
+        written = 0
+        done = set()
+        try:
+            for name, dataset_rows in rows.items():
+                partitions: Dict[Tuple[str, ...], List[Dict]] = {}
+                for row in dataset_rows:
+                    partitions.setdefault(tuple(row[column] for column in PARTITION_COLUMNS), []).append(row)
+                for values, partition_rows in partitions.items():
+                    self._write(name, values, partition_rows)
+                    done.update(id(row) for row in partition_rows)
+                    written += 1
+        except BaseException:
+            with self._lock:
+                for name, dataset_rows in rows.items():
+                    self._rows[name][:0] = [row for row in dataset_rows if id(row) not in done]
+                self._pending_docs += pending_docs
+            raise
+        if written:
+            print(f"Parquet export wrote {written} files under {self.root}")
+        return written
+
+    def _write(self, dataset: str, values: Tuple[str, ...], rows: List[Dict]):
+        """Writes one partition's rows as a new file, leaving the buffered rows untouched."""
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        records = [{**{k: v for k, v in row.items() if k not in PARTITION_COLUMNS},
+                    "processed_at": int(row["processed_at"] * 1000)} for row in rows]
+        directory = os.path.join(self.root, dataset, *(f"{column}={value}" for column, value
+                                                       in zip(PARTITION_COLUMNS, values)))
+        os.makedirs(directory, exist_ok=True)
+        file_name = f"part-{int(time.time() * 1000)}-{uuid.uuid4().hex[:8]}.parquet"
+        # Dot-prefixed while being written, so dataset readers skip the partial file
+        tmp_path = os.path.join(directory, f".{file_name}.tmp")
+        try:
+            pq.write_table(pa.Table.from_pylist(records, schema=_schema(dataset)), tmp_path,
+                           compression="zstd")
+            os.replace(tmp_path, os.path.join(directory, file_name))
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def start_flusher(self, interval: Optional[float] = None):
+        """Flushes every interval seconds on a daemon thread, and once more at exit,
+        so results trickling in from the web app do not wait for a full batch."""
+        interval = interval or float(os.getenv("PARQUET_FLUSH_SECONDS", "300"))
+        if self._flusher is not None:
+            return
+
+        def loop():
+            while not self._stop.wait(interval):
+                try:
+                    self.flush()
+                except Exception as e:
+                    print(f"Parquet export flush failed: {e}")
+
+        self._flusher = threading.Thread(target=loop, name="parquet-flusher", daemon=True)
+        self._flusher.start()
+        atexit.register(self.close)
+
+    def close(self):
+        self._stop.set()
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def read_dataset(root: str, dataset: str = "statistics", filters: Optional[list] = None):
+    """Loads an exported dataset (partition columns included) as a pyarrow Table.
+
+    filters use pyarrow's DNF form, e.g. [("state", "=", "bihar")]; partition
+    filters skip whole directories.
+    """
+    import pyarrow.parquet as pq
+    return pq.read_table(os.path.join(root, dataset), partitioning="hive", filters=filters)
@@ -0,0 +1,189 @@
+import re
+import threading
+import importlib.util
+from collections import Counter
+from typing import List, Tuple
+
+# tiktoken and its encoding tables are only loaded on the first count (see _encoding)
+HAS_TIKTOKEN = importlib.util.find_spec("tiktoken") is not None
+_ENCODING = None
+_encoding_lock = threading.Lock()
+
+# Rough characters per token for English prose when no tokenizer is installed
+CHARS_PER_TOKEN = 4
+
+PAGE_SPLIT_RE = re.compile(r"(\n-{5,}\n)")
+SECTION_SPLIT_RE = re.compile(r"\n(?=#{1,6} )|\n-{5,}\n")
+# "Page 3", "Page 3 of 40", "- 3 -", "3", "iii"
+PAGE_NUMBER_RE = re.compile(
+    r"^\s*(?:page\s*)?[-–—(\[]?\s*(?:\d{1,4}|(?=[ivx])x{0,3}(?:ix|iv|v?i{0,3}))\s*(?:of\s*\d{1,4})?\s*[-–—)\]]?\s*$",
+    re.IGNORECASE)
+# Table of contents lines: "Chapter 2 ........ 14"
+DOT_LEADER_RE = re.compile(r"(?:\.\s?){4,}\s*\d{1,4}\s*$")
+IMAGE_LINE_RE = re.compile(r"^Image \([^)]*\): (.*)$")
+SPACES_RE = re.compile(r"[ \t ]{2,}")
+BLANK_LINES_RE = re.compile(r"\n{3,}")
+DIGITS_RE = re.compile(r"\d")
+NUMBER_RE = re.compile(r"\d[\d,.]*%?")
+CAPITALIZED_RE = re.compile(r"\b[A-Z][A-Za-z]{2,}")
+
+# A line must repeat on at least this share of pages (and MIN_REPEAT_PAGES) to count as boilerplate
+BOILERPLATE_SHARE = 0.5
+MIN_REPEAT_PAGES = 3
+# Only lines among the first and last few of a page are page-number and header/footer candidates
+EDGE_LINES = 3
+MAX_BOILERPLATE_WORDS = 12
+
+
+def _encoding():
+    """The cl100k encoding, loaded on first use; None when tiktoken is missing or cannot load it."""
+    global _ENCODING, HAS_TIKTOKEN
+    if _ENCODING is None and HAS_TIKTOKEN:
+        with _encoding_lock:
+            if _ENCODING is None and HAS_TIKTOKEN:
+                try:
+                    import tiktoken
+                    _ENCODING = tiktoken.get_encoding("cl100k_base")
+                except Exception:
+                    HAS_TIKTOKEN = False
+    return _ENCODING
+
+
+def count_tokens(text: str) -> int:
+    """Counts tokens with tiktoken when available, otherwise estimates from length."""
+    if not text:
+        return 0
+    encoding = _encoding()
+    if encoding is not None:
+        return len(encoding.encode(text, disallowed_special=()))
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Cuts text to at most max_tokens tokens."""
+    encoding = _encoding()
+    if encoding is not None:
+        tokens = encoding.encode(text, disallowed_special=())
+        return text if len(tokens) <= max_tokens else encoding.decode(tokens[:max_tokens])
+    return text[:max_tokens * CHARS_PER_TOKEN]
+
+
+def chars_for_tokens(text: str, max_tokens: int) -> int:
+    """Converts a token budget to a character budget using this text's own chars/token ratio."""
+    tokens = count_tokens(text)
+    ratio = len(text) / tokens if tokens else CHARS_PER_TOKEN
+    return max(1, int(max_tokens * ratio))
+
+
+def _normalize_line(line: str) -> str:
+    # Page numbers and dates inside running headers change from page to page
+    return DIGITS_RE.sub("#", " ".join(line.split()).lower())
+
+
+def _boilerplate_lines(pages: List[List[str]]) -> set:
+    """Normalized header/footer lines that repeat across many pages."""
+    if len(pages) < MIN_REPEAT_PAGES:
+        return set()
+    counts = Counter()
+    for lines in pages:
+        content = [line for line in lines if line.strip()]
+        edges = content[:EDGE_LINES] + content[-EDGE_LINES:]
+        # Headings, table rows and image summaries are content even when they repeat
+        counts.update({_normalize_line(line) for line in edges
+                       if not line.lstrip().startswith(("#", "|", "Image ("))
+                       and len(line.split()) <= MAX_BOILERPLATE_WORDS})
+    threshold = max(MIN_REPEAT_PAGES, int(len(pages) * BOILERPLATE_SHARE))
+    return {line for line, count in counts.items() if count >= threshold and line}
+
+
+def _edge_indexes(lines: List[str]) -> set:
+    """Indexes of the first and last EDGE_LINES non-blank lines of a page."""
+    content = [i for i, line in enumerate(lines) if line.strip()]
+    return set(content[:EDGE_LINES] + content[-EDGE_LINES:])
+
+
+def compact(text: str) -> str:
+    """Strips repeated headers/footers, page numbers, TOC dot leaders, duplicate
+    paragraphs and image summaries, and collapses whitespace runs."""
+    parts = PAGE_SPLIT_RE.split(text)
+    pages = [parts[i].split("\n") for i in range(0, len(parts), 2)]
+    separators = [parts[i] for i in range(1, len(parts), 2)]
+    boilerplate = _boilerplate_lines(pages)
+
+    seen_paragraphs = set()
+    seen_images = set()
+    out_pages = []
+    for lines in pages:
+        kept = []
+        edges = _edge_indexes(lines)
+        for i, line in enumerate(lines):
+            stripped = line.strip()
+            if not stripped:
+                kept.append("")
+                continue
+            # A lone number mid-page is more likely a table cell than a page number
+            if (i in edges and PAGE_NUMBER_RE.match(stripped)) or DOT_LEADER_RE.search(stripped):
+                continue
+            if _normalize_line(stripped) in boilerplate:
+                continue
+            image = IMAGE_LINE_RE.match(stripped)
+            if image:
+                description = " ".join(image.group(1).split()).lower()
+                if not description or description in seen_images:
+                    continue
+                seen_images.add(description)
+            kept.append(SPACES_RE.sub(" ", line.rstrip()))
+
+        # Drop paragraphs already seen verbatim elsewhere in the document
+        paragraphs = []
+        for paragraph in "\n".join(kept).split("\n\n"):
+            key = " ".join(paragraph.split()).lower()
+            if not key:
+                continue
+            # Short lines such as table headers legitimately repeat
+            if len(key) > 80:
+                if key in seen_paragraphs:
+                    continue
+                seen_paragraphs.add(key)
+            paragraphs.append(paragraph.strip("\n"))
+        out_pages.append("\n\n".join(paragraphs))
+
+    result = out_pages[0] if out_pages else ""
+    for separator, page in zip(separators, out_pages[1:]):
+        # Blank lines around the rule keep it from reading as a setext heading underline
+        result += "\n" + separator + "\n" + page
+    return BLANK_LINES_RE.sub("\n\n", result).strip() + "\n"
+
+
+def _score(section: str, tokens: int) -> float:
+    """Informativeness per token: figures, proper nouns and table rows weigh most."""
+    table_rows = section.count("\n|")
+    signal = len(NUMBER_RE.findall(section)) + len(CAPITALIZED_RE.findall(section)) + 5 * table_rows
+    return signal / max(1, tokens)
+
+
+def pack_to_budget(text: str, max_tokens: int) -> str:
+    """Keeps the most informative sections that fit in max_tokens, in document order.
+
+    The opening section is always preferred since it usually carries the
+    title and purpose of the document.
+    """
+    if count_tokens(text) <= max_tokens:
+        return text
+    sections = [s for s in SECTION_SPLIT_RE.split(text) if s.strip()]
+    scored: List[Tuple[float, int, int]] = []
+    for index, section in enumerate(sections):
+        tokens = count_tokens(section)
+        score = float("inf") if index == 0 else _score(section, tokens)
+        scored.append((score, index, tokens))
+
+    chosen = []
+    used = 0
+    for score, index, tokens in sorted(scored, key=lambda s: (-s[0], s[1])):
+        if used + tokens > max_tokens:
+            continue
+        chosen.append(index)
+        used += tokens
+    if not chosen:
+        return truncate_to_tokens(text, max_tokens)
+    return "\n\n".join(sections[i] for i in sorted(chosen))
@@ -0,0 +1,279 @@
+import os
+import io
+import csv
+import threading
+from typing import Dict, Iterable, Iterator, List, Optional, Any
+
+# Bytes buffered before a chunk of a streamed download is sent
+STREAM_CHUNK_BYTES = 64 * 1024
+
+
+def _cell(value: Any) -> Any:
+    return "" if value is None else value
+
+
+def _columns(rows: List[Dict]) -> List[str]:
+    """Union of row keys in first-seen order, as pandas.DataFrame(rows) would order them."""
+    columns: Dict[str, None] = {}
+    for row in rows:
+        if isinstance(row, dict):
+            for key in row:
+                columns.setdefault(key, None)
+    return list(columns)
+
+
+def _record_rows(rows: List[Any]) -> Iterator[List[Any]]:
+    """Header plus one line per record; records missing a column get an empty cell."""
+    columns = _columns(rows)
+    if columns:
+        yield columns
+    for row in rows:
+        if isinstance(row, dict):
+            yield [_cell(row.get(column)) for column in columns]
+        elif isinstance(row, (list, tuple)):
+            yield [_cell(value) for value in row]
+        else:
+            yield [_cell(row)]
+
+
+def iter_csv_lines(result: Dict) -> Iterator[Any]:
+    """Walks a result in download order, yielding section titles (str) and CSV rows (list)."""
+    yield "=== SUMMARY ===\n"
+    yield f"{result.get('summary', 'N/A')}\n\n"
+
+    if result.get('named_entities'):
+        yield "=== NAMED ENTITIES ===\n"
+        yield from _record_rows(result['named_entities'])
+        yield "\n"
+
+    for i, table in enumerate(result.get('tables') or []):
+        yield f"=== {table.get('title', f'Table {i+1}')} ===\n"
+        if isinstance(table.get('data'), list) and table['data']:
+            yield from _record_rows(table['data'])
+        yield "\n"
+
+    if 'key_statistics' in result:
+        yield "=== KEY STATISTICS ===\n"
+        yield from _record_rows(result['key_statistics'] or [])
+        yield "\n"
+
+
+def iter_csv(result: Dict, chunk_bytes: int = STREAM_CHUNK_BYTES) -> Iterator[bytes]:
+    """Renders the sectioned CSV export row by row, yielding UTF-8 chunks of about chunk_bytes.
+
+    Only one chunk is held in memory at a time, however many tables the result has.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    for line in iter_csv_lines(result):
+        if isinstance(line, str):
+            buffer.write(line)
+        else:
+            writer.writerow(line)
+        if buffer.tell() >= chunk_bytes:
+            yield buffer.getvalue().encode("utf-8")
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+
+def is_fresh(artifact_path: str, source_time: Optional[float]) -> bool:
+    """True when a rendered artifact exists and is not older than source_time (when its result was saved)."""
+    try:
+        return source_time is not None and os.path.getmtime(artifact_path) >= source_time
+    except OSError:
+        return False
+
+
+def tee_to_file(chunks: Iterable[bytes], path: str) -> Iterator[bytes]:
+    """Passes chunks through while saving them to path.
+
+    The file only appears once every chunk has been written, so an
+    interrupted download never leaves a truncated artifact behind.
+    """
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    complete = False
+    try:
+        with open(tmp_path, "wb") as f:
+            for chunk in chunks:
+                f.write(chunk)
+                yield chunk
+        os.replace(tmp_path, path)
+        complete = True
+    finally:
+        if not complete and os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+# Rows per table flowable in the PDF report; long tables are split into slices of this size,
+# each repeating the header, so layout cost stays linear in the row count
+PDF_TABLE_ROWS = 100
+# Characters used to weight a column when sharing out the page width
+PDF_MAX_COLUMN_CHARS = 40
+
+
+def _column_widths(rows: List[List[str]], total_width: float) -> List[float]:
+    """Shares total_width between columns in proportion to their (capped) longest text."""
+    columns = max(len(row) for row in rows)
+    weights = [1] * columns
+    for row in rows[:PDF_TABLE_ROWS * 5]:
+        for i, value in enumerate(row):
+            weights[i] = max(weights[i], min(len(value), PDF_MAX_COLUMN_CHARS))
+    total = sum(weights)
+    return [total_width * weight / total for weight in weights]
+
+
+def _escape(value: Any) -> str:
+    """Model output is plain text; escape it so Paragraph markup parsing cannot fail on it."""
+    return str(value).replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;')
+
+
+def _pdf_tables(headers: List[str], rows: List[List[str]], total_width: float,
+                font_size: int = 9, header_size: int = 10) -> list:
+    """Builds header-repeating table slices with computed widths; long cells wrap instead of overflowing."""
+    from reportlab.lib import colors
+    from reportlab.lib.styles import ParagraphStyle
+    from reportlab.platypus import Paragraph, Table, TableStyle
+
+    headers = [str(h) for h in headers]
+    rows = [[str(_cell(value)) for value in row] + [""] * (len(headers) - len(row)) for row in rows]
+    widths = _column_widths([headers] + rows, total_width)
+    if len(headers) > 6:
+        font_size, header_size = 7, 8
+    cell_style = ParagraphStyle('TableCell', fontName='Helvetica', fontSize=font_size, leading=font_size + 2)
+    header_style = ParagraphStyle('TableHeader', parent=cell_style, fontName='Helvetica-Bold',
+                                  fontSize=header_size, leading=header_size + 2, textColor=colors.whitesmoke)
+    # Roughly how many characters fit on one line of each column
+    capacity = [max(1, int(width / (font_size * 0.5))) for width in widths]
+
+    def wrap(value, i, style):
+        if len(value) <= capacity[i]:
+            return value
+        return Paragraph(_escape(value), style)
+
+    header_row = [wrap(h, i, header_style) for i, h in enumerate(headers)]
+    style = TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#3949ab')),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+        ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, 0), header_size),
+        ('BOTTOMPADDING', (0, 0), (-1, 0), 8),
+        ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+        ('GRID', (0, 0), (-1, -1), 1, colors.black),
+        ('FONTSIZE', (0, 1), (-1, -1), font_size),
+    ])
+    tables = []
+    for start in range(0, max(1, len(rows)), PDF_TABLE_ROWS):
+        body = [[wrap(value, i, cell_style) for i, value in enumerate(row)]
+                for row in rows[start:start + PDF_TABLE_ROWS]]
+        table = Table([header_row] + body, colWidths=widths, repeatRows=1)
+        table.setStyle(style)
+        tables.append(table)
+    return tables
+
+
+def render_pdf_report(result: Dict, path: str):
+    """Renders the PDF report for a result to path (written atomically)."""
+    from datetime import datetime
+    from reportlab.lib import colors
+    from reportlab.lib.enums import TA_CENTER
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+    from reportlab.lib.units import inch
+    from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, PageBreak
+
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    doc = SimpleDocTemplate(tmp_path, pagesize=A4, rightMargin=72, leftMargin=72,
+                           topMargin=72, bottomMargin=18)
+    
+    # Container for the 'Flowable' objects
+    elements = []
+    
+    # Define styles
+    styles = getSampleStyleSheet()
+    title_style = ParagraphStyle(
+        'CustomTitle',
+        parent=styles['Heading1'],
+        fontSize=24,
+        textColor=colors.HexColor('#1a237e'),
+        spaceAfter=30,
+        alignment=TA_CENTER
+    )
+    
+    heading_style = ParagraphStyle(
+        'CustomHeading',
+        parent=styles['Heading2'],
+        fontSize=16,
+        textColor=colors.HexColor('#283593'),
+        spaceAfter=12,
+        spaceBefore=12
+    )
+    
+    # Title
+    elements.append(Paragraph("Education Data Extraction Report", title_style))
+    elements.append(Spacer(1, 0.2*inch))
+    elements.append(Paragraph(f"Generated on: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}", 
+                             styles['Normal']))
+    elements.append(Spacer(1, 0.3*inch))
+    
+    # Summary
+    if result.get('summary'):
+        elements.append(Paragraph("Summary", heading_style))
+        elements.append(Paragraph(_escape(result['summary']), styles['Normal']))
+        elements.append(Spacer(1, 0.2*inch))
+    
+    # Document Type
+    if result.get('document_type'):
+        elements.append(Paragraph("Document Type", heading_style))
+        elements.append(Paragraph(_escape(result['document_type']), styles['Normal']))
+        elements.append(Spacer(1, 0.2*inch))
+    
+    # Key Statistics
+    if result.get('key_statistics'):
+        elements.append(Paragraph("Key Statistics", heading_style))
+        stats_rows = [[stat.get('metric', 'N/A'), stat.get('value', 'N/A'), stat.get('context', 'N/A')]
+                      for stat in result['key_statistics']]
+        elements.extend(_pdf_tables(['Metric', 'Value', 'Context'], stats_rows, doc.width, header_size=12))
+        elements.append(Spacer(1, 0.2*inch))
+    
+    # Policies and Schemes
+    if result.get('policies_schemes'):
+        elements.append(Paragraph("Policies & Schemes", heading_style))
+        for policy in result['policies_schemes']:
+            elements.append(Paragraph(f"<b>{_escape(policy.get('name', 'N/A'))}</b>", styles['Normal']))
+            elements.append(Paragraph(f"Description: {_escape(policy.get('description', 'N/A'))}", styles['Normal']))
+            elements.append(Paragraph(f"Target: {_escape(policy.get('target_audience', 'N/A'))}", styles['Normal']))
+            elements.append(Spacer(1, 0.1*inch))
+        elements.append(Spacer(1, 0.2*inch))
+    
+    # Named Entities
+    if result.get('named_entities'):
+        elements.append(Paragraph("Named Entities", heading_style))
+        entity_rows = [[entity.get('text', 'N/A'), entity.get('label', 'N/A')]
+                       for entity in result['named_entities'][:50]]  # Limit to first 50
+        elements.extend(_pdf_tables(['Entity', 'Type'], entity_rows, doc.width, header_size=12))
+        elements.append(Spacer(1, 0.2*inch))
+    
+    # Tables
+    if result.get('tables'):
+        elements.append(PageBreak())
+        elements.append(Paragraph("Extracted Tables", heading_style))
+        for table in result['tables']:
+            elements.append(Paragraph(f"<b>{_escape(table.get('title', 'Untitled Table'))}</b>", styles['Heading3']))
+            data = table.get('data')
+            if isinstance(data, list) and data:
+                headers = _columns(data)
+                if headers:
+                    rows = [[row.get(h, '') for h in headers] for row in data if isinstance(row, dict)]
+                    elements.extend(_pdf_tables(headers, rows, doc.width))
+            elements.append(Spacer(1, 0.3*inch))
+    
+    try:
+        doc.build(elements)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
@@ -0,0 +1,363 @@
+import re
+from collections import deque
+from typing import Dict, List, Optional, Tuple
+
+# Canonical name -> aliases. All-caps aliases of up to 6 characters (acronyms)
+# only match with exact case, so "UP" does not match the word "up".
+STATES_AND_UTS = {
+    "Andhra Pradesh": ["AP"], "Arunachal Pradesh": [], "Assam": [], "Bihar": [],
+    "Chhattisgarh": ["Chattisgarh"], "Goa": [], "Gujarat": [], "Haryana": [],
+    "Himachal Pradesh": ["HP"], "Jharkhand": [], "Karnataka": [], "Kerala": [],
+    "Madhya Pradesh": ["MP"], "Maharashtra": [], "Manipur": [], "Meghalaya": [],
+    "Mizoram": [], "Nagaland": [], "Odisha": ["Orissa"], "Punjab": [], "Rajasthan": [],
+    "Sikkim": [], "Tamil Nadu": ["TN"], "Telangana": [], "Tripura": [],
+    "Uttar Pradesh": ["UP"], "Uttarakhand": ["Uttaranchal"], "West Bengal": ["WB"],
+    "Andaman and Nicobar Islands": ["Andaman & Nicobar Islands", "A&N Islands"],
+    "Chandigarh": [],
+    "Dadra and Nagar Haveli and Daman and Diu": ["Dadra & Nagar Haveli and Daman & Diu", "DNH&DD"],
+    "Delhi": ["NCT of Delhi", "New Delhi"], "Jammu and Kashmir": ["Jammu & Kashmir", "J&K"],
+    "Ladakh": [], "Lakshadweep": [], "Puducherry": ["Pondicherry"],
+}
+
+# State codes that are also everyday abbreviations ("MP" for Member of Parliament, "WB" for
+# World Bank). In running text they only count on a line that names another state; lookups
+# only resolve them when the caller expects a state.
+AMBIGUOUS_ALIASES = {"AP", "HP", "MP", "TN", "UP", "WB"}
+
+# A selection of district headquarters and major cities that recur in education reports
+DISTRICTS = {
+    "Agra": [], "Ahmedabad": [], "Ajmer": [], "Aligarh": [], "Allahabad": ["Prayagraj"],
+    "Amritsar": [], "Aurangabad": [], "Bengaluru": ["Bangalore"], "Bhopal": [],
+    "Bhubaneswar": [], "Chennai": ["Madras"], "Coimbatore": [], "Cuttack": [],
+    "Darbhanga": [], "Dehradun": [], "Dhanbad": [], "Gaya": [], "Guwahati": [],
+    "Gwalior": [], "Hyderabad": [], "Imphal": [], "Indore": [], "Jabalpur": [],
+    "Jaipur": [], "Jodhpur": [], "Kanpur": [], "Kochi": ["Ernakulam", "Cochin"],
+    "Kolkata": ["Calcutta"], "Kota": [], "Kozhikode": ["Calicut"], "Lucknow": [],
+    "Ludhiana": [], "Madurai": [], "Meerut": [], "Mumbai": ["Bombay"], "Muzaffarpur": [],
+    "Mysuru": ["Mysore"], "Nagpur": [], "Nashik": [], "Patna": [], "Pune": [],
+    "Raipur": [], "Rajkot": [], "Ranchi": [], "Shillong": [], "Shimla": [], "Srinagar": [],
+    "Surat": [], "Thiruvananthapuram": ["Trivandrum"], "Vadodara": ["Baroda"],
+    "Varanasi": [], "Vijayawada": [], "Visakhapatnam": ["Vizag"],
+}
+
+BOARDS = {
+    "Central Board of Secondary Education": ["CBSE"],
+    "Council for the Indian School Certificate Examinations": ["CISCE", "ICSE", "ISC"],
+    "National Institute of Open Schooling": ["NIOS"],
+    "Bihar School Examination Board": ["BSEB"],
+    "Board of High School and Intermediate Education Uttar Pradesh": ["UP Board", "UPMSP"],
+    "Maharashtra State Board of Secondary and Higher Secondary Education": ["MSBSHSE"],
+    "Board of Secondary Education Rajasthan": ["RBSE"],
+    "Tamil Nadu State Board": [],
+    "Karnataka Secondary Education Examination Board": ["KSEEB"],
+    "West Bengal Board of Secondary Education": ["WBBSE"],
+    "Board of Secondary Education Madhya Pradesh": ["MPBSE"],
+    "Gujarat Secondary and Higher Secondary Education Board": ["GSEB"],
+    "Board of Secondary Education Andhra Pradesh": ["BSEAP"],
+    "Kerala Board of Public Examinations": ["KBPE"],
+}
+
+BODIES = {
+    "Ministry of Education": ["MoE"],
+    "Ministry of Human Resource Development": ["MHRD"],
+    "Department of School Education and Literacy": ["DoSEL"],
+    "Department of Higher Education": [],
+    "University Grants Commission": ["UGC"],
+    "All India Council for Technical Education": ["AICTE"],
+    "National Council of Educational Research and Training": ["NCERT"],
+    "National Council for Teacher Education": ["NCTE"],
+    "National Assessment and Accreditation Council": ["NAAC"],
+    "National Board of Accreditation": ["NBA"],
+    "National Testing Agency": ["NTA"],
+    "National Institutional Ranking Framework": ["NIRF"],
+    "State Council of Educational Research and Training": ["SCERT"],
+    "District Institute of Education and Training": ["DIET"],
+    "Kendriya Vidyalaya Sangathan": ["KVS"],
+    "Navodaya Vidyalaya Samiti": ["NVS"],
+    "Unified District Information System for Education Plus": ["UDISE+", "UDISE Plus", "UDISE"],
+    "All India Survey on Higher Education": ["AISHE"],
+    "NITI Aayog": [],
+    "National Institute of Educational Planning and Administration": ["NIEPA", "NUEPA"],
+    "Central Institute of Educational Technology": ["CIET"],
+    "National Sample Survey Office": ["NSSO"],
+    "Performance Grading Index": ["PGI"],
+    "National Achievement Survey": ["NAS"],
+    "Indian Institutes of Technology": ["IITs", "IIT"],
+    "National Institutes of Technology": ["NITs", "NIT"],
+    "Indian Institutes of Management": ["IIMs", "IIM"],
+    "Kendriya Vidyalaya": ["Kendriya Vidyalayas"],
+    "Jawahar Navodaya Vidyalaya": ["JNV", "Jawahar Navodaya Vidyalayas"],
+}
+
+SCHEMES = {
+    "Samagra Shiksha": ["Samagra Shiksha Abhiyan"],
+    "PM POSHAN": ["PM-POSHAN", "Pradhan Mantri Poshan Shakti Nirman", "Mid-Day Meal", "Mid Day Meal", "MDM"],
+    # No bare "National Education Policy": it would turn the 1968 and 1986 policies into NEP 2020
+    "National Education Policy 2020": ["NEP 2020", "NEP-2020"],
+    "Right to Education Act": ["RTE Act", "Right of Children to Free and Compulsory Education Act", "RTE"],
+    "Sarva Shiksha Abhiyan": ["SSA"],
+    "Rashtriya Madhyamik Shiksha Abhiyan": ["RMSA"],
+    "Rashtriya Uchchatar Shiksha Abhiyan": ["RUSA"],
+    "PM SHRI": ["PM-SHRI", "PM Schools for Rising India"],
+    "PM-USHA": ["Pradhan Mantri Uchchatar Shiksha Abhiyan"],
+    "NIPUN Bharat": ["NIPUN Bharat Mission"],
+    "NISHTHA": [],
+    "DIKSHA": [],
+    "PM eVIDYA": ["PM e-VIDYA"],
+    "SWAYAM": [],
+    "Kasturba Gandhi Balika Vidyalaya": ["KGBV", "KGBVs"],
+    "Beti Bachao Beti Padhao": ["BBBP"],
+    "National Scholarship Portal": ["NSP"],
+    "Pradhan Mantri Kaushal Vikas Yojana": ["PMKVY"],
+    "Vidyanjali": [],
+    "Padhe Bharat Badhe Bharat": [],
+    "Rashtriya Avishkar Abhiyan": [],
+    "Operation Blackboard": [],
+    "District Primary Education Programme": ["DPEP"],
+    "Saakshar Bharat": [],
+    "New India Literacy Programme": ["ULLAS"],
+}
+
+# Gazetteer -> entity label, matching the labels NERProcessor asks the model for
+GAZETTEERS = [
+    (STATES_AND_UTS, "LOCATION", "state"),
+    (DISTRICTS, "LOCATION", "district"),
+    (BOARDS, "ORGANIZATION", "board"),
+    (BODIES, "ORGANIZATION", "body"),
+    (SCHEMES, "POLICY_SCHEME", "scheme"),
+]
+
+_MONTHS = (r"(?:Jan(?:uary)?|Feb(?:ruary)?|Mar(?:ch)?|Apr(?:il)?|May|June?|July?|Aug(?:ust)?|"
+           r"Sep(?:t(?:ember)?)?|Oct(?:ober)?|Nov(?:ember)?|Dec(?:ember)?)")
+
+DATE_RE = re.compile(
+    r"\b(?:"
+    rf"\d{{1,2}}(?:st|nd|rd|th)?\s+{_MONTHS}\.?,?\s+(?:19|20)\d{{2}}"   # 15 August 2023
+    rf"|{_MONTHS}\.?\s+\d{{1,2}},?\s+(?:19|20)\d{{2}}"                  # August 15, 2023
+    rf"|{_MONTHS}\.?,?\s+(?:19|20)\d{{2}}"                              # March 2021
+    r"|\d{1,2}[/-]\d{1,2}[/-](?:19|20)?\d{2}"                           # 01/04/2022, 1-4-22
+    # Dotted dates need a four-digit year, so section numbers such as 3.2.15 are left alone
+    r"|\d{1,2}\.\d{1,2}\.(?:19|20)\d{2}"                                # 01.04.2022
+    r"|(?:19|20)\d{2}\s*[-–]\s*(?:19|20)?\d{2}"                         # 2022-23 academic/financial year
+    r")\b"
+)
+
+# Amounts, percentages and plain figures; used to recognise lines with nothing left for the model
+NUMBER_RE = re.compile(
+    r"(?:₹|Rs\.?|INR)?\s*\d[\d,]*(?:\.\d+)?\s*(?:%|per\s*cent|crores?|lakhs?|lacs?|million|billion)?",
+    re.IGNORECASE,
+)
+
+_WORD_RE = re.compile(r"[A-Za-z]{3,}")
+
+
+class AhoCorasick:
+    """Multi-pattern matcher that finds every pattern occurrence in a single pass over the text."""
+
+    def __init__(self):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[List[Tuple[int, object]]] = [[]]
+        self._built = False
+
+    def add(self, pattern: str, value: object):
+        node = 0
+        for char in pattern:
+            nxt = self._goto[node].get(char)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[node][char] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+            node = nxt
+        self._out[node].append((len(pattern), value))
+        self._built = False
+
+    def build(self):
+        """Computes failure links breadth-first."""
+        queue = deque(self._goto[0].values())
+        for node in queue:
+            self._fail[node] = 0
+        while queue:
+            node = queue.popleft()
+            for char, child in self._goto[node].items():
+                queue.append(child)
+                fallback = self._fail[node]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(char, 0)
+                self._fail[child] = target if target != child else 0
+                self._out[child] = self._out[child] + self._out[self._fail[child]]
+        self._built = True
+
+    def iter_matches(self, text: str):
+        """Yields (start, end, value) for every occurrence of every pattern."""
+        if not self._built:
+            self.build()
+        node = 0
+        for index, char in enumerate(text):
+            while node and char not in self._goto[node]:
+                node = self._fail[node]
+            node = self._goto[node].get(char, 0)
+            for length, value in self._out[node]:
+                yield index - length + 1, index + 1, value
+
+
+def _is_acronym(alias: str) -> bool:
+    letters = [c for c in alias if c.isalpha()]
+    return len(alias) <= 6 and bool(letters) and all(c.isupper() for c in letters)
+
+
+# Words in an entity label -> the entities_by_type group it belongs to
+LABEL_CATEGORIES = {
+    "organization": "organizations", "organisation": "organizations", "org": "organizations",
+    "institution": "organizations", "company": "organizations", "body": "organizations",
+    "board": "organizations", "university": "organizations", "school": "organizations",
+    "location": "locations", "loc": "locations", "gpe": "locations", "place": "locations",
+    "state": "locations", "city": "locations", "district": "locations", "country": "locations",
+    "person": "persons", "per": "persons", "name": "persons", "official": "persons",
+    "date": "dates", "time": "dates", "year": "dates",
+}
+ENTITY_CATEGORIES = ["organizations", "locations", "persons", "dates", "other"]
+_LABEL_WORD_RE = re.compile(r"[a-z]+")
+_EDGE_PUNCTUATION = " \t\n.,;:!?'\"()[]{}*_-–—"
+
+
+def entity_category(label: str) -> str:
+    """Maps a label such as "ORGANIZATION" or "GPE" to its entities_by_type group, by whole words."""
+    for word in _LABEL_WORD_RE.findall((label or "").lower()):
+        if word in LABEL_CATEGORIES:
+            return LABEL_CATEGORIES[word]
+    return "other"
+
+
+def clean_entity_text(text: str) -> str:
+    """Collapses whitespace and strips quotes, brackets and trailing punctuation around an entity."""
+    return " ".join(str(text or "").split()).strip(_EDGE_PUNCTUATION)
+
+
+class GazetteerExtractor:
+    """Finds known Indian education entities and dates locally, without an LLM call."""
+
+    def __init__(self, gazetteers: Optional[List[Tuple[Dict[str, List[str]], str, str]]] = None):
+        self.matcher = AhoCorasick()
+        # Lowercased alias -> entry, for lookups of a complete entity string
+        self._aliases: Dict[str, Dict] = {}
+        for entries, label, kind in gazetteers or GAZETTEERS:
+            for canonical, aliases in entries.items():
+                for alias in [canonical] + aliases:
+                    entry = {
+                        "alias": alias,
+                        "canonical": canonical,
+                        "label": label,
+                        "kind": kind,
+                        "exact_case": _is_acronym(alias),
+                        "ambiguous": alias in AMBIGUOUS_ALIASES,
+                    }
+                    self.matcher.add(alias.lower(), entry)
+                    self._aliases.setdefault(alias.lower(), entry)
+        self.matcher.build()
+
+    def lookup(self, text: str, kind: Optional[str] = None) -> Optional[Dict]:
+        """The entry a whole entity string names ("Orissa" -> Odisha), or None.
+
+        Ambiguous aliases only resolve when kind says that kind of entity is
+        expected, e.g. "UP" -> Uttar Pradesh for kind="state".
+        """
+        text = clean_entity_text(text)
+        entry = self._aliases.get(text.lower())
+        if entry is None or (entry["exact_case"] and text != entry["alias"]):
+            return None
+        if entry["ambiguous"] and entry["kind"] != kind:
+            return None
+        return entry
+
+    @staticmethod
+    def _at_word_boundary(text: str, start: int, end: int) -> bool:
+        before = text[start - 1] if start > 0 else " "
+        after = text[end] if end < len(text) else " "
+        return not (before.isalnum() or after.isalnum())
+
+    def find(self, text: str) -> List[Dict]:
+        """Returns leftmost-longest, non-overlapping gazetteer and date matches with spans."""
+        lowered = text.lower()
+        if len(lowered) != len(text):
+            # A few characters change length when lowered; keep offsets aligned with text
+            lowered = "".join(c.lower() if len(c.lower()) == 1 else c for c in text)
+        candidates = []
+        ambiguous = []
+        state_lines = set()
+        for start, end, entry in self.matcher.iter_matches(lowered):
+            if not self._at_word_boundary(text, start, end):
+                continue
+            if entry["exact_case"] and text[start:end] != entry["alias"]:
+                continue
+            candidate = (start, end, entry["canonical"], entry["label"], entry["kind"])
+            if entry["ambiguous"]:
+                ambiguous.append(candidate)
+                continue
+            candidates.append(candidate)
+            if entry["kind"] == "state":
+                state_lines.add(text.rfind("\n", 0, start))
+        # "UP" counts in "Bihar, UP and Assam" but not in "MP Smith said"
+        candidates += [c for c in ambiguous if text.rfind("\n", 0, c[0]) in state_lines]
+        for match in DATE_RE.finditer(text):
+            candidates.append((match.start(), match.end(), match.group(0), "DATE", "date"))
+
+        matches = []
+        last_end = -1
+        for start, end, canonical, label, kind in sorted(candidates, key=lambda c: (c[0], -(c[1] - c[0]))):
+            if start < last_end:
+                continue
+            matches.append({"start": start, "end": end, "text": canonical, "label": label, "kind": kind})
+            last_end = end
+        return matches
+
+    def state_in(self, text: str) -> Optional[str]:
+        """Canonical name of the first state or UT mentioned in text, or None."""
+        for match in self.find(text):
+            if match["kind"] == "state":
+                return match["text"]
+        return None
+
+    def extract(self, text: str, matches: Optional[List[Dict]] = None) -> List[Dict]:
+        """Returns unique entities (canonical text and label) in order of first mention."""
+        seen = set()
+        entities = []
+        for match in matches if matches is not None else self.find(text):
+            key = (match["text"].lower(), match["label"])
+            if key in seen:
+                continue
+            seen.add(key)
+            entities.append({"text": match["text"], "label": match["label"], "source": "gazetteer"})
+        return entities
+
+    def residual(self, text: str, matches: Optional[List[Dict]] = None) -> str:
+        """Drops lines fully explained by local matches and numbers, such as state-wise table rows.
+
+        Whatever is left still needs the model, e.g. person names or
+        organisations that are not in a gazetteer.
+        """
+        if matches is None:
+            matches = self.find(text)
+        spans = iter(matches)
+        current = next(spans, None)
+        kept = []
+        offset = 0
+        for line in text.splitlines(keepends=True):
+            line_end = offset + len(line)
+            masked = list(line)
+            while current is not None and current["start"] < line_end:
+                for i in range(max(current["start"], offset), min(current["end"], line_end)):
+                    masked[i - offset] = " "
+                if current["end"] <= line_end:
+                    current = next(spans, None)
+                else:
+                    break
+            remainder = NUMBER_RE.sub(" ", "".join(masked))
+            # Blank lines and page rules are kept so chunking still sees paragraph and page breaks
+            if not line.strip() or not line.strip().strip("-") or _WORD_RE.search(remainder):
+                kept.append(line)
+            offset = line_end
+        return "".join(kept)
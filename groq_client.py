@@ -0,0 +1,235 @@
+import os
+import time
+import random
+import threading
+from typing import Dict, List, Optional
+
+from dotenv import load_dotenv
+
+import metrics
+from compaction import count_tokens
+
+load_dotenv()
+
+# Completion tokens assumed for a call that does not set max_tokens, until usage says otherwise
+COMPLETION_TOKEN_ESTIMATE = 1024
+# Prompt tokens assumed per attached image
+IMAGE_TOKEN_ESTIMATE = 1000
+
+
+class GroqCallError(Exception):
+    """Raised when a Groq call still fails after all retries, or fails in a way retrying cannot fix."""
+
+
+class TokenBucket:
+    """A bucket of per_minute units that refills continuously."""
+
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.level = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        """Seconds until amount units are available (a request larger than the bucket waits for a full one)."""
+        self._refill(now)
+        amount = min(amount, self.capacity)
+        return 0.0 if self.level >= amount else (amount - self.level) / self.rate
+
+    def take(self, amount: float):
+        # May go negative when usage turns out larger than estimated; later callers then wait longer
+        self.level -= amount
+
+
+class RateLimiter:
+    """Requests-per-minute and tokens-per-minute buckets for one model, shared by all threads.
+
+    A limit of 0 disables that bucket.
+    """
+
+    def __init__(self, rpm: float, tpm: float):
+        self.requests = TokenBucket(rpm) if rpm else None
+        self.tokens = TokenBucket(tpm) if tpm else None
+        self.blocked_until = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens: int) -> float:
+        """Blocks until one request of `tokens` tokens fits both limits. Returns seconds waited."""
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                wait = self.blocked_until - now
+                if self.requests is not None:
+                    wait = max(wait, self.requests.wait_time(1, now))
+                if self.tokens is not None:
+                    wait = max(wait, self.tokens.wait_time(tokens, now))
+                if wait <= 0:
+                    if self.requests is not None:
+                        self.requests.take(1)
+                    if self.tokens is not None:
+                        self.tokens.take(tokens)
+                    return waited
+            time.sleep(wait)
+            waited += wait
+
+    def pause(self, seconds: float):
+        """Holds back every caller, e.g. after the server answered 429."""
+        with self._lock:
+            self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+
+    def settle(self, estimated: int, actual: int):
+        """Corrects the token bucket once the real usage of a call is known."""
+        if self.tokens is None:
+            return
+        with self._lock:
+            self.tokens.take(actual - estimated)
+
+
+def estimate_tokens(messages: List[Dict], max_tokens: Optional[int] = None) -> int:
+    """Prompt plus expected completion tokens for a chat request."""
+    total = 0
+    for message in messages:
+        content = message.get("content")
+        if isinstance(content, str):
+            total += count_tokens(content)
+            continue
+        for part in content or []:
+            if part.get("type") == "text":
+                total += count_tokens(part.get("text", ""))
+            else:
+                total += IMAGE_TOKEN_ESTIMATE
+    return total + (max_tokens or COMPLETION_TOKEN_ESTIMATE)
+
+
+def _status_code(error: Exception) -> Optional[int]:
+    return getattr(error, "status_code", None)
+
+
+def _retry_after(error: Exception) -> Optional[float]:
+    response = getattr(error, "response", None)
+    value = response.headers.get("retry-after") if response is not None else None
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+def is_retryable(error: Exception) -> bool:
+    """Rate limits, server errors, timeouts and dropped connections are worth retrying."""
+    import groq
+    if isinstance(error, groq.APIConnectionError):
+        return True
+    status = _status_code(error)
+    return status is not None and (status in (408, 409, 429) or status >= 500)
+
+
+class GroqClient:
+    """One Groq connection pool shared by every processor and thread.
+
+    Each chat() call first waits for room under the model's RPM/TPM limits,
+    then retries rate limits, 5xx responses, timeouts and connection errors
+    with exponential backoff and full jitter. Anything else, or running out
+    of retries, raises GroqCallError instead of returning an empty result.
+
+    The SDK is imported and its HTTP client built on the first request (or
+    warm_up()), so constructing a GroqClient is cheap and works without a key.
+    """
+
+    def __init__(self, api_key: Optional[str] = None, timeout: Optional[float] = None,
+                 max_retries: Optional[int] = None, rpm: Optional[float] = None,
+                 tpm: Optional[float] = None, backoff_base: Optional[float] = None,
+                 backoff_max: Optional[float] = None):
+        self.timeout = timeout or float(os.getenv("GROQ_TIMEOUT_SECONDS", "60"))
+        self.max_retries = max_retries if max_retries is not None else int(os.getenv("GROQ_MAX_RETRIES", "5"))
+        self.rpm = rpm if rpm is not None else float(os.getenv("GROQ_RPM", "30"))
+        self.tpm = tpm if tpm is not None else float(os.getenv("GROQ_TPM", "12000"))
+        self.backoff_base = backoff_base or float(os.getenv("GROQ_BACKOFF_BASE", "1"))
+        self.backoff_max = backoff_max or float(os.getenv("GROQ_BACKOFF_MAX", "60"))
+        self.api_key = api_key
+        self._client = None
+        self._limiters: Dict[str, RateLimiter] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def client(self):
+        """The Groq SDK client, created on first use."""
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    api_key = self.api_key or os.getenv("GROQ_API_KEY")
+                    if not api_key:
+                        raise ValueError("GROQ_API_KEY not found in environment!")
+                    from groq import Groq
+                    # The SDK's own retries are off so every attempt goes through the limiter
+                    self._client = Groq(api_key=api_key, timeout=self.timeout, max_retries=0)
+        return self._client
+
+    def warm_up(self):
+        """Imports the SDK and opens its HTTP client ahead of the first request."""
+        return self.client
+
+    def limiter(self, model: str) -> RateLimiter:
+        """Groq enforces limits per model, so each model gets its own buckets."""
+        with self._lock:
+            if model not in self._limiters:
+                self._limiters[model] = RateLimiter(self.rpm, self.tpm)
+            return self._limiters[model]
+
+    def _backoff(self, attempt: int, error: Exception) -> float:
+        delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+        # Never retry sooner than the server asked
+        return max(delay, _retry_after(error) or 0.0)
+
+    def chat(self, messages: List[Dict], model: str, **kwargs):
+        """Sends a chat completion request, waiting and retrying as needed.
+
+        Latency, rate-limit waits, retries and token usage are recorded in metrics.
+        """
+        estimate = estimate_tokens(messages, kwargs.get("max_tokens"))
+        limiter = self.limiter(model)
+        start = time.time()
+        waited = 0.0
+        attempt = 0
+        while True:
+            waited += limiter.acquire(estimate)
+            try:
+                completion = self.client.chat.completions.create(messages=messages, model=model, **kwargs)
+            except Exception as e:
+                if not is_retryable(e) or attempt >= self.max_retries:
+                    metrics.record_call(model, time.time() - start, retries=attempt,
+                                        wait_seconds=waited, ok=False)
+                    raise GroqCallError(f"{model} request failed after {attempt + 1} attempt(s): {e}") from e
+                delay = self._backoff(attempt, e)
+                if _status_code(e) == 429:
+                    limiter.pause(delay)
+                print(f"Groq {model} request failed ({e}); retry {attempt + 1}/{self.max_retries} in {delay:.1f}s")
+                time.sleep(delay)
+                waited += delay
+                attempt += 1
+                continue
+            usage = getattr(completion, "usage", None)
+            if usage is not None and getattr(usage, "total_tokens", None):
+                limiter.settle(estimate, usage.total_tokens)
+            metrics.record_call(model, time.time() - start,
+                                prompt_tokens=getattr(usage, "prompt_tokens", 0) or 0,
+                                completion_tokens=getattr(usage, "completion_tokens", 0) or 0,
+                                retries=attempt, wait_seconds=waited)
+            return completion
+
+
+_shared_client: Optional[GroqClient] = None
+_shared_lock = threading.Lock()
+
+
+def get_client() -> GroqClient:
+    """Returns the process-wide client, creating it on first use."""
+    global _shared_client
+    with _shared_lock:
+        if _shared_client is None:
+            _shared_client = GroqClient()
+        return _shared_client
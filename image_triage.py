@@ -0,0 +1,123 @@
+import io
+import os
+import importlib.util
+from typing import Dict, Optional
+
+# Pillow itself is imported when the first image is decoded
+HAS_PIL = importlib.util.find_spec("PIL") is not None
+if not HAS_PIL:
+    print("Warning: Pillow not found. Images will be sent to vision without resizing.")
+
+# Formats the vision API accepts as-is
+MIME_TYPES = {
+    "jpg": "image/jpeg",
+    "jpeg": "image/jpeg",
+    "png": "image/png",
+    "gif": "image/gif",
+    "webp": "image/webp",
+}
+
+
+class ImageTriage:
+    """Filters and shrinks extracted images before they are sent to the vision model.
+
+    Cheap checks run first (byte size, pixel size from PDF metadata), then the
+    image is decoded once to classify it as chart/table-like or decorative
+    and to downscale and recompress it to a JPEG of at most max_side pixels.
+    """
+
+    def __init__(self, min_bytes: Optional[int] = None, min_side: Optional[int] = None,
+                 max_side: Optional[int] = None, jpeg_quality: Optional[int] = None,
+                 keep_decorative: Optional[bool] = None):
+        self.min_bytes = min_bytes if min_bytes is not None else int(os.getenv("IMAGE_MIN_BYTES", "2048"))
+        self.min_side = min_side if min_side is not None else int(os.getenv("IMAGE_MIN_SIDE", "64"))
+        self.max_side = max_side if max_side is not None else int(os.getenv("IMAGE_MAX_SIDE", "1024"))
+        self.jpeg_quality = jpeg_quality if jpeg_quality is not None else int(os.getenv("IMAGE_JPEG_QUALITY", "80"))
+        if keep_decorative is None:
+            keep_decorative = os.getenv("IMAGE_KEEP_DECORATIVE", "0") == "1"
+        self.keep_decorative = keep_decorative
+
+    def prefilter(self, image: Dict) -> Optional[str]:
+        """Returns a skip reason from metadata alone, or None if the image needs a closer look."""
+        if len(image["bytes"]) < self.min_bytes:
+            return "too_small_bytes"
+        width, height = image.get("width", 0), image.get("height", 0)
+        if width and height and min(width, height) < self.min_side:
+            return "too_small_pixels"
+        return None
+
+    @staticmethod
+    def classify(img) -> str:
+        """Labels a decoded image as "chart", "decorative" or "blank" using colour statistics."""
+        from PIL import ImageStat
+        rgb = img.convert("RGB")
+        width, height = rgb.size
+        if max(width, height) > 8 * min(width, height):
+            # Rules, borders and header banners
+            return "decorative"
+
+        small = rgb.resize((64, 64))
+        if max(ImageStat.Stat(small).stddev) < 4:
+            return "blank"
+
+        pixels = 64 * 64
+        # Charts and tables sit on a light background and use a handful of flat colours,
+        # photos have few light pixels and a long tail of distinct colours
+        light = sum(1 for r, g, b in small.getdata() if r > 230 and g > 230 and b > 230) / pixels
+        posterized = small.point(lambda v: v // 32 * 32)
+        distinct = len(posterized.getcolors(maxcolors=pixels) or [])
+        if light >= 0.35 or distinct <= 48:
+            return "chart"
+        return "decorative"
+
+    def prepare(self, image: Dict) -> Dict:
+        """Triage one extracted image.
+
+        Returns a dict with "keep", "kind" and, for kept images, the "bytes"
+        and "mime" to upload.
+        """
+        reason = self.prefilter(image)
+        if reason:
+            return {"keep": False, "kind": reason}
+
+        if not HAS_PIL:
+            mime = MIME_TYPES.get(image.get("ext", "").lower())
+            if not mime:
+                return {"keep": False, "kind": "unsupported_format"}
+            return {"keep": True, "kind": "unknown", "bytes": image["bytes"], "mime": mime}
+
+        from PIL import Image
+        try:
+            img = Image.open(io.BytesIO(image["bytes"]))
+            img.load()
+        except Exception as e:
+            print(f"Could not decode {image.get('label', 'image')}: {e}")
+            return {"keep": False, "kind": "undecodable"}
+
+        original_size = img.size
+        if min(img.size) < self.min_side:
+            return {"keep": False, "kind": "too_small_pixels"}
+
+        kind = self.classify(img)
+        if kind == "blank" or (kind == "decorative" and not self.keep_decorative):
+            return {"keep": False, "kind": kind}
+
+        if img.mode in ("RGBA", "LA", "P"):
+            # Flatten transparency onto white so charts stay legible as JPEG
+            img = img.convert("RGBA")
+            background = Image.new("RGB", img.size, (255, 255, 255))
+            background.paste(img, mask=img.split()[-1])
+            img = background
+        else:
+            img = img.convert("RGB")
+        img.thumbnail((self.max_side, self.max_side))
+
+        buffer = io.BytesIO()
+        img.save(buffer, format="JPEG", quality=self.jpeg_quality, optimize=True)
+        data = buffer.getvalue()
+        # Small originals can grow when re-encoded, keep whichever is smaller
+        if len(data) >= len(image["bytes"]) and img.size == original_size \
+                and image.get("ext", "").lower() in MIME_TYPES:
+            return {"keep": True, "kind": kind, "bytes": image["bytes"],
+                    "mime": MIME_TYPES[image["ext"].lower()]}
+        return {"keep": True, "kind": kind, "bytes": data, "mime": "image/jpeg"}
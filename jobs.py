@@ -0,0 +1,182 @@
+import os
+import json
+import time
+import uuid
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Any, Tuple
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+FINISHED_STATES = (DONE, FAILED, CANCELLED)
+
+
+class QueueFullError(Exception):
+    """Raised when a job is submitted while the queue is at its limit."""
+
+
+class Job:
+    """A unit of background work and its bookkeeping."""
+
+    def __init__(self, job_id: str, meta: Optional[Dict] = None):
+        self.id = job_id
+        self.meta = meta or {}
+        self.status = QUEUED
+        self.result: Any = None
+        self.error: Optional[str] = None
+        self.cancel_event = threading.Event()
+        self.future = None
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        # Progress events, serialized when emitted so later mutation of payloads is harmless
+        self.events: List[str] = []
+        self._events_cond = threading.Condition()
+
+    def emit(self, event: Dict):
+        """Records a progress event and wakes any listeners."""
+        data = json.dumps(event, ensure_ascii=False, default=str)
+        with self._events_cond:
+            self.events.append(data)
+            self._events_cond.notify_all()
+
+    def wait_events(self, after: int, timeout: float) -> Tuple[List[str], bool]:
+        """Returns events from index after onwards, waiting up to timeout for new ones,
+        and whether the job has finished."""
+        with self._events_cond:
+            if len(self.events) <= after and self.status not in FINISHED_STATES:
+                self._events_cond.wait(timeout)
+            return self.events[after:], self.status in FINISHED_STATES
+
+    def _set_status(self, status: str):
+        self.status = status
+        self.emit({"stage": "job", "status": status, "error": self.error})
+
+    def to_dict(self) -> Dict:
+        now = time.time()
+        started = self.started_at or now
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "error": self.error,
+            **self.meta,
+            "timings": {
+                "created_at": self.created_at,
+                "started_at": self.started_at,
+                "finished_at": self.finished_at,
+                "queued_seconds": round(started - self.created_at, 3),
+                "run_seconds": round((self.finished_at or now) - started, 3) if self.started_at else None,
+            },
+        }
+
+
+class JobManager:
+    """Runs submitted callables on a bounded thread pool and tracks their state.
+
+    The callable receives the job's cancel_event and a progress callback
+    (Job.emit) as keyword arguments and is expected to check the event
+    between stages. Finished jobs are kept for job_ttl seconds so clients
+    can still fetch their results.
+    """
+
+    def __init__(self, max_workers: Optional[int] = None, max_queued: Optional[int] = None,
+                 job_ttl: Optional[float] = None):
+        self.max_workers = max_workers or int(os.getenv("JOB_WORKERS", "2"))
+        self.max_queued = max_queued if max_queued is not None else int(os.getenv("JOB_QUEUE_LIMIT", "100"))
+        self.job_ttl = job_ttl if job_ttl is not None else float(os.getenv("JOB_TTL_SECONDS", "3600"))
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="job")
+        self._jobs: Dict[str, Job] = {}
+        self._lock = threading.Lock()
+
+    def submit(self, func: Callable, *args, meta: Optional[Dict] = None, **kwargs) -> Job:
+        """Queues func(*args, cancel_event=..., progress=..., **kwargs) and returns its Job."""
+        self._prune()
+        with self._lock:
+            queued = sum(1 for job in self._jobs.values() if job.status == QUEUED)
+            if self.max_queued and queued >= self.max_queued:
+                raise QueueFullError(f"Job queue is full ({queued} waiting)")
+            job = Job(str(uuid.uuid4()), meta)
+            job._set_status(QUEUED)
+            self._jobs[job.id] = job
+        job.future = self._executor.submit(self._run, job, func, args, kwargs)
+        return job
+
+    def _run(self, job: Job, func: Callable, args: tuple, kwargs: dict):
+        with self._lock:
+            if job.cancel_event.is_set():
+                return
+            job.started_at = time.time()
+            job._set_status(RUNNING)
+        try:
+            result = func(*args, cancel_event=job.cancel_event, progress=job.emit, **kwargs)
+            status = CANCELLED if job.cancel_event.is_set() else DONE
+            with self._lock:
+                job.result = result if status == DONE else None
+                job.finished_at = time.time()
+                job._set_status(status)
+        except Exception as e:
+            print(f"Job {job.id} failed: {traceback.format_exc()}")
+            with self._lock:
+                cancelled = job.cancel_event.is_set()
+                job.error = None if cancelled else str(e)
+                job.finished_at = time.time()
+                job._set_status(CANCELLED if cancelled else FAILED)
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def cancel(self, job_id: str) -> Optional[Job]:
+        """Cancels a queued job immediately, or asks a running one to stop at its next stage."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job.status in FINISHED_STATES:
+                return job
+            job.cancel_event.set()
+            if job.status == QUEUED:
+                job.future.cancel()
+                job.finished_at = time.time()
+                job._set_status(CANCELLED)
+        return job
+
+    def queue_position(self, job_id: str) -> Optional[int]:
+        """1-based position among queued jobs, or None if the job is not waiting."""
+        with self._lock:
+            queued = sorted((j for j in self._jobs.values() if j.status == QUEUED),
+                            key=lambda j: j.created_at)
+        for position, job in enumerate(queued, start=1):
+            if job.id == job_id:
+                return position
+        return None
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            counts = {state: 0 for state in (QUEUED, RUNNING) + FINISHED_STATES}
+            run_times = []
+            for job in self._jobs.values():
+                counts[job.status] += 1
+                if job.status == DONE and job.started_at and job.finished_at:
+                    run_times.append(job.finished_at - job.started_at)
+        return {
+            "workers": self.max_workers,
+            "queue_depth": counts[QUEUED],
+            "running": counts[RUNNING],
+            "counts": counts,
+            "avg_run_seconds": round(sum(run_times) / len(run_times), 3) if run_times else None,
+        }
+
+    def _prune(self):
+        """Forgets finished jobs older than job_ttl."""
+        if not self.job_ttl:
+            return
+        cutoff = time.time() - self.job_ttl
+        with self._lock:
+            expired = [job_id for job_id, job in self._jobs.items()
+                       if job.status in FINISHED_STATES and (job.finished_at or 0) < cutoff]
+            for job_id in expired:
+                del self._jobs[job_id]
@@ -2,7 +2,6 @@ import os
 import json
 import tkinter as tk
 from tkinter import filedialog, scrolledtext, messagebox
-import pandas as pd
 from pipeline import Pipeline
 
 class ExtractionApp:
@@ -11,7 +10,8 @@ class ExtractionApp:
         self.root.title("Groq Data Extraction Pipeline")
         self.root.geometry("800x600")
         
-        self.pipeline = Pipeline()
+        # Built on the first run, so the window opens without waiting for it
+        self.pipeline = None
         self.current_data = None
         self.selected_file = None
 
@@ -65,6 +65,8 @@ class ExtractionApp:
         
         try:
             # Run the pipeline
+            if self.pipeline is None:
+                self.pipeline = Pipeline()
             self.current_data = self.pipeline.run(self.selected_file, save_json=False)
             
             # Display Result
@@ -101,6 +103,7 @@ class ExtractionApp:
         if not save_path:
             return
 
+        import pandas as pd
         try:
             # Flatten data for CSV
             # 1. Entities
@@ -0,0 +1,221 @@
+import threading
+import contextvars
+from concurrent.futures import Executor, Future
+from typing import Callable, Dict, List, Optional, Tuple, Any
+
+# Upper bounds, in seconds, of the latency histogram buckets
+LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+
+
+def _label_text(labels: Tuple[Tuple[str, str], ...]) -> str:
+    if not labels:
+        return ""
+    escaped = (f'{name}="{str(value).replace(chr(92), chr(92) * 2).replace(chr(34), chr(92) + chr(34))}"'
+               for name, value in labels)
+    return "{" + ",".join(escaped) + "}"
+
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class Registry:
+    """Process-wide counters and histograms, rendered in Prometheus text format."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._help: Dict[str, Tuple[str, str]] = {}
+        # Gauges share the counter table; only their TYPE line differs
+        self._counters: Dict[Tuple[str, tuple], float] = {}
+        self._histograms: Dict[Tuple[str, tuple], List[float]] = {}
+
+    def describe(self, name: str, kind: str, text: str):
+        self._help[name] = (kind, text)
+
+    def inc(self, name: str, value: float = 1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def set(self, name: str, value: float, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = value
+
+    def observe(self, name: str, value: float, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            # One slot per bucket, then sum and count
+            state = self._histograms.setdefault(key, [0.0] * (len(LATENCY_BUCKETS) + 2))
+            for i, bound in enumerate(LATENCY_BUCKETS):
+                if value <= bound:
+                    state[i] += 1
+            state[-2] += value
+            state[-1] += 1
+
+    def render(self, extra: Optional[Dict[str, Tuple[str, str, float]]] = None) -> str:
+        """Prometheus exposition text; extra adds gauges as {name: (help, labels_text, value)}."""
+        with self._lock:
+            counters = dict(self._counters)
+            histograms = {key: list(state) for key, state in self._histograms.items()}
+        lines = []
+        names = sorted({name for name, _ in counters} | {name for name, _ in histograms})
+        for name in names:
+            kind, text = self._help.get(name, ("untyped", ""))
+            lines.append(f"# HELP {name} {text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for (metric, labels), value in sorted(counters.items()):
+                if metric == name:
+                    lines.append(f"{name}{_label_text(labels)} {_format_value(value)}")
+            for (metric, labels), state in sorted(histograms.items()):
+                if metric != name:
+                    continue
+                for bound, count in zip(LATENCY_BUCKETS, state):
+                    lines.append(f"{name}_bucket{_label_text(labels + (('le', str(bound)),))} {_format_value(count)}")
+                lines.append(f"{name}_bucket{_label_text(labels + (('le', '+Inf'),))} {_format_value(state[-1])}")
+                lines.append(f"{name}_sum{_label_text(labels)} {_format_value(state[-2])}")
+                lines.append(f"{name}_count{_label_text(labels)} {_format_value(state[-1])}")
+        for name, (text, labels, value) in sorted((extra or {}).items()):
+            lines.append(f"# HELP {name} {text}")
+            lines.append(f"# TYPE {name} gauge")
+            lines.append(f"{name}{labels} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+REGISTRY.describe("pipeline_runs_total", "counter", "Pipeline runs by outcome")
+REGISTRY.describe("pipeline_stage_seconds", "histogram", "Wall time of each pipeline stage")
+REGISTRY.describe("pipeline_run_seconds", "histogram", "Wall time of whole pipeline runs")
+REGISTRY.describe("pipeline_pages_total", "counter", "PDF pages ingested")
+REGISTRY.describe("pipeline_images_total", "counter", "Embedded images found, by outcome")
+REGISTRY.describe("groq_requests_total", "counter", "Groq chat requests by model and outcome")
+REGISTRY.describe("groq_request_seconds", "histogram", "Groq request latency including retries and rate-limit waits")
+REGISTRY.describe("groq_tokens_total", "counter", "Tokens reported by Groq usage, by model and kind")
+REGISTRY.describe("groq_retries_total", "counter", "Groq request retries by model")
+REGISTRY.describe("pipeline_chunk_failures_total", "counter", "Chunks dropped after malformed model JSON, by stage")
+REGISTRY.describe("cache_requests_total", "counter", "Cache lookups by cache and result")
+REGISTRY.describe("startup_seconds", "gauge", "Cold start cost by phase: import, pipeline_init, warm_up, first_request")
+
+
+class RunStats:
+    """Groq usage and cache lookups attributed to one pipeline run."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.models: Dict[str, Dict[str, float]] = {}
+        self.caches: Dict[str, Dict[str, int]] = {}
+        # Chunks whose extraction was dropped, by stage
+        self.failures: Dict[str, int] = {}
+
+    def record_call(self, model: str, seconds: float, prompt_tokens: int, completion_tokens: int,
+                    retries: int, wait_seconds: float, ok: bool):
+        with self._lock:
+            entry = self.models.setdefault(model, {
+                "calls": 0, "errors": 0, "retries": 0, "prompt_tokens": 0,
+                "completion_tokens": 0, "seconds": 0.0, "wait_seconds": 0.0,
+            })
+            entry["calls"] += 1
+            entry["errors"] += 0 if ok else 1
+            entry["retries"] += retries
+            entry["prompt_tokens"] += prompt_tokens
+            entry["completion_tokens"] += completion_tokens
+            entry["seconds"] += seconds
+            entry["wait_seconds"] += wait_seconds
+
+    def record_cache(self, cache: str, hit: bool):
+        with self._lock:
+            entry = self.caches.setdefault(cache, {"hits": 0, "misses": 0})
+            entry["hits" if hit else "misses"] += 1
+
+    def record_failure(self, stage: str):
+        with self._lock:
+            self.failures[stage] = self.failures.get(stage, 0) + 1
+
+    def failure_count(self) -> int:
+        with self._lock:
+            return sum(self.failures.values())
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            models = {model: {k: round(v, 3) if isinstance(v, float) else v for k, v in entry.items()}
+                      for model, entry in self.models.items()}
+            caches = {name: dict(entry) for name, entry in self.caches.items()}
+            failures = dict(self.failures)
+        return {
+            "groq": models,
+            "tokens": {
+                "prompt": sum(entry["prompt_tokens"] for entry in models.values()),
+                "completion": sum(entry["completion_tokens"] for entry in models.values()),
+            },
+            "retries": sum(entry["retries"] for entry in models.values()),
+            "cache": caches,
+            "failures": failures,
+        }
+
+
+_current_run: contextvars.ContextVar = contextvars.ContextVar("current_run", default=None)
+
+
+def start_run() -> Tuple[RunStats, contextvars.Token]:
+    """Makes a fresh RunStats current for this context; pass the token to end_run()."""
+    stats = RunStats()
+    return stats, _current_run.set(stats)
+
+
+def end_run(token: contextvars.Token):
+    _current_run.reset(token)
+
+
+def submit(executor: Executor, func: Callable, *args, **kwargs) -> Future:
+    """executor.submit that carries the current run over to the worker thread."""
+    return executor.submit(contextvars.copy_context().run, func, *args, **kwargs)
+
+
+def record_call(model: str, seconds: float, prompt_tokens: int = 0, completion_tokens: int = 0,
+                retries: int = 0, wait_seconds: float = 0.0, ok: bool = True):
+    """Records one Groq request, after any retries, globally and on the current run."""
+    REGISTRY.inc("groq_requests_total", model=model, status="ok" if ok else "error")
+    REGISTRY.observe("groq_request_seconds", seconds, model=model)
+    REGISTRY.inc("groq_tokens_total", prompt_tokens, model=model, kind="prompt")
+    REGISTRY.inc("groq_tokens_total", completion_tokens, model=model, kind="completion")
+    if retries:
+        REGISTRY.inc("groq_retries_total", retries, model=model)
+    run = _current_run.get()
+    if run is not None:
+        run.record_call(model, seconds, prompt_tokens, completion_tokens, retries, wait_seconds, ok)
+
+
+def record_cache(cache: str, hit: bool):
+    REGISTRY.inc("cache_requests_total", cache=cache, result="hit" if hit else "miss")
+    run = _current_run.get()
+    if run is not None:
+        run.record_cache(cache, hit)
+
+
+def record_failure(stage: str):
+    """Records a chunk whose extraction was dropped, globally and on the current run."""
+    REGISTRY.inc("pipeline_chunk_failures_total", stage=stage)
+    run = _current_run.get()
+    if run is not None:
+        run.record_failure(stage)
+
+
+def record_stage(stage: str, seconds: float):
+    REGISTRY.observe("pipeline_stage_seconds", seconds, stage=stage)
+
+
+def record_startup(phase: str, seconds: float):
+    print(f"Startup: {phase} took {seconds:.3f}s")
+    REGISTRY.set("startup_seconds", round(seconds, 6), phase=phase)
+
+
+def record_run(status: str, seconds: Optional[float] = None, pages: int = 0, images: Optional[Dict] = None):
+    REGISTRY.inc("pipeline_runs_total", status=status)
+    if seconds is not None:
+        REGISTRY.observe("pipeline_run_seconds", seconds)
+    if pages:
+        REGISTRY.inc("pipeline_pages_total", pages)
+    for outcome, count in (images or {}).items():
+        if count:
+            REGISTRY.inc("pipeline_images_total", count, outcome=outcome)
+
@@ -2,7 +2,8 @@ import os
 import json
 import csv
 from dotenv import load_dotenv
-from groq import Groq
+from compaction import truncate_to_tokens
+from groq_client import GroqClient, get_client
 
 # Load API key
 load_dotenv()
@@ -12,11 +13,24 @@ if not API_KEY:
     print("WARNING: GROQ_API_KEY not found in .env file. Please set it.")
 
 class NERProcessor:
-    def __init__(self, api_key=None):
-        self.client = Groq(api_key=api_key or API_KEY)
+    # Largest slice of text, in tokens, sent in a single NER prompt
+    MAX_TEXT_TOKENS = int(os.getenv("NER_TOKEN_BUDGET", "2000"))
+
+    def __init__(self, api_key=None, client=None):
+        # Shares one rate-limited connection pool with the rest of the pipeline unless
+        # a different key is given
+        self.client = client or (GroqClient(api_key=api_key) if api_key else get_client())
         self.model = "llama-3.1-70b-versatile" # Good balance of speed and smarts
 
-    def extract_entities(self, text):
+    def extract_entities(self, text, known=None):
+        # Entities already found locally are listed so the model only returns new ones
+        known_section = ""
+        if known:
+            names = "; ".join(f"{e['text']} ({e['label']})" for e in known)
+            known_section = f"""
+        Already identified (do NOT repeat these or their abbreviations): {names}
+        """
+
         prompt = f"""
         Extract named entities from the following text, focusing on Indian education context.
         Identify: Organizations (schools, universities, government bodies), Locations (states, cities, districts),
@@ -26,37 +40,32 @@ class NERProcessor:
         Each object should have "text" (the entity text) and "label" (the entity type).
         
         Entity types should be: ORGANIZATION, LOCATION, PERSON, DATE, POLICY_SCHEME, EDUCATION_TERM, or OTHER.
-        
+        {known_section}
         Text:
-        {text[:8000]} 
+        {truncate_to_tokens(text, self.MAX_TEXT_TOKENS)} 
         """
 
-        try:
-            chat_completion = self.client.chat.completions.create(
-                messages=[
-                    {
-                        "role": "user",
-                        "content": prompt,
-                    }
-                ],
-                model=self.model,
-                response_format={"type": "json_object"}, 
-            )
-            
-            content = chat_completion.choices[0].message.content
-            # Ensure it's parsed as JSON
-            data = json.loads(content)
-            # Handle cases where the model wraps it in a key like "entities"
-            if isinstance(data, dict):
-               if "entities" in data:
-                   return data["entities"]
-               # If it's just a dict, maybe the model misunderstood, or it's a single object
-               return [data] if data else []
-            return data if isinstance(data, list) else []
-
-        except Exception as e:
-            print(f"Error calling Groq API: {e}")
-            return []
+        chat_completion = self.client.chat(
+            messages=[
+                {
+                    "role": "user",
+                    "content": prompt,
+                }
+            ],
+            model=self.model,
+            response_format={"type": "json_object"}, 
+        )
+        
+        content = chat_completion.choices[0].message.content
+        # Ensure it's parsed as JSON
+        data = json.loads(content)
+        # Handle cases where the model wraps it in a key like "entities"
+        if isinstance(data, dict):
+           if "entities" in data:
+               return data["entities"]
+           # If it's just a dict, maybe the model misunderstood, or it's a single object
+           return [data] if data else []
+        return data if isinstance(data, list) else []
 
     def save_to_csv(self, entities, output_file):
         if not entities:
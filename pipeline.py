@@ -2,25 +2,84 @@ import json
 import base64
 import sys
 import os
+import time
+import hashlib
+import threading
+import importlib.util
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, Future
 
-from typing import List, Dict, Optional
-try:
-    import pymupdf4llm
-    HAS_PYMUPDF4LLM = True
-except ImportError:
-    HAS_PYMUPDF4LLM = False
+from typing import List, Dict, Optional, Tuple, Iterator, Iterable, Callable
+# PyMuPDF (fitz) and pymupdf4llm are imported where documents are opened, so importing
+# this module (and app.py) stays cheap; warm_up() loads them ahead of the first run
+HAS_PYMUPDF4LLM = importlib.util.find_spec("pymupdf4llm") is not None
+if not HAS_PYMUPDF4LLM:
     print("Warning: pymupdf4llm not found. Using simple text extraction.")
 
-from groq import Groq
-from pydantic import BaseModel, Field
 from dotenv import load_dotenv
-import pandas as pd
-import fitz  # PyMuPDF
 from ner_groq import NERProcessor
+from groq_client import GroqClient, get_client
+from chunking import split_markdown, merge_extractions, merge_entities
+from cache import DiskCache, file_sha256, make_key
+from stages import Stage, StageGraph
+import metrics
+from gazetteer import GazetteerExtractor, ENTITY_CATEGORIES, entity_category, clean_entity_text
+from compaction import compact, count_tokens, truncate_to_tokens, chars_for_tokens, pack_to_budget
+from image_triage import ImageTriage, HAS_PIL
+from tables import TABLES_VERSION, page_tables, replace_markdown_tables, text_without_tables, table_text, merge_native_tables
 
 # Load environment variables
 load_dotenv()
 
+# Bump whenever a prompt changes so cached results from older prompts are not reused
+PROMPT_VERSION = "2"
+
+# Extraction schema - Optimized for Indian Education Data
+EDUCATION_SCHEMA = """
+        {
+            "summary": "Comprehensive summary of the education document focusing on Indian education system, policies, statistics, or reports",
+            "document_type": "Type of document (e.g., Policy Document, Statistical Report, Research Paper, Government Circular)",
+            "education_levels": ["List of education levels mentioned (e.g., Primary, Secondary, Higher Education, Vocational)"],
+            "states_mentioned": ["List of Indian states/UTs mentioned in the document"],
+            "organizations": ["List of educational institutions, government bodies, NGOs mentioned"],
+            "key_statistics": [
+                {
+                    "metric": "Name of the statistic (e.g., Enrollment Rate, Literacy Rate, Dropout Rate)",
+                    "value": "Numerical value or percentage",
+                    "context": "Additional context about the statistic"
+                }
+            ],
+            "policies_schemes": [
+                {
+                    "name": "Name of policy or scheme",
+                    "description": "Brief description",
+                    "target_audience": "Who it targets"
+                }
+            ],
+            "tables": [
+                {
+                    "title": "Title of a table or chart that is NOT shown as a [Table T<n> ...] marker",
+                    "data": [
+                        { "column_1": "value", "column_2": "value" }
+                    ]
+                }
+            ],
+            "table_titles": [
+                {
+                    "ref": "Reference of a [Table T<n> ...] marker, e.g. T1; its rows are already extracted, do not repeat them",
+                    "title": "Title of that table",
+                    "notes": "One sentence on what the table shows"
+                }
+            ],
+            "key_dates": ["Important dates mentioned in the document"],
+            "budget_financials": {
+                "total_budget": "Total budget amount if mentioned",
+                "currency": "Currency (usually INR)",
+                "breakdown": "Breakdown of budget allocation if available"
+            }
+        }
+        """
+
 class DocumentIngestor:
     """Handles loading and converting documents."""
     
@@ -28,8 +87,10 @@ class DocumentIngestor:
     def to_markdown(file_path: str) -> str:
         """Converts PDF to Markdown, preserving layout and tables."""
         print(f"Converting {file_path} to Markdown...")
+        import fitz  # PyMuPDF
         try:
             if HAS_PYMUPDF4LLM:
+                import pymupdf4llm
                 # pymupdf4llm is excellent at preserving table structure in markdown
                 md_text = pymupdf4llm.to_markdown(file_path)
                 return md_text
@@ -50,6 +111,7 @@ class DocumentIngestor:
         if not os.path.exists(output_dir):
             os.makedirs(output_dir)
             
+        import fitz  # PyMuPDF
         image_paths = []
         doc = fitz.open(file_path)
         
@@ -69,50 +131,316 @@ class DocumentIngestor:
                 
         return image_paths
 
+    @staticmethod
+    def page_images(doc, page, page_index: int, seen_xrefs: set,
+                    debug_dir: Optional[str] = None) -> Iterator[Dict]:
+        """Yields the images on one page whose xref is not in seen_xrefs."""
+        for img_index, img in enumerate(page.get_images(full=True)):
+            xref = img[0]
+            if xref in seen_xrefs:
+                continue
+            seen_xrefs.add(xref)
+            base_image = doc.extract_image(xref)
+            if not base_image:
+                continue
+            label = f"page_{page_index+1}_img_{img_index}"
+            if debug_dir:
+                os.makedirs(debug_dir, exist_ok=True)
+                with open(os.path.join(debug_dir, f"{label}.{base_image['ext']}"), "wb") as f:
+                    f.write(base_image["image"])
+            yield {
+                "label": label,
+                "page": page_index + 1,
+                "xref": xref,
+                "ext": base_image["ext"],
+                "width": base_image.get("width", 0),
+                "height": base_image.get("height", 0),
+                "bytes": base_image["image"],
+            }
+
+    @staticmethod
+    def open(file_path: str, workers: int = 1, page_store: Optional[DiskCache] = None,
+             native_tables: bool = True) -> "IngestionSession":
+        """Opens file_path once for page-parallel markdown plus image extraction."""
+        return IngestionSession(file_path, workers, page_store=page_store, native_tables=native_tables)
+
+    @staticmethod
+    def find_tables(page) -> List[Optional[Dict]]:
+        """Native tables on a page (see tables.page_tables); a page the finder fails on has none."""
+        try:
+            return page_tables(page)
+        except Exception as e:
+            print(f"Table extraction failed on page {page.number + 1}: {e}")
+            return []
+
+# Separator written between pages, matching pymupdf4llm's own page output
+PAGE_SEPARATOR = "\n-----\n\n"
+
+def _markdown_pages(file_path: str, pages: List[int], native_tables: bool = False) -> List[Dict]:
+    """Process pool entry point: converts the given pages to markdown, one page entry
+    ({"markdown", and "tables" when native_tables}) per page."""
+    import fitz  # PyMuPDF
+    import pymupdf4llm
+    entries = [{"markdown": chunk["text"]}
+               for chunk in pymupdf4llm.to_markdown(file_path, pages=pages, page_chunks=True)]
+    if native_tables:
+        with fitz.open(file_path) as doc:
+            for page_number, entry in zip(pages, entries):
+                entry["tables"] = DocumentIngestor.find_tables(doc[page_number])
+    return entries
+
+def _load_markdown_worker() -> bool:
+    """Process pool warm-up task: imports pymupdf4llm in a worker ahead of real work."""
+    import pymupdf4llm
+    return True
+
+def split_pages(pages: List[int], workers: int, min_pages: int) -> List[List[int]]:
+    """Splits page numbers into at most `workers` ordered groups of at least min_pages each."""
+    parts = max(1, min(workers, len(pages) // max(1, min_pages)))
+    size, extra = divmod(len(pages), parts)
+    groups = []
+    start = 0
+    for i in range(parts):
+        stop = start + size + (1 if i < extra else 0)
+        groups.append(pages[start:stop])
+        start = stop
+    return groups
+
+def page_fingerprint(page) -> str:
+    """Hashes what a page draws and says, so an unchanged page in a revised PDF matches."""
+    digest = hashlib.sha256(page.read_contents())
+    digest.update(page.get_text().encode("utf-8", "ignore"))
+    digest.update(repr(tuple(page.rect)).encode("utf-8"))
+    return digest.hexdigest()
+
+# Markdown conversion is CPU-bound and PyMuPDF is not thread-safe, so page groups go to processes.
+# The pool is shared by every run in this process and created on first use.
+_markdown_pool: Optional[ProcessPoolExecutor] = None
+_markdown_pool_lock = threading.Lock()
+
+def _get_markdown_pool(workers: int) -> ProcessPoolExecutor:
+    global _markdown_pool
+    with _markdown_pool_lock:
+        if _markdown_pool is None:
+            # spawn avoids forking a parent that may be running Flask or vision threads
+            _markdown_pool = ProcessPoolExecutor(
+                max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+        return _markdown_pool
+
+class IngestionSession:
+    """A single open of a PDF shared by markdown conversion and image extraction.
+
+    On entry, every page is fingerprinted and looked up in the page store;
+    only pages without stored markdown are handed to a process pool for
+    conversion. images() then walks the same open document, so vision can
+    start while markdown is still being produced, and markdown() reassembles
+    stored and fresh pages in page order. Pages left to convert in-process
+    (a single worker, or a failed group) are read through a second handle,
+    so they never hold up images().
+
+    With native_tables, tables drawn as vector text are also extracted
+    locally, stored with their page's markdown, and collected in tables
+    (numbered T1, T2, ... in page order) as markdown() swaps each one's
+    markdown block for a short marker.
+    """
+
+    def __init__(self, file_path: str, workers: int = 1, page_store: Optional[DiskCache] = None,
+                 min_pages_per_worker: Optional[int] = None, native_tables: bool = True):
+        self.file_path = file_path
+        self.workers = max(1, workers)
+        self.page_store = page_store
+        self.min_pages_per_worker = min_pages_per_worker or int(os.getenv("INGEST_MIN_PAGES_PER_WORKER", "8"))
+        self.native_tables = native_tables
+        self.tables: List[Dict] = []
+        self.doc = None
+        self.page_count = 0
+        self.cached_pages = 0
+        self._page_keys: List[Optional[str]] = []
+        self._page_md: List[Optional[str]] = []
+        self._page_tables: List[Optional[List[Optional[Dict]]]] = []
+        self._futures: List[Tuple[List[int], Future]] = []
+        # The open document is shared by the image and markdown stages, which may run on
+        # different threads, and PyMuPDF objects are not thread-safe
+        self._doc_lock = threading.Lock()
+
+    def __enter__(self):
+        import fitz  # PyMuPDF
+        self.doc = fitz.open(self.file_path)
+        self.page_count = self.doc.page_count
+        if not HAS_PYMUPDF4LLM:
+            return self
+
+        self._page_md = [None] * self.page_count
+        self._page_keys = [None] * self.page_count
+        self._page_tables = [None] * self.page_count
+        import pymupdf4llm
+        if self.page_store is not None and self.page_store.enabled:
+            version = getattr(pymupdf4llm, "__version__", "")
+            for i, page in enumerate(self.doc):
+                self._page_keys[i] = make_key(page_fingerprint(page), version)
+                cached = self.page_store.get(self._page_keys[i])
+                if cached is not None:
+                    self._page_md[i] = cached["markdown"]
+                    if self.native_tables and cached.get("tables_version") == TABLES_VERSION:
+                        self._page_tables[i] = cached.get("tables")
+        pending = [i for i, md in enumerate(self._page_md) if md is None]
+        self.cached_pages = self.page_count - len(pending)
+        if self.cached_pages:
+            print(f"Reusing markdown for {self.cached_pages}/{self.page_count} unchanged pages")
+
+        if pending and self.workers > 1:
+            groups = split_pages(pending, self.workers, self.min_pages_per_worker)
+            if len(groups) > 1:
+                print(f"Converting {self.file_path} to Markdown in {len(groups)} page groups...")
+                pool = _get_markdown_pool(self.workers)
+                self._futures = [(group, pool.submit(_markdown_pages, self.file_path, group, self.native_tables))
+                                 for group in groups]
+        return self
+
+    @property
+    def range_count(self) -> int:
+        """Number of page groups converted in parallel (0 when converting in-process)."""
+        return len(self._futures)
+
+    def on_range_done(self, callback: Callable):
+        """Calls callback(future) as each page group finishes converting."""
+        for _, future in self._futures:
+            future.add_done_callback(callback)
+
+    def __exit__(self, *exc):
+        for _, future in self._futures:
+            future.cancel()
+        if self.doc is not None:
+            self.doc.close()
+
+    def images(self, debug_dir: Optional[str] = None) -> Iterator[Dict]:
+        """Yields distinct images page by page."""
+        seen_xrefs = set()
+        for i in range(self.page_count):
+            with self._doc_lock:
+                page = self.doc[i]
+                page_images = list(DocumentIngestor.page_images(self.doc, page, i, seen_xrefs, debug_dir))
+            # Yield outside the lock so markdown conversion can use the document meanwhile
+            yield from page_images
+
+    def _private_doc(self):
+        """A second handle on the file for in-process conversion, so images() keeps the shared
+        document (and its lock) while markdown is produced."""
+        import fitz  # PyMuPDF
+        return fitz.open(self.file_path)
+
+    def _number_tables(self, tables: List[Optional[Dict]]) -> List[Optional[Dict]]:
+        """Gives a page's extracted tables their document-wide refs and adds them to self.tables."""
+        numbered = []
+        for table in tables:
+            if table is not None:
+                table = dict(table, ref=f"T{len(self.tables) + 1}")
+                self.tables.append(table)
+            numbered.append(table)
+        return numbered
+
+    def markdown(self) -> str:
+        """Returns the document markdown in page order, extracted tables replaced by markers."""
+        self.tables = []
+        try:
+            if not HAS_PYMUPDF4LLM:
+                with self._private_doc() as doc:
+                    page_texts = [text_without_tables(page, self._number_tables(DocumentIngestor.find_tables(page)))
+                                  if self.native_tables else page.get_text() for page in doc]
+                return "".join(text + "\n\n" for text in page_texts)
+
+            fresh = set()
+            for group, future in self._futures:
+                try:
+                    for page_number, entry in zip(group, future.result()):
+                        self._page_md[page_number] = entry["markdown"]
+                        self._page_tables[page_number] = entry.get("tables")
+                        fresh.add(page_number)
+                except Exception as e:
+                    # Leave the group unconverted so it is retried in-process below
+                    print(f"Markdown worker failed for pages {group[0]+1}-{group[-1]+1}: {e}")
+
+            remaining = [i for i, md in enumerate(self._page_md) if md is None]
+            # Pages converted in-process, or stored before tables were extracted
+            untabled = [i for i, tables in enumerate(self._page_tables) if tables is None] if self.native_tables else []
+            if remaining or untabled:
+                with self._private_doc() as doc:
+                    if remaining:
+                        print(f"Converting {len(remaining)} pages of {self.file_path} to Markdown...")
+                        import pymupdf4llm
+                        chunks = pymupdf4llm.to_markdown(doc, pages=remaining, page_chunks=True)
+                        for page_number, chunk in zip(remaining, chunks):
+                            self._page_md[page_number] = chunk["text"]
+                            fresh.add(page_number)
+                    for page_number in untabled:
+                        self._page_tables[page_number] = DocumentIngestor.find_tables(doc[page_number])
+                fresh.update(untabled)
+
+            if self.page_store is not None:
+                for page_number in fresh:
+                    if self._page_keys[page_number]:
+                        entry = {"markdown": self._page_md[page_number]}
+                        if self._page_tables[page_number] is not None:
+                            entry["tables"] = self._page_tables[page_number]
+                            entry["tables_version"] = TABLES_VERSION
+                        self.page_store.put(self._page_keys[page_number], entry)
+            return "".join(replace_markdown_tables(md or "", self._number_tables(tables or [])) + PAGE_SEPARATOR
+                           for md, tables in zip(self._page_md, self._page_tables))
+        except Exception as e:
+            print(f"Error converting to Markdown: {e}")
+            return ""
+
 class GroqProcessor:
     """Handles interaction with Groq API for Text and Vision."""
+
+    # Largest slice of text, in tokens, sent in a single structuring prompt
+    MAX_TEXT_TOKENS = int(os.getenv("STRUCTURE_TOKEN_BUDGET", "3750"))
     
-    def __init__(self):
-        self.api_key = os.getenv("GROQ_API_KEY")
-        if not self.api_key:
-            raise ValueError("GROQ_API_KEY not found in environment!")
-        self.client = Groq(api_key=self.api_key)
+    def __init__(self, client: Optional[GroqClient] = None):
+        # A missing GROQ_API_KEY is reported by the client on the first request
+        self.client = client or get_client()
         self.text_model = "llama-3.3-70b-versatile"
         self.vision_model = "llama-3.2-11b-vision-preview"
 
     def analyze_image(self, image_path: str) -> str:
         """Uses Llama 3.2 Vision to describe a chart or image."""
-        print(f"Analyzing image: {image_path}")
+        with open(image_path, "rb") as image_file:
+            return self.analyze_image_bytes(image_file.read(), image_path)
+
+    def analyze_image_bytes(self, image_bytes: bytes, label: str = "image", mime: str = "image/jpeg") -> str:
+        """Describes an in-memory image; label is only used for logging.
+
+        API failures raise GroqCallError rather than returning an empty description.
+        """
+        print(f"Analyzing image: {label}")
         
         # Encode image
-        with open(image_path, "rb") as image_file:
-            encoded_string = base64.b64encode(image_file.read()).decode('utf-8')
+        encoded_string = base64.b64encode(image_bytes).decode('utf-8')
             
-        try:
-            chat_completion = self.client.chat.completions.create(
-                messages=[
-                    {
-                        "role": "user",
-                        "content": [
-                            {"type": "text", "text": "Describe this image in detail. If it is a chart or table, output the data in textual format."},
-                            {
-                                "type": "image_url",
-                                "image_url": {
-                                    "url": f"data:image/jpeg;base64,{encoded_string}",
-                                },
+        chat_completion = self.client.chat(
+            messages=[
+                {
+                    "role": "user",
+                    "content": [
+                        {"type": "text", "text": "Describe this image in detail. If it is a chart or table, output the data in textual format."},
+                        {
+                            "type": "image_url",
+                            "image_url": {
+                                "url": f"data:{mime};base64,{encoded_string}",
                             },
-                        ],
-                    }
-                ],
-                model=self.vision_model,
-            )
-            return chat_completion.choices[0].message.content
-        except Exception as e:
-            print(f"Vision API Error: {e}")
-            return ""
+                        },
+                    ],
+                }
+            ],
+            model=self.vision_model,
+        )
+        return chat_completion.choices[0].message.content
 
     def structurize_text(self, text: str, schema_description: str) -> dict:
-        """Extracts structured data from text using JSON mode."""
+        """Extracts structured data from text using JSON mode.
+
+        API failures raise GroqCallError rather than returning an empty result.
+        """
         
         prompt = f"""
         Extract the following information from the text provided below.
@@ -122,92 +450,502 @@ class GroqProcessor:
         {schema_description}
 
         Text:
-        {text[:15000]} # Truncate to be safe with context limits
+        {truncate_to_tokens(text, self.MAX_TEXT_TOKENS)} # Truncate to be safe with context limits
         """
         
-        try:
-            chat_completion = self.client.chat.completions.create(
-                messages=[
-                    {
-                        "role": "user",
-                        "content": prompt,
-                    }
-                ],
-                model=self.text_model,
-                response_format={"type": "json_object"},
-            )
-            return json.loads(chat_completion.choices[0].message.content)
-        except Exception as e:
-            print(f"Structure API Error: {e}")
-            return {}
+        chat_completion = self.client.chat(
+            messages=[
+                {
+                    "role": "user",
+                    "content": prompt,
+                }
+            ],
+            model=self.text_model,
+            response_format={"type": "json_object"},
+        )
+        return json.loads(chat_completion.choices[0].message.content)
+
+class PipelineCancelled(Exception):
+    """Raised when a run is cancelled between stages."""
+
+def _check_cancel(cancel_event: Optional[threading.Event]):
+    if cancel_event is not None and cancel_event.is_set():
+        raise PipelineCancelled("Pipeline run was cancelled")
+
+class ProgressReporter:
+    """Emits structured stage events with elapsed time to an optional callback.
+
+    Events look like {"stage": "vision", "status": "progress", "done": 17,
+    "total": 60, "elapsed": 12.4}. Callback errors never break the pipeline.
+    """
+
+    def __init__(self, callback: Optional[Callable[[Dict], None]] = None):
+        self.callback = callback
+        self.start = time.time()
+        self._lock = threading.Lock()
+
+    def emit(self, stage: str, status: str, **fields):
+        if self.callback is None:
+            return
+        event = {"stage": stage, "status": status,
+                 "elapsed": round(time.time() - self.start, 3), **fields}
+        with self._lock:
+            try:
+                self.callback(event)
+            except Exception as e:
+                print(f"Progress callback error: {e}")
+
+    def counter(self, stage: str, total: Optional[int] = None) -> Callable[..., None]:
+        """Returns a thread-safe callable that reports one more unit of stage work done."""
+        state = {"done": 0}
+        lock = threading.Lock()
+
+        def tick(*_):
+            with lock:
+                state["done"] += 1
+                done = state["done"]
+            self.emit(stage, "progress", done=done, total=total)
+        return tick
+
+def default_result_cache() -> DiskCache:
+    """Builds the on-disk result cache from environment settings."""
+    return DiskCache(
+        os.getenv("RESULT_CACHE_DIR", os.path.join(".cache", "results")),
+        max_bytes=int(float(os.getenv("RESULT_CACHE_MAX_MB", "500")) * 1024 * 1024),
+        max_age=float(os.getenv("RESULT_CACHE_MAX_AGE_DAYS", "30")) * 86400,
+        enabled=os.getenv("RESULT_CACHE", "1") != "0",
+        name="result",
+    )
+
+def default_vision_cache() -> DiskCache:
+    """Builds the cross-document vision description cache from environment settings."""
+    return DiskCache(
+        os.getenv("VISION_CACHE_DIR", os.path.join(".cache", "vision")),
+        max_bytes=int(float(os.getenv("VISION_CACHE_MAX_MB", "200")) * 1024 * 1024),
+        enabled=os.getenv("VISION_CACHE", "1") != "0",
+        name="vision",
+    )
+
+def default_page_store() -> DiskCache:
+    """Builds the per-page markdown store used to skip unchanged pages of revised PDFs."""
+    return DiskCache(
+        os.getenv("PAGE_CACHE_DIR", os.path.join(".cache", "pages")),
+        max_bytes=int(float(os.getenv("PAGE_CACHE_MAX_MB", "500")) * 1024 * 1024),
+        enabled=os.getenv("PAGE_CACHE", "1") != "0",
+        name="page",
+    )
+
+def default_chunk_cache() -> DiskCache:
+    """Builds the per-chunk extraction cache used to skip unchanged sections of revised PDFs."""
+    return DiskCache(
+        os.getenv("CHUNK_CACHE_DIR", os.path.join(".cache", "chunks")),
+        max_bytes=int(float(os.getenv("CHUNK_CACHE_MAX_MB", "500")) * 1024 * 1024),
+        enabled=os.getenv("CHUNK_CACHE", "1") != "0",
+        name="chunk",
+    )
 
 class Pipeline:
-    def __init__(self):
+    def __init__(self, vision_workers: Optional[int] = None, chunked: bool = True,
+                 extract_workers: Optional[int] = None, result_cache: Optional[DiskCache] = None,
+                 vision_cache: Optional[DiskCache] = None, triage: Optional[ImageTriage] = None,
+                 ingest_workers: Optional[int] = None, page_store: Optional[DiskCache] = None,
+                 chunk_cache: Optional[DiskCache] = None, gazetteer: Optional[GazetteerExtractor] = None):
         self.ingestor = DocumentIngestor()
         self.processor = GroqProcessor()
         self.ner_processor = NERProcessor()
+        # Max number of vision calls in flight at once
+        self.vision_workers = max(1, vision_workers or int(os.getenv("VISION_WORKERS", "4")))
+        # Chunked mode extracts over the whole document instead of its first slice
+        self.chunked = chunked
+        self.extract_workers = max(1, extract_workers or int(os.getenv("EXTRACT_WORKERS", "4")))
+        self.result_cache = result_cache or default_result_cache()
+        self.vision_cache = vision_cache or default_vision_cache()
+        self.triage = triage or ImageTriage()
+        # Processes used to convert page ranges to markdown; 1 converts in-process
+        self.ingest_workers = max(1, ingest_workers or int(os.getenv("INGEST_WORKERS", str(os.cpu_count() or 1))))
+        # Page markdown and chunk extractions are reused when a revised PDF repeats them
+        self.page_store = page_store or default_page_store()
+        self.chunk_cache = chunk_cache or default_chunk_cache()
+        # Local dictionary pass for states, districts, boards, bodies, schemes and dates
+        if gazetteer is None and os.getenv("GAZETTEER", "1") != "0":
+            gazetteer = GazetteerExtractor()
+        self.gazetteer = gazetteer
+        # Boilerplate stripping before any text reaches the models, and an optional
+        # cap in tokens on what is left (0 keeps everything)
+        self.compact_context = os.getenv("COMPACT_CONTEXT", "1") != "0"
+        self.context_token_budget = int(os.getenv("CONTEXT_TOKEN_BUDGET", "0"))
+        # Tables drawn as vector text are extracted locally; the model only titles them
+        self.native_tables = os.getenv("NATIVE_TABLES", "1") != "0"
+        # Vision calls currently running, so concurrent copies of an image wait instead of re-calling
+        self._vision_inflight: Dict[str, Future] = {}
+        self._vision_lock = threading.Lock()
 
-    def run(self, input_file: str, save_json: bool = True) -> dict:
-        print(f"--- Starting Pipeline for {input_file} ---")
-        
-        # 1. Convert to Markdown (Layout preservation)
-        md_content = self.ingestor.to_markdown(input_file)
-        
-        # 2. Extract and Analyze Images (Vision)
-        image_paths = self.ingestor.extract_images(input_file)
-        image_summaries = []
-        for img_path in image_paths:
-            summary = self.processor.analyze_image(img_path)
-            image_summaries.append(f"Image ({img_path}): {summary}")
-        
-        # 3. Combine Context
-        full_context = md_content + "\n\n" + "\n".join(image_summaries)
-        
-        # 4. Perform Named Entity Recognition
-        print("Extracting named entities...")
-        ner_entities = self.ner_processor.extract_entities(full_context)
-        
-        # 5. Structure Data - Optimized for Indian Education Data
-        schema = """
-        {
-            "summary": "Comprehensive summary of the education document focusing on Indian education system, policies, statistics, or reports",
-            "document_type": "Type of document (e.g., Policy Document, Statistical Report, Research Paper, Government Circular)",
-            "education_levels": ["List of education levels mentioned (e.g., Primary, Secondary, Higher Education, Vocational)"],
-            "states_mentioned": ["List of Indian states/UTs mentioned in the document"],
-            "organizations": ["List of educational institutions, government bodies, NGOs mentioned"],
-            "key_statistics": [
-                {
-                    "metric": "Name of the statistic (e.g., Enrollment Rate, Literacy Rate, Dropout Rate)",
-                    "value": "Numerical value or percentage",
-                    "context": "Additional context about the statistic"
-                }
-            ],
-            "policies_schemes": [
-                {
-                    "name": "Name of policy or scheme",
-                    "description": "Brief description",
-                    "target_audience": "Who it targets"
-                }
-            ],
-            "tables": [
-                {
-                    "title": "Title of the table or chart",
-                    "data": [
-                        { "column_1": "value", "column_2": "value" }
-                    ]
-                }
-            ],
-            "key_dates": ["Important dates mentioned in the document"],
-            "budget_financials": {
-                "total_budget": "Total budget amount if mentioned",
-                "currency": "Currency (usually INR)",
-                "breakdown": "Breakdown of budget allocation if available"
-            }
+    def warm_up(self) -> Dict[str, float]:
+        """Loads what the first run would otherwise pay for: PDF and image libraries,
+        the tokenizer, the Groq HTTP clients and the markdown worker processes.
+
+        Returns seconds spent per step.
+        """
+        timings = {}
+
+        def step(name, func):
+            start = time.perf_counter()
+            try:
+                func()
+            except Exception as e:
+                print(f"Warm-up step {name} failed: {e}")
+            timings[name] = round(time.perf_counter() - start, 3)
+
+        def load_pdf():
+            import fitz  # PyMuPDF
+            if HAS_PYMUPDF4LLM:
+                import pymupdf4llm
+
+        def load_images():
+            if HAS_PIL:
+                from PIL import Image, ImageStat
+
+        def start_markdown_pool():
+            if HAS_PYMUPDF4LLM and self.ingest_workers > 1:
+                pool = _get_markdown_pool(self.ingest_workers)
+                for future in [pool.submit(_load_markdown_worker) for _ in range(self.ingest_workers)]:
+                    future.result()
+
+        step("pdf", load_pdf)
+        step("images", load_images)
+        step("tokenizer", lambda: count_tokens("warm up"))
+        step("groq", lambda: (self.processor.client.warm_up(), self.ner_processor.client.warm_up()))
+        step("markdown_pool", start_markdown_pool)
+        return timings
+
+    def result_cache_key(self, file_hash: str) -> str:
+        """Cache key covering the document bytes and everything that shapes the result."""
+        return make_key(
+            file_hash,
+            self.processor.text_model,
+            self.processor.vision_model,
+            self.ner_processor.model,
+            make_key(EDUCATION_SCHEMA),
+            PROMPT_VERSION,
+            self.chunked,
+            self.compact_context,
+            self.context_token_budget,
+            self.native_tables and TABLES_VERSION,
+            self.processor.MAX_TEXT_TOKENS,
+            self.ner_processor.MAX_TEXT_TOKENS,
+        )
+
+    def describe_image(self, image_bytes: bytes, label: str, mime: str = "image/jpeg") -> Tuple[str, bool]:
+        """Returns (description, cached), calling the vision model at most once per unique image."""
+        key = make_key(hashlib.sha256(image_bytes).hexdigest(), self.processor.vision_model, PROMPT_VERSION)
+        cached = self.vision_cache.get(key)
+        if cached is not None:
+            return cached.get("description", ""), True
+
+        with self._vision_lock:
+            future = self._vision_inflight.get(key)
+            owner = future is None
+            if owner:
+                future = Future()
+                self._vision_inflight[key] = future
+        if not owner:
+            return future.result(), True
+
+        try:
+            description = self.processor.analyze_image_bytes(image_bytes, label, mime) or ""
+            if description:
+                self.vision_cache.put(key, {"description": description})
+        except Exception as e:
+            # Waiting copies see the same failure; nothing is cached, so it is retried next time
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(description)
+        finally:
+            with self._vision_lock:
+                self._vision_inflight.pop(key, None)
+        return description, False
+
+    def _analyze_one(self, image: Dict) -> Tuple[str, bool, str]:
+        """Triages and describes a single image, isolating any failure to it.
+
+        Returns (description, cached, kind); skipped images have no description.
+        """
+        try:
+            prepared = self.triage.prepare(image)
+            if not prepared["keep"]:
+                return "", False, prepared["kind"]
+            description, cached = self.describe_image(prepared["bytes"], image["label"], prepared["mime"])
+            return description, cached, prepared["kind"]
+        except Exception as e:
+            print(f"Vision failed for {image['label']}: {e}")
+            return "", False, "error"
+
+    def analyze_images(self, images: Iterable[Dict],
+                       reporter: Optional[ProgressReporter] = None) -> Tuple[List[str], Dict]:
+        """Analyzes images concurrently with a bounded pool, keeping page order.
+
+        Images are submitted as they are yielded, so vision calls start while
+        extraction is still walking the document. Returns the summaries and
+        this run's vision cache statistics.
+        """
+        reporter = reporter or ProgressReporter()
+        skipped: Dict[str, int] = {}
+        pending = []
+        total = 0
+        completed = {"done": 0}
+        completed_lock = threading.Lock()
+
+        def on_done(_):
+            # Total grows while extraction is still streaming images in
+            with completed_lock:
+                completed["done"] += 1
+                done = completed["done"]
+            reporter.emit("vision", "progress", done=done, total=len(pending))
+
+        with ThreadPoolExecutor(max_workers=self.vision_workers) as executor:
+            for image in images:
+                total += 1
+                # Metadata-only checks run inline so tiny images never occupy a worker
+                reason = self.triage.prefilter(image)
+                if reason:
+                    skipped[reason] = skipped.get(reason, 0) + 1
+                    continue
+                future = metrics.submit(executor, self._analyze_one, image)
+                pending.append((image["label"], future))
+                future.add_done_callback(on_done)
+            # Collect in submission order regardless of completion order
+            outcomes = [(label, future.result()) for label, future in pending]
+
+        summaries = []
+        cache_hits = 0
+        for label, (summary, cached, kind) in outcomes:
+            if summary:
+                summaries.append(f"Image ({label}): {summary}")
+                cache_hits += int(cached)
+            elif kind not in ("chart", "unknown"):
+                skipped[kind] = skipped.get(kind, 0) + 1
+
+        described = len(summaries)
+        stats = {
+            "images": total,
+            "described": described,
+            "failed": skipped.get("error", 0),
+            "skipped": skipped,
+            "cache_hits": cache_hits,
+            "hit_rate": round(cache_hits / described, 4) if described else 0.0,
         }
+        print(f"Vision: {described}/{total} described, {sum(skipped.values())} skipped, "
+              f"{cache_hits} served from cache")
+        return summaries, stats
+
+    def _map_chunks(self, func, chunks: List[str], on_done: Optional[Callable] = None) -> list:
+        """Applies func to every chunk in parallel, keeping chunk order."""
+        workers = min(self.extract_workers, len(chunks))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = [metrics.submit(executor, func, chunk) for chunk in chunks]
+            if on_done:
+                for future in futures:
+                    future.add_done_callback(on_done)
+            return [future.result() for future in futures]
+
+    @staticmethod
+    def _parsed(call: Callable, stage: str, empty):
+        """Runs a model call that parses JSON, asking once more if the answer is malformed.
+
+        A second malformed answer gives empty, which the merge absorbs, so one
+        bad chunk cannot fail the document; the run is then not cached.
+        """
+        for attempt in (1, 2):
+            try:
+                return call()
+            except json.JSONDecodeError as e:
+                print(f"Malformed JSON from the {stage} model (attempt {attempt}): {e}")
+        metrics.record_failure(stage)
+        return empty
+
+    def _structurize_chunk(self, chunk: str) -> dict:
+        key = make_key("structure", hashlib.sha256(chunk.encode("utf-8")).hexdigest(),
+                       self.processor.text_model, make_key(EDUCATION_SCHEMA), PROMPT_VERSION)
+        cached = self.chunk_cache.get(key)
+        if cached is not None:
+            return cached["value"]
+        value = self._parsed(lambda: self.processor.structurize_text(chunk, EDUCATION_SCHEMA), "structure", {})
+        # API failures raise, so nothing stale is cached; empty answers are simply not stored
+        if value:
+            self.chunk_cache.put(key, {"value": value})
+        return value
+
+    def _entities_chunk(self, chunk: str) -> List[Dict]:
+        known = self.gazetteer.extract(chunk) if self.gazetteer else []
+        key = make_key("ner", hashlib.sha256(chunk.encode("utf-8")).hexdigest(),
+                       self.ner_processor.model, known, PROMPT_VERSION)
+        cached = self.chunk_cache.get(key)
+        if cached is not None:
+            return cached["value"]
+        value = self._parsed(lambda: self.ner_processor.extract_entities(chunk, known=known), "ner", [])
+        if value:
+            self.chunk_cache.put(key, {"value": value})
+        return value
+
+    @staticmethod
+    def _split_tokens(text: str, max_tokens: int) -> List[str]:
+        """Splits text into chunks of roughly max_tokens tokens each."""
+        return split_markdown(text, chars_for_tokens(text, max_tokens))
+
+    def structurize(self, full_context: str, reporter: Optional[ProgressReporter] = None) -> dict:
+        """Structures the full context, map-reducing over chunks when it is too long.
+
+        Without chunking, the most informative sections that fit one prompt are sent.
+        """
+        reporter = reporter or ProgressReporter()
+        budget = self.processor.MAX_TEXT_TOKENS
+        chunks = self._split_tokens(full_context, budget) if self.chunked else []
+        if len(chunks) <= 1:
+            return self._structurize_chunk(pack_to_budget(full_context, budget))
+        print(f"Structuring {len(chunks)} chunks...")
+        results = self._map_chunks(self._structurize_chunk, chunks,
+                                   on_done=reporter.counter("structure", len(chunks)))
+        return merge_extractions(results)
+
+    def extract_entities(self, full_context: str, reporter: Optional[ProgressReporter] = None) -> List[Dict]:
+        """Runs NER over the full context, map-reducing over chunks when it is too long.
+
+        The gazetteer pass covers the whole text locally first; only lines it
+        cannot fully explain are sent to the model.
         """
+        reporter = reporter or ProgressReporter()
+        local = []
+        if self.gazetteer:
+            matches = self.gazetteer.find(full_context)
+            local = self.gazetteer.extract(full_context, matches)
+            remaining = self.gazetteer.residual(full_context, matches)
+            print(f"Gazetteer found {len(local)} entities; "
+                  f"{len(remaining)}/{len(full_context)} characters left for the model")
+            full_context = remaining
+        if not full_context.strip():
+            return local
+        budget = self.ner_processor.MAX_TEXT_TOKENS
+        chunks = self._split_tokens(full_context, budget) if self.chunked else []
+        if len(chunks) <= 1:
+            return merge_entities([local, self._entities_chunk(pack_to_budget(full_context, budget))])
+        print(f"Extracting entities from {len(chunks)} chunks...")
+        return merge_entities([local] + self._map_chunks(self._entities_chunk, chunks,
+                                                         on_done=reporter.counter("ner", len(chunks))))
+
+    def run(self, input_file: str, save_json: bool = True, use_cache: bool = True,
+            cancel_event: Optional[threading.Event] = None,
+            progress: Optional[Callable[[Dict], None]] = None,
+            file_hash: Optional[str] = None) -> dict:
+        """Runs every stage on input_file.
+
+        file_hash, the SHA-256 of input_file, saves hashing the file again
+        when the caller already has it (uploads are hashed as they arrive).
+
+        progress, if given, receives a stage event dict after each stage and
+        as vision and chunked extraction work completes; "done" events carry
+        the partial result produced by that stage.
+
+        The result carries a "_timings" block with per-stage wall time, pages
+        and images processed, Groq calls, tokens and retries per model, and
+        cache hits for this run; the same figures feed metrics.REGISTRY.
+        """
+        print(f"--- Starting Pipeline for {input_file} ---")
+        reporter = ProgressReporter(progress)
+        run_stats, token = metrics.start_run()
+        try:
+            return self._run(input_file, save_json, use_cache, cancel_event, reporter, run_stats, file_hash)
+        except PipelineCancelled:
+            metrics.record_run("cancelled", time.time() - reporter.start)
+            raise
+        except Exception:
+            metrics.record_run("failed", time.time() - reporter.start)
+            raise
+        finally:
+            metrics.end_run(token)
+
+    def _run(self, input_file: str, save_json: bool, use_cache: bool,
+             cancel_event: Optional[threading.Event], reporter: ProgressReporter,
+             run_stats: metrics.RunStats, file_hash: Optional[str] = None) -> dict:
+        # 0. Return a stored result for byte-identical input
+        cache_key = self.result_cache_key(file_hash or file_sha256(input_file))
+        result = self.result_cache.get(cache_key) if use_cache else None
+        if result is not None:
+            print("Result cache hit, skipping extraction.")
+            reporter.emit("cache", "hit")
+            seconds = time.time() - reporter.start
+            result["_timings"] = {"stages": [], "total_seconds": round(seconds, 3), **run_stats.to_dict()}
+            metrics.record_run("cached", seconds)
+            self._save_output(input_file, result, save_json)
+            reporter.emit("pipeline", "done", partial=result)
+            return result
         
-        print("Structuring data for Indian education context...")
-        result = self.processor.structurize_text(full_context, schema)
+        debug_dir = os.getenv("DEBUG_IMAGES_DIR")
+
+        def vision_stage(ingestion):
+            summaries, stats = self.analyze_images(ingestion.images(debug_dir=debug_dir), reporter)
+            reporter.emit("vision", "done", **stats)
+            return summaries, stats
+
+        def markdown_stage(ingestion):
+            md_content = ingestion.markdown()
+            reporter.emit("markdown", "done", pages=ingestion.page_count,
+                          cached_pages=ingestion.cached_pages, chars=len(md_content),
+                          tables=len(ingestion.tables))
+            return md_content
+
+        def context_stage(markdown, vision):
+            context = markdown + "\n\n" + "\n".join(vision[0])
+            if not self.compact_context:
+                return context
+            raw_tokens = count_tokens(context)
+            context = compact(context)
+            if self.context_token_budget:
+                context = pack_to_budget(context, self.context_token_budget)
+            tokens = count_tokens(context)
+            print(f"Compacted context from {raw_tokens} to {tokens} tokens")
+            reporter.emit("context", "done", raw_tokens=raw_tokens, tokens=tokens)
+            return context
+
+        def ner_stage(context, ingestion):
+            print("Extracting named entities...")
+            entities = self.extract_entities(context, reporter)
+            if self.gazetteer and ingestion.tables:
+                # Extracted table cells are not in the context; names in them are matched locally
+                entities = merge_entities([entities, self.gazetteer.extract(table_text(ingestion.tables))])
+            reporter.emit("ner", "done", entities=len(entities), partial={"named_entities": entities})
+            return entities
+
+        def structure_stage(context):
+            print("Structuring data for Indian education context...")
+            structured = self.structurize(context, reporter)
+            reporter.emit("structure", "done", partial=structured)
+            return structured
+
+        # Stages run as soon as their inputs are ready: markdown and vision overlap on one
+        # open document, then NER and structuring both only need the combined context
+        graph = StageGraph([
+            Stage("vision", vision_stage, ["ingestion"]),
+            Stage("markdown", markdown_stage, ["ingestion"]),
+            Stage("context", context_stage, ["markdown", "vision"]),
+            Stage("ner", ner_stage, ["context", "ingestion"]),
+            Stage("structure", structure_stage, ["context"]),
+        ])
+        with self.ingestor.open(input_file, self.ingest_workers, self.page_store,
+                                native_tables=self.native_tables) as ingestion:
+            reporter.emit("ingest", "started", pages=ingestion.page_count)
+            ingestion.on_range_done(reporter.counter("markdown", ingestion.range_count))
+            values = graph.run({"ingestion": ingestion}, cancel_event=cancel_event,
+                               on_cancel=lambda: _check_cancel(cancel_event))
+            pages = ingestion.page_count
+            native_tables = ingestion.tables
+        _check_cancel(cancel_event)
+        for timing in values["_stage_timings"]:
+            metrics.record_stage(timing["stage"], timing["seconds"])
+        vision_stats = values["vision"][1]
+        ner_entities = values["ner"]
+        # Extracted tables go in as extracted, titled by the model where it could
+        result = merge_native_tables(values["structure"], native_tables)
         
         # 6. Integrate NER results
         if ner_entities:
@@ -215,50 +953,92 @@ class Pipeline:
             # Categorize entities
             result["entities_by_type"] = self._categorize_entities(ner_entities)
         
-        # 7. Save Output (Optional)
+        # 7. Cache and Save Output (Optional)
+        # A run with failed vision calls or dropped chunks is returned but not cached,
+        # so the next run retries them
+        dropped = run_stats.failure_count()
+        if result and not vision_stats["failed"] and not dropped:
+            self.result_cache.put(cache_key, result)
+        elif vision_stats["failed"] or dropped:
+            print(f"Not caching result: vision failed for {vision_stats['failed']} images, "
+                  f"{dropped} chunks dropped")
+        # Per-run stats are attached after caching so they never go stale in the cache
+        seconds = time.time() - reporter.start
+        images = {"described": vision_stats["described"], "skipped": sum(vision_stats["skipped"].values())}
+        result["_vision_cache"] = vision_stats
+        result["_timings"] = {
+            "stages": values["_stage_timings"],
+            "total_seconds": round(seconds, 3),
+            "pages": pages,
+            "images": vision_stats["images"],
+            "native_tables": len(native_tables),
+            **run_stats.to_dict(),
+        }
+        metrics.record_run("done", seconds, pages=pages, images=images)
+        self._save_output(input_file, result, save_json)
+        reporter.emit("pipeline", "done")
+            
+        return result
+
+    def _save_output(self, input_file: str, result: dict, save_json: bool):
         if save_json:
             output_file = os.path.splitext(input_file)[0] + "_output.json"
             with open(output_file, 'w', encoding='utf-8') as f:
                 json.dump(result, f, indent=4, ensure_ascii=False)
             print(f"Pipeline complete. Output saved to {output_file}")
-            
-        return result
     
     def _categorize_entities(self, entities: List[Dict]) -> Dict[str, List[str]]:
-        """Categorize entities by type for better organization."""
-        categorized = {
-            "organizations": [],
-            "locations": [],
-            "persons": [],
-            "dates": [],
-            "other": []
-        }
-        
+        """Groups entity texts by type, naming known entities canonically and dropping repeats."""
+        categorized = {category: [] for category in ENTITY_CATEGORIES}
+        seen = set()
         for entity in entities:
-            label = entity.get("label", "").lower()
-            text = entity.get("text", "")
-            
-            if any(keyword in label for keyword in ["org", "organization", "institution", "company"]):
-                categorized["organizations"].append(text)
-            elif any(keyword in label for keyword in ["loc", "location", "place", "state", "city", "country"]):
-                categorized["locations"].append(text)
-            elif any(keyword in label for keyword in ["person", "per", "name"]):
-                categorized["persons"].append(text)
-            elif any(keyword in label for keyword in ["date", "time"]):
-                categorized["dates"].append(text)
-            else:
-                categorized["other"].append(text)
-        
+            text = clean_entity_text(entity.get("text", ""))
+            if not text:
+                continue
+            category = entity_category(entity.get("label", ""))
+            expected = "state" if category == "locations" else None
+            known = self.gazetteer.lookup(text, expected) if self.gazetteer is not None else None
+            if known is not None:
+                # "Orissa" and "Odisha" are one place, whatever label the model gave them
+                text, category = known["canonical"], entity_category(known["label"])
+            key = (category, text.lower())
+            if key in seen:
+                continue
+            seen.add(key)
+            categorized[category].append(text)
         return categorized
 
 if __name__ == "__main__":
     import argparse
     parser = argparse.ArgumentParser(description="AI Data Extraction Pipeline")
-    parser.add_argument("input_file", help="Path to PDF file")
+    parser.add_argument("input_file", nargs="?",
+                        help="Path to PDF file, or a directory/glob to run in batch mode (see batch.py)")
+    parser.add_argument("--vision-workers", type=int, default=None,
+                        help="Max concurrent vision calls (default: $VISION_WORKERS or 4)")
+    parser.add_argument("--no-chunking", action="store_true",
+                        help="Only extract from the first slice of the document")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="Ignore any cached result and reprocess the file")
+    parser.add_argument("--clear-cache", action="store_true",
+                        help="Remove all cached results before running")
     args = parser.parse_args()
+
+    if args.clear_cache:
+        removed = default_result_cache().invalidate()
+        print(f"Removed {removed} cached results.")
+        if not args.input_file:
+            sys.exit(0)
     
-    if os.path.exists(args.input_file):
-        pipeline = Pipeline()
-        pipeline.run(args.input_file)
+    if args.input_file and (os.path.isdir(args.input_file) or any(c in args.input_file for c in "*?[")):
+        import batch
+        summary = batch.run_batch(args.input_file, "batch_output", use_cache=not args.no_cache,
+                                  pipeline_kwargs={"vision_workers": args.vision_workers,
+                                                   "chunked": not args.no_chunking,
+                                                   "ingest_workers": 1})
+        batch.print_summary(summary)
+    elif args.input_file and os.path.exists(args.input_file):
+        pipeline = Pipeline(vision_workers=args.vision_workers, chunked=not args.no_chunking)
+        pipeline.run(args.input_file, use_cache=not args.no_cache)
+        print(f"Result cache: {pipeline.result_cache.stats()}")
     else:
         print("File not found.")
@@ -0,0 +1,395 @@
+import os
+import re
+import json
+import time
+import sqlite3
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from cache import file_sha256
+from gazetteer import GazetteerExtractor, clean_entity_text, entity_category
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    doc_id TEXT PRIMARY KEY,
+    session_id TEXT,
+    filename TEXT,
+    document_type TEXT,
+    summary TEXT,
+    indexed_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS terms (
+    kind TEXT NOT NULL,
+    key TEXT NOT NULL,
+    doc_id TEXT NOT NULL,
+    text TEXT NOT NULL,
+    PRIMARY KEY (kind, key, doc_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS documents_indexed_at ON documents (indexed_at);
+CREATE INDEX IF NOT EXISTS terms_doc_id ON terms (doc_id);
+CREATE TABLE IF NOT EXISTS statistics (
+    id INTEGER PRIMARY KEY,
+    doc_id TEXT NOT NULL,
+    metric TEXT NOT NULL,
+    metric_key TEXT NOT NULL,
+    value TEXT,
+    number REAL,
+    context TEXT,
+    state TEXT
+);
+CREATE INDEX IF NOT EXISTS statistics_doc_id ON statistics (doc_id);
+CREATE INDEX IF NOT EXISTS statistics_state ON statistics (state);
+"""
+
+# Term kinds a document is indexed under
+KINDS = ("entity", "state", "scheme", "metric", "document_type")
+
+# Words that never narrow a metric search down
+METRIC_STOPWORDS = {"of", "the", "in", "and", "for", "at", "to", "by", "on", "a", "an", "per", "total"}
+_WORD_RE = re.compile(r"[a-z0-9]+")
+_NUMBER_RE = re.compile(r"-?\d[\d,]*(?:\.\d+)?")
+
+
+def term_key(text: str) -> str:
+    """Lookup key for an entity, state or scheme name: lowercased, single-spaced, unpunctuated."""
+    return " ".join(_WORD_RE.findall(clean_entity_text(text).lower()))
+
+
+def metric_terms(metric: str) -> List[str]:
+    """Words of a metric name, singular, so "Dropout Rates" and "dropout rate (%)" share terms."""
+    terms = []
+    for word in _WORD_RE.findall((metric or "").lower()):
+        if word in METRIC_STOPWORDS:
+            continue
+        if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+            word = word[:-1]
+        if word not in terms:
+            terms.append(word)
+    return terms
+
+
+def parse_number(value: Any) -> Optional[float]:
+    """The first number in a statistic's value ("78.5%", "1,20,000 students"), or None."""
+    if isinstance(value, (int, float)):
+        return float(value)
+    match = _NUMBER_RE.search(str(value or ""))
+    if not match:
+        return None
+    try:
+        return float(match.group().replace(",", ""))
+    except ValueError:
+        return None
+
+
+class ResultIndex:
+    """Inverted index over processed results, kept in SQLite.
+
+    Each document is indexed under its normalized entities, states,
+    schemes, metric words and document type; key_statistics rows are kept
+    alongside with the state they refer to, when their text names one.
+    Every lookup goes through the (kind, key) primary key, so queries cost
+    the same with ten documents or tens of thousands. add() replaces a
+    document's postings in one transaction, so the index is updated as
+    each result is saved rather than rebuilt.
+    """
+
+    def __init__(self, db_path: Optional[str] = None, gazetteer: Optional[GazetteerExtractor] = None):
+        self.db_path = db_path or os.getenv("RESULT_INDEX_DB", "index.db")
+        self._gazetteer = gazetteer
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        with self._conn() as conn:
+            conn.executescript(SCHEMA)
+
+    def _conn(self) -> sqlite3.Connection:
+        # One connection per thread; WAL lets queries run while a result is being indexed
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            directory = os.path.dirname(os.path.abspath(self.db_path))
+            os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @property
+    def gazetteer(self) -> GazetteerExtractor:
+        with self._lock:
+            if self._gazetteer is None:
+                self._gazetteer = GazetteerExtractor()
+            return self._gazetteer
+
+    # --- Indexing -------------------------------------------------------------
+
+    def _canonical(self, text: str, kind: Optional[str] = None) -> Tuple[str, Optional[Dict]]:
+        text = clean_entity_text(text)
+        known = self.gazetteer.lookup(text, kind) if text else None
+        return (known["canonical"] if known else text), known
+
+    def terms(self, result: Dict) -> List[Tuple[str, str, str]]:
+        """(kind, key, display text) postings for a result, deduplicated."""
+        postings: Dict[Tuple[str, str], str] = {}
+
+        def add(kind, text):
+            key = term_key(text)
+            if key:
+                postings.setdefault((kind, key), text)
+
+        entities = [(e.get("text", ""), e.get("label", "")) for e in result.get("named_entities") or []
+                    if isinstance(e, dict)]
+        for category, texts in (result.get("entities_by_type") or {}).items():
+            if isinstance(texts, list):
+                entities.extend((text, category) for text in texts if isinstance(text, str))
+        for text, label in entities:
+            # entities_by_type keys are already categories; named_entities carry model labels
+            located = label == "locations" or entity_category(label) == "locations"
+            text, known = self._canonical(text, "state" if located else None)
+            add("entity", text)
+            kind = known["kind"] if known else None
+            if kind == "state":
+                add("state", text)
+            elif kind == "scheme" or (known is None and "scheme" in label.lower()):
+                add("scheme", text)
+
+        for state in result.get("states_mentioned") or []:
+            if isinstance(state, str):
+                add("state", self._canonical(state, "state")[0])
+        for policy in result.get("policies_schemes") or []:
+            name = policy.get("name") if isinstance(policy, dict) else policy
+            if isinstance(name, str):
+                add("scheme", self._canonical(name)[0])
+        for stat in result.get("key_statistics") or []:
+            if isinstance(stat, dict):
+                for word in metric_terms(str(stat.get("metric") or "")):
+                    add("metric", word)
+        if isinstance(result.get("document_type"), str):
+            add("document_type", result["document_type"])
+        return [(kind, key, text) for (kind, key), text in postings.items()]
+
+    def statistics(self, result: Dict) -> List[Tuple]:
+        """(metric, metric_key, value, number, context, state) rows for a result's key_statistics."""
+        rows = []
+        for stat in result.get("key_statistics") or []:
+            if not isinstance(stat, dict) or not stat.get("metric"):
+                continue
+            metric = clean_entity_text(stat["metric"])
+            value = stat.get("value")
+            context = stat.get("context")
+            value_text = value if isinstance(value, str) or value is None else json.dumps(value)
+            context_text = context if isinstance(context, str) or context is None else json.dumps(context)
+            rows.append((metric, " ".join(metric_terms(metric)), value_text, parse_number(value),
+                         context_text, self.gazetteer.state_in(f"{metric} {context_text or ''}")))
+        return rows
+
+    def add(self, doc_id: str, result: Dict, session_id: Optional[str] = None,
+            filename: Optional[str] = None):
+        """Indexes a result under doc_id, replacing whatever was indexed for it before."""
+        terms = self.terms(result)
+        statistics = self.statistics(result)
+        # The model sometimes answers with a list or object here; sqlite only binds scalars
+        document_type = result.get("document_type")
+        document_type = document_type if isinstance(document_type, str) else None
+        conn = self._conn()
+        with conn:
+            conn.execute("DELETE FROM terms WHERE doc_id = ?", (doc_id,))
+            conn.execute("DELETE FROM statistics WHERE doc_id = ?", (doc_id,))
+            conn.execute(
+                "INSERT OR REPLACE INTO documents (doc_id, session_id, filename, document_type, summary, indexed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (doc_id, session_id, filename, document_type,
+                 str(result.get("summary") or "")[:500], time.time()))
+            conn.executemany("INSERT INTO terms (kind, key, doc_id, text) VALUES (?, ?, ?, ?)",
+                             [(kind, key, doc_id, text) for kind, key, text in terms])
+            conn.executemany(
+                "INSERT INTO statistics (doc_id, metric, metric_key, value, number, context, state) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [(doc_id,) + row for row in statistics])
+
+    def remove(self, doc_id: str):
+        conn = self._conn()
+        with conn:
+            for table in ("terms", "statistics", "documents"):
+                conn.execute(f"DELETE FROM {table} WHERE doc_id = ?", (doc_id,))
+
+    def add_many(self, documents: Iterable[Tuple[str, Dict, Optional[str], Optional[str]]]) -> int:
+        """Indexes (doc_id, result, session_id, filename) tuples. Returns the number indexed."""
+        count = 0
+        for doc_id, result, session_id, filename in documents:
+            if isinstance(result, dict):
+                self.add(doc_id, result, session_id, filename)
+                count += 1
+        return count
+
+    # --- Queries --------------------------------------------------------------
+
+    def _filters(self, entity: Optional[str] = None, state: Optional[str] = None,
+                 scheme: Optional[str] = None, metric: Optional[str] = None,
+                 document_type: Optional[str] = None) -> List[Tuple[str, str]]:
+        filters = []
+        for kind, text in (("entity", entity), ("state", state), ("scheme", scheme)):
+            if text:
+                filters.append((kind, term_key(self._canonical(text, kind)[0])))
+        if metric:
+            filters.extend(("metric", word) for word in metric_terms(metric))
+        if document_type:
+            filters.append(("document_type", term_key(document_type)))
+        return filters
+
+    @staticmethod
+    def _intersection(filters: List[Tuple[str, str]]) -> Tuple[str, List[str]]:
+        """SQL selecting the doc_ids posted under every (kind, key)."""
+        query = " INTERSECT ".join(["SELECT doc_id FROM terms WHERE kind = ? AND key = ?"] * len(filters))
+        return query, [part for pair in filters for part in pair]
+
+    def _doc_ids(self, filters: List[Tuple[str, str]], limit: int) -> List[str]:
+        """Documents matching every filter, newest first."""
+        query, params = self._intersection(filters)
+        rows = self._conn().execute(
+            f"SELECT d.doc_id FROM documents d WHERE d.doc_id IN ({query}) ORDER BY d.indexed_at DESC LIMIT ?",
+            params + [limit]).fetchall()
+        return [row["doc_id"] for row in rows]
+
+    def _statistics_where(self, metric: Optional[str], state: Optional[str]) -> Tuple[str, List[str]]:
+        """Conditions on statistics (aliased s) for a metric name and state."""
+        sql, params = "", []
+        for word in metric_terms(metric or ""):
+            sql += " AND (' ' || s.metric_key || ' ') LIKE ?"
+            params.append(f"% {word} %")
+        if state:
+            # Figures attributed to another state are left out; unattributed ones are kept
+            sql += " AND (s.state IS NULL OR s.state = ?)"
+            params.append(self._canonical(state, "state")[0])
+        return sql, params
+
+    def _matching_statistics(self, doc_ids: List[str], metric: Optional[str],
+                             state: Optional[str]) -> Dict[str, List[Dict]]:
+        where, params = self._statistics_where(metric, state)
+        grouped: Dict[str, List[Dict]] = {}
+        for row in self._conn().execute(
+                f"SELECT s.doc_id, s.metric, s.value, s.number, s.context, s.state FROM statistics s "
+                f"WHERE s.doc_id IN ({','.join('?' * len(doc_ids))}){where} ORDER BY s.id",
+                list(doc_ids) + params):
+            grouped.setdefault(row["doc_id"], []).append(
+                {key: row[key] for key in ("metric", "value", "number", "context", "state")})
+        return grouped
+
+    def search(self, entity: Optional[str] = None, state: Optional[str] = None,
+               scheme: Optional[str] = None, metric: Optional[str] = None,
+               document_type: Optional[str] = None, limit: int = 50) -> List[Dict]:
+        """Documents matching every given filter, newest first, with the statistics that matched.
+
+        search(state="Bihar", metric="dropout rates") answers "which reports
+        mention Bihar dropout rates", with the values each one gives.
+        """
+        filters = self._filters(entity, state, scheme, metric, document_type)
+        if not filters:
+            return []
+        doc_ids = self._doc_ids(filters, limit)
+        if not doc_ids:
+            return []
+        stats = self._matching_statistics(doc_ids, metric, state) if metric else {}
+        rows = self._conn().execute(
+            f"SELECT doc_id, session_id, filename, document_type, summary, indexed_at FROM documents "
+            f"WHERE doc_id IN ({','.join('?' * len(doc_ids))})", doc_ids).fetchall()
+        documents = {row["doc_id"]: dict(row) for row in rows}
+        results = []
+        for doc_id in doc_ids:
+            document = documents[doc_id]
+            if metric:
+                document["statistics"] = stats.get(doc_id, [])
+            results.append(document)
+        return results
+
+    def statistic_values(self, metric: str, state: Optional[str] = None, limit: int = 200) -> List[Dict]:
+        """Indexed values of a metric across documents, newest first; with state, figures
+        attributed to that state come before unattributed ones from documents mentioning it."""
+        filters = self._filters(state=state, metric=metric)
+        if not filters:
+            return []
+        query, params = self._intersection(filters)
+        where, where_params = self._statistics_where(metric, state)
+        rows = self._conn().execute(
+            f"SELECT s.metric, s.value, s.number, s.context, s.state, d.doc_id, d.session_id, d.filename "
+            f"FROM statistics s JOIN documents d ON d.doc_id = s.doc_id "
+            f"WHERE s.doc_id IN ({query}){where} "
+            f"ORDER BY s.state IS NULL, d.indexed_at DESC, s.id LIMIT ?",
+            params + where_params + [limit]).fetchall()
+        return [dict(row) for row in rows]
+
+    def top_terms(self, kind: str, prefix: str = "", limit: int = 50) -> List[Dict]:
+        """Most common terms of a kind, optionally starting with prefix, with their document counts."""
+        if kind not in KINDS:
+            raise ValueError(f"Unknown term kind {kind!r}; expected one of {', '.join(KINDS)}")
+        key = term_key(prefix) if prefix else ""
+        rows = self._conn().execute(
+            "SELECT key, MIN(text) AS text, COUNT(*) AS documents FROM terms "
+            "WHERE kind = ? AND key >= ? AND key < ? GROUP BY key ORDER BY documents DESC, key LIMIT ?",
+            (kind, key, key + "\uffff", limit)).fetchall()
+        return [dict(row) for row in rows]
+
+    def stats(self) -> Dict[str, Any]:
+        conn = self._conn()
+        counts = {row["kind"]: row["n"] for row in conn.execute(
+            "SELECT kind, COUNT(DISTINCT key) AS n FROM terms GROUP BY kind")}
+        return {
+            "documents": conn.execute("SELECT COUNT(*) FROM documents").fetchone()[0],
+            "statistics": conn.execute("SELECT COUNT(*) FROM statistics").fetchone()[0],
+            "terms": {kind: counts.get(kind, 0) for kind in KINDS},
+        }
+
+
+def _iter_jsonl(path: str):
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            file_path = record.get("file", "")
+            # Documents are keyed by content hash, as the web app does; older batch runs did not
+            # record it, so hash the file when it is still there
+            doc_id = record.get("file_hash")
+            if not doc_id and os.path.isfile(file_path):
+                doc_id = file_sha256(file_path)
+            yield doc_id or file_path, record.get("result"), None, os.path.basename(file_path)
+
+
+def _iter_sessions(db_path: str):
+    conn = sqlite3.connect(db_path)
+    try:
+        for session_id, file_hash, filename, result in conn.execute(
+                "SELECT id, file_hash, filename, result FROM sessions WHERE result IS NOT NULL"):
+            yield file_hash or session_id, json.loads(result), session_id, filename
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Build or query the cross-document result index")
+    parser.add_argument("--db", default=None, help="Index database (default: $RESULT_INDEX_DB or index.db)")
+    parser.add_argument("--from-sessions", metavar="SESSIONS_DB",
+                        help="Index every stored result in a web app session database")
+    parser.add_argument("--from-jsonl", metavar="RESULTS_JSONL", help="Index a batch results.jsonl file")
+    parser.add_argument("--entity")
+    parser.add_argument("--state")
+    parser.add_argument("--scheme")
+    parser.add_argument("--metric")
+    parser.add_argument("--type", dest="document_type")
+    parser.add_argument("--limit", type=int, default=20)
+    args = parser.parse_args()
+
+    index = ResultIndex(args.db)
+    if args.from_sessions:
+        print(f"Indexed {index.add_many(_iter_sessions(args.from_sessions))} stored results")
+    if args.from_jsonl:
+        print(f"Indexed {index.add_many(_iter_jsonl(args.from_jsonl))} batch results")
+    if any([args.entity, args.state, args.scheme, args.metric, args.document_type]):
+        start = time.perf_counter()
+        found = index.search(args.entity, args.state, args.scheme, args.metric, args.document_type, args.limit)
+        print(json.dumps(found, indent=2, ensure_ascii=False))
+        print(f"{len(found)} documents in {(time.perf_counter() - start) * 1000:.1f} ms")
+    elif not (args.from_sessions or args.from_jsonl):
+        print(json.dumps(index.stats(), indent=2))
@@ -0,0 +1,105 @@
+import time
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Callable, Dict, List, Optional, Any
+
+
+class Stage:
+    """A named step whose function receives the values of its declared inputs as keyword arguments."""
+
+    def __init__(self, name: str, func: Callable[..., Any], inputs: Optional[List[str]] = None):
+        self.name = name
+        self.func = func
+        self.inputs = inputs or []
+
+
+class StageGraph:
+    """A small DAG of stages, run so that independent stages overlap.
+
+    Each stage's return value is stored under the stage's name and becomes
+    available as an input to later stages. Values passed to run() act as
+    already-completed stages.
+    """
+
+    def __init__(self, stages: List[Stage]):
+        self.stages = {stage.name: stage for stage in stages}
+        if len(self.stages) != len(stages):
+            raise ValueError("Stage names must be unique")
+
+    def _validate(self, available: set):
+        known = available | set(self.stages)
+        for stage in self.stages.values():
+            missing = [name for name in stage.inputs if name not in known]
+            if missing:
+                raise ValueError(f"Stage '{stage.name}' depends on unknown inputs: {missing}")
+        # Kahn's algorithm: every stage must become runnable for the graph to be acyclic
+        done = set(available)
+        remaining = dict(self.stages)
+        while remaining:
+            ready = [name for name, stage in remaining.items() if all(i in done for i in stage.inputs)]
+            if not ready:
+                raise ValueError(f"Stage graph has a cycle among: {sorted(remaining)}")
+            for name in ready:
+                done.add(name)
+                del remaining[name]
+
+    def run(self, initial: Optional[Dict[str, Any]] = None, max_workers: Optional[int] = None,
+            cancel_event: Optional[threading.Event] = None,
+            on_cancel: Optional[Callable[[], None]] = None) -> Dict[str, Any]:
+        """Runs every stage once its inputs are ready.
+
+        Returns all values plus "_stage_timings", a list of
+        {"stage", "start", "end", "seconds"} in completion order with times
+        relative to the start of the run. The first stage error is re-raised
+        after in-flight stages finish; no new stages start after an error or
+        once cancel_event is set (on_cancel is then called, and may raise).
+        """
+        values = dict(initial or {})
+        self._validate(set(values))
+        timings = []
+        origin = time.time()
+        pending = {name: stage for name, stage in self.stages.items() if name not in values}
+        running = {}
+        error = None
+
+        def call(stage: Stage):
+            start = time.time()
+            value = stage.func(**{name: values[name] for name in stage.inputs})
+            return value, start, time.time()
+
+        with ThreadPoolExecutor(max_workers=max_workers or len(self.stages) or 1,
+                                thread_name_prefix="stage") as executor:
+            while pending or running:
+                stop = error is not None or (cancel_event is not None and cancel_event.is_set())
+                if not stop:
+                    for name, stage in list(pending.items()):
+                        if all(i in values for i in stage.inputs):
+                            # Stages see the caller's context variables, e.g. the current run's metrics
+                            running[executor.submit(contextvars.copy_context().run, call, stage)] = name
+                            del pending[name]
+                if not running:
+                    break
+
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    name = running.pop(future)
+                    try:
+                        value, start, end = future.result()
+                    except Exception as e:
+                        error = error or e
+                        continue
+                    values[name] = value
+                    timings.append({
+                        "stage": name,
+                        "start": round(start - origin, 3),
+                        "end": round(end - origin, 3),
+                        "seconds": round(end - start, 3),
+                    })
+
+        if error is not None:
+            raise error
+        if pending and on_cancel is not None:
+            on_cancel()
+        values["_stage_timings"] = timings
+        return values
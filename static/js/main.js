@@ -47,21 +47,8 @@ function handleFile(file) {
         return;
     }
 
-    // Upload file
-    const formData = new FormData();
-    formData.append('file', file);
-
-    fetch('/upload', {
-        method: 'POST',
-        body: formData
-    })
-    .then(response => response.json())
+    uploadInChunks(file)
     .then(data => {
-        if (data.error) {
-            alert(data.error);
-            return;
-        }
-
         currentSessionId = data.session_id;
         fileName.textContent = data.filename;
         fileInfo.classList.remove('hidden');
@@ -70,11 +57,65 @@ function handleFile(file) {
     })
     .catch(error => {
         console.error('Error:', error);
-        alert('Error uploading file');
+        alert(error.message || 'Error uploading file');
     });
 }
 
+const UPLOAD_RETRIES = 5;
+
+// Sends the file in chunks; after a failed chunk it asks the server how much
+// arrived and carries on from there instead of starting over
+async function uploadInChunks(file) {
+    const begin = await fetch('/uploads', {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json'
+        },
+        body: JSON.stringify({ filename: file.name, size: file.size })
+    }).then(response => response.json());
+    if (begin.error) {
+        throw new Error(begin.error);
+    }
+
+    let offset = begin.offset;
+    let failures = 0;
+    let resync = false;
+    while (true) {
+        let data;
+        try {
+            if (resync) {
+                data = await fetch(`/uploads/${begin.upload_id}`).then(response => response.json());
+            } else {
+                const chunk = file.slice(offset, offset + begin.chunk_bytes);
+                data = await fetch(`/uploads/${begin.upload_id}?offset=${offset}`, {
+                    method: 'PUT',
+                    body: chunk
+                }).then(response => response.json());
+            }
+            resync = false;
+        } catch (error) {
+            if (++failures > UPLOAD_RETRIES) {
+                throw error;
+            }
+            resync = true;
+            await new Promise(resolve => setTimeout(resolve, 1000 * failures));
+            continue;
+        }
+        if (data.error && data.offset === undefined) {
+            throw new Error(data.error);
+        }
+        if (data.session_id) {
+            return data;
+        }
+        offset = data.offset;
+    }
+}
+
 function removeFile() {
+    if (currentJobId) {
+        fetch(`/jobs/${currentJobId}/cancel`, { method: 'POST' });
+        currentJobId = null;
+    }
     fileInput.value = '';
     fileInfo.classList.add('hidden');
     uploadArea.classList.remove('hidden');
@@ -86,6 +127,9 @@ function removeFile() {
 // Process button
 processBtn.addEventListener('click', processDocument);
 
+const POLL_INTERVAL_MS = 2000;
+let currentJobId = null;
+
 function processDocument() {
     if (!currentSessionId) {
         alert('Please upload a file first');
@@ -95,7 +139,7 @@ function processDocument() {
     // Show progress
     document.getElementById('progressSection').classList.remove('hidden');
     processBtn.disabled = true;
-    updateProgress(10, 'Uploading file...');
+    updateProgress(10, 'Queuing document...');
 
     fetch('/process', {
         method: 'POST',
@@ -109,14 +153,139 @@ function processDocument() {
     .then(response => response.json())
     .then(data => {
         if (data.error) {
-            alert('Error: ' + data.error);
-            hideProgress();
-            processBtn.disabled = false;
+            processingFailed('Error: ' + data.error);
+            return;
+        }
+
+        currentJobId = data.job_id;
+        updateProgress(20, 'Waiting for a worker...');
+        watchJob(data.job_id);
+    })
+    .catch(error => {
+        console.error('Error:', error);
+        processingFailed('Error processing document');
+    });
+}
+
+// Stream stage progress over server-sent events, falling back to polling
+function watchJob(jobId) {
+    if (!window.EventSource) {
+        setTimeout(() => pollJob(jobId), POLL_INTERVAL_MS);
+        return;
+    }
+
+    const source = new EventSource(`/jobs/${jobId}/events`);
+    source.onmessage = (message) => {
+        if (jobId !== currentJobId) {
+            source.close();
+            return;
+        }
+
+        const event = JSON.parse(message.data);
+        if (event.stage === 'job') {
+            if (event.status === 'queued') {
+                updateProgress(20, 'Waiting for a worker...');
+            } else if (event.status === 'done') {
+                source.close();
+                fetchJobResult(jobId);
+            } else if (event.status === 'failed') {
+                source.close();
+                processingFailed('Error: ' + (event.error || 'Processing failed'));
+            } else if (event.status === 'cancelled') {
+                source.close();
+                processingFailed('Processing was cancelled');
+            }
+            return;
+        }
+        showStageProgress(event);
+    };
+    source.addEventListener('end', () => source.close());
+    source.onerror = () => {
+        source.close();
+        if (jobId === currentJobId) {
+            setTimeout(() => pollJob(jobId), POLL_INTERVAL_MS);
+        }
+    };
+}
+
+function showStageProgress(event) {
+    const elapsed = `${Math.round(event.elapsed || 0)}s`;
+    const fraction = event.total ? event.done / event.total : 0;
+
+    if (event.stage === 'cache') {
+        updateProgress(90, 'Found a cached result...');
+    } else if (event.stage === 'ingest') {
+        updateProgress(25, `Reading ${event.pages} pages...`);
+    } else if (event.stage === 'markdown' && event.status === 'progress') {
+        // Markdown runs alongside vision, so only report it without moving the bar
+        updateProgress(null, `Converted ${event.done}/${event.total} page ranges (${elapsed})`);
+    } else if (event.stage === 'markdown') {
+        updateProgress(null, `Text extracted from ${event.pages} pages (${elapsed})`);
+    } else if (event.stage === 'vision' && event.status === 'progress') {
+        updateProgress(30 + 30 * fraction, `Analyzing images ${event.done}/${event.total} (${elapsed})`);
+    } else if (event.stage === 'vision') {
+        updateProgress(60, `Analyzed ${event.described} images (${elapsed})`);
+    } else if (event.stage === 'ner' && event.status === 'progress') {
+        updateProgress(60 + 15 * fraction, `Extracting entities ${event.done}/${event.total} (${elapsed})`);
+    } else if (event.stage === 'ner') {
+        updateProgress(75, `Found ${event.entities} entities (${elapsed})`);
+    } else if (event.stage === 'structure' && event.status === 'progress') {
+        updateProgress(75 + 20 * fraction, `Structuring data ${event.done}/${event.total} (${elapsed})`);
+    } else if (event.stage === 'structure') {
+        updateProgress(95, `Structured data ready (${elapsed})`);
+    }
+}
+
+function pollJob(jobId) {
+    if (jobId !== currentJobId) {
+        return;
+    }
+
+    fetch(`/jobs/${jobId}`)
+    .then(response => response.json())
+    .then(job => {
+        if (job.error && !job.status) {
+            processingFailed('Error: ' + job.error);
+            return;
+        }
+
+        if (job.status === 'queued') {
+            const position = job.queue_position ? ` (position ${job.queue_position})` : '';
+            updateProgress(20, `Waiting for a worker${position}...`);
+        } else if (job.status === 'running') {
+            const seconds = Math.round(job.timings.run_seconds || 0);
+            updateProgress(50, `Processing document... ${seconds}s`);
+        } else if (job.status === 'done') {
+            fetchJobResult(jobId);
+            return;
+        } else if (job.status === 'failed') {
+            processingFailed('Error: ' + (job.error || 'Processing failed'));
+            return;
+        } else if (job.status === 'cancelled') {
+            processingFailed('Processing was cancelled');
+            return;
+        }
+
+        setTimeout(() => pollJob(jobId), POLL_INTERVAL_MS);
+    })
+    .catch(error => {
+        console.error('Error:', error);
+        processingFailed('Error checking processing status');
+    });
+}
+
+function fetchJobResult(jobId) {
+    fetch(`/jobs/${jobId}/result`)
+    .then(response => response.json())
+    .then(data => {
+        if (data.error) {
+            processingFailed('Error: ' + data.error);
             return;
         }
 
         updateProgress(100, 'Processing complete!');
         currentData = data.data;
+        currentJobId = null;
         
         setTimeout(() => {
             hideProgress();
@@ -125,14 +294,21 @@ function processDocument() {
     })
     .catch(error => {
         console.error('Error:', error);
-        alert('Error processing document');
-        hideProgress();
-        processBtn.disabled = false;
+        processingFailed('Error fetching results');
     });
 }
 
+function processingFailed(message) {
+    alert(message);
+    currentJobId = null;
+    hideProgress();
+    processBtn.disabled = false;
+}
+
 function updateProgress(percent, text) {
-    document.getElementById('progressFill').style.width = percent + '%';
+    if (percent !== null) {
+        document.getElementById('progressFill').style.width = percent + '%';
+    }
     document.getElementById('progressText').textContent = text;
 }
 
@@ -227,7 +403,7 @@ function displayResults(data) {
                 const tbody = document.createElement('tbody');
                 
                 // Headers
-                const headers = Object.keys(table.data[0]);
+                const headers = table.columns || Object.keys(table.data[0]);
                 const headerRow = document.createElement('tr');
                 headers.forEach(header => {
                     const th = document.createElement('th');
@@ -241,7 +417,7 @@ function displayResults(data) {
                     const tr = document.createElement('tr');
                     headers.forEach(header => {
                         const td = document.createElement('td');
-                        td.textContent = row[header] || '';
+                        td.textContent = row[header] ?? '';
                         tr.appendChild(td);
                     });
                     tbody.appendChild(tr);
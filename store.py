@@ -0,0 +1,252 @@
+import os
+import json
+import time
+import sqlite3
+import threading
+from typing import Any, Dict, Optional, Tuple
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    id TEXT PRIMARY KEY,
+    filename TEXT,
+    upload_path TEXT,
+    file_hash TEXT,
+    created_at REAL NOT NULL,
+    job_id TEXT,
+    status TEXT,
+    error TEXT,
+    result TEXT,
+    result_at REAL
+);
+CREATE INDEX IF NOT EXISTS sessions_job_id ON sessions (job_id);
+CREATE INDEX IF NOT EXISTS sessions_file_hash ON sessions (file_hash);
+CREATE INDEX IF NOT EXISTS sessions_created_at ON sessions (created_at);
+CREATE TABLE IF NOT EXISTS session_files (
+    session_id TEXT NOT NULL,
+    path TEXT NOT NULL,
+    PRIMARY KEY (session_id, path)
+);
+CREATE TABLE IF NOT EXISTS blobs (
+    file_hash TEXT PRIMARY KEY,
+    path TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    last_used REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS uploads (
+    id TEXT PRIMARY KEY,
+    filename TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    partial_path TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    session_id TEXT
+);
+CREATE INDEX IF NOT EXISTS uploads_created_at ON uploads (created_at);
+"""
+
+# Statuses that mean a job may still write to the session's files
+ACTIVE_STATUSES = ("queued", "running")
+
+
+class SessionStore:
+    """SQLite index of upload sessions: file paths, hashes, job state and results.
+
+    Every lookup is a primary-key or indexed query, so nothing scans the
+    uploads/ or outputs/ folders. Files belonging to a session (rendered
+    artifacts registered with add_file) are deleted with it by sweep() once
+    the session is older than ttl seconds. Uploaded PDFs are stored once per
+    content hash as blobs shared by every session that uploaded the same
+    bytes; a blob is swept when no session references it any more.
+
+    Sessions with a queued or running job are kept past ttl, but only up
+    to max_active seconds: a process that died mid-job leaves its session
+    looking active forever.
+    """
+
+    def __init__(self, db_path: Optional[str] = None, ttl: Optional[float] = None,
+                 max_active: Optional[float] = None):
+        self.db_path = db_path or os.getenv("SESSION_DB", "sessions.db")
+        self.ttl = ttl if ttl is not None else float(os.getenv("SESSION_TTL_HOURS", "168")) * 3600
+        self.max_active = (max_active if max_active is not None
+                           else float(os.getenv("SESSION_MAX_ACTIVE_HOURS", "24")) * 3600)
+        self._local = threading.local()
+        # Held while a blob is checked and deleted, and by UploadManager while it links an
+        # upload to an existing blob, so a sweep cannot delete a blob that is being reused
+        self.blob_lock = threading.RLock()
+        self._sweeper: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        with self._conn() as conn:
+            conn.executescript(SCHEMA)
+
+    def _conn(self) -> sqlite3.Connection:
+        # One connection per thread; WAL lets readers proceed while a job writes its result
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            directory = os.path.dirname(os.path.abspath(self.db_path))
+            os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _execute(self, sql: str, params: Tuple = ()) -> sqlite3.Cursor:
+        conn = self._conn()
+        with conn:
+            return conn.execute(sql, params)
+
+    def create_session(self, session_id: str, filename: str, upload_path: str,
+                       file_hash: Optional[str] = None):
+        self._execute(
+            "INSERT INTO sessions (id, filename, upload_path, file_hash, created_at) VALUES (?, ?, ?, ?, ?)",
+            (session_id, filename, upload_path, file_hash, time.time()))
+
+    def add_blob(self, file_hash: str, path: str, size: int) -> bool:
+        """Records a stored upload, or refreshes it if already known. Returns True if it was new."""
+        now = time.time()
+        conn = self._conn()
+        with conn:
+            inserted = conn.execute(
+                "INSERT OR IGNORE INTO blobs (file_hash, path, size, last_used) VALUES (?, ?, ?, ?)",
+                (file_hash, path, size, now)).rowcount
+            if not inserted:
+                conn.execute("UPDATE blobs SET last_used = ? WHERE file_hash = ?", (now, file_hash))
+        return bool(inserted)
+
+    def create_upload(self, upload_id: str, filename: str, size: int, partial_path: str):
+        self._execute(
+            "INSERT INTO uploads (id, filename, size, partial_path, created_at) VALUES (?, ?, ?, ?, ?)",
+            (upload_id, filename, size, partial_path, time.time()))
+
+    def get_upload(self, upload_id: str) -> Optional[Dict[str, Any]]:
+        row = self._execute(
+            "SELECT id, filename, size, partial_path, created_at, session_id FROM uploads WHERE id = ?",
+            (upload_id,)).fetchone()
+        return dict(row) if row else None
+
+    def finish_upload(self, upload_id: str, session_id: str):
+        self._execute("UPDATE uploads SET session_id = ? WHERE id = ?", (session_id, upload_id))
+
+    def get_session(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """The session row without its result blob, or None."""
+        row = self._execute(
+            "SELECT id, filename, upload_path, file_hash, created_at, job_id, status, error, result_at "
+            "FROM sessions WHERE id = ?", (session_id,)).fetchone()
+        return dict(row) if row else None
+
+    def get_by_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        row = self._execute(
+            "SELECT id, filename, upload_path, file_hash, created_at, job_id, status, error, result_at "
+            "FROM sessions WHERE job_id = ?", (job_id,)).fetchone()
+        return dict(row) if row else None
+
+    def start_job(self, session_id: str):
+        """Marks a session as queued before its job is submitted."""
+        self._execute("UPDATE sessions SET status = 'queued', job_id = NULL, error = NULL WHERE id = ?",
+                      (session_id,))
+
+    def attach_job(self, session_id: str, job_id: str):
+        self._execute("UPDATE sessions SET job_id = ? WHERE id = ?", (job_id, session_id))
+
+    def set_status(self, session_id: str, status: str, error: Optional[str] = None):
+        self._execute("UPDATE sessions SET status = ?, error = ? WHERE id = ?", (status, error, session_id))
+
+    def save_result(self, session_id: str, result: Dict):
+        """Stores the result and marks the session done."""
+        self._execute(
+            "UPDATE sessions SET result = ?, result_at = ?, status = 'done', error = NULL WHERE id = ?",
+            (json.dumps(result, ensure_ascii=False), time.time(), session_id))
+
+    def get_result(self, session_id: str) -> Tuple[Optional[Dict], Optional[float]]:
+        """Returns (result, saved_at), or (None, None) if the session has no result."""
+        row = self._execute("SELECT result, result_at FROM sessions WHERE id = ?", (session_id,)).fetchone()
+        if row is None or row["result"] is None:
+            return None, None
+        return json.loads(row["result"]), row["result_at"]
+
+    def add_file(self, session_id: str, path: str):
+        """Registers a file to delete together with the session."""
+        self._execute("INSERT OR IGNORE INTO session_files (session_id, path) VALUES (?, ?)", (session_id, path))
+
+    def delete_session(self, session_id: str) -> int:
+        """Deletes a session, its row and its registered files. Returns the number of files removed."""
+        paths = [row["path"] for row in self._execute(
+            "SELECT path FROM session_files WHERE session_id = ?", (session_id,)).fetchall()]
+        conn = self._conn()
+        with conn:
+            conn.execute("DELETE FROM session_files WHERE session_id = ?", (session_id,))
+            conn.execute("DELETE FROM sessions WHERE id = ?", (session_id,))
+        removed = 0
+        for path in paths:
+            try:
+                os.remove(path)
+                removed += 1
+            except OSError:
+                pass
+        return removed
+
+    def sweep(self, now: Optional[float] = None) -> int:
+        """Deletes sessions older than ttl whose jobs are not active (or have been
+        active for longer than max_active), then abandoned uploads and unreferenced
+        blobs. Returns the number of sessions deleted."""
+        if not self.ttl:
+            return 0
+        now = now or time.time()
+        cutoff = now - self.ttl
+        stuck_cutoff = now - max(self.ttl, self.max_active)
+        rows = self._execute(
+            f"SELECT id, status FROM sessions WHERE created_at < ? "
+            f"AND (status IS NULL OR status NOT IN ({','.join('?' * len(ACTIVE_STATUSES))}) "
+            f"OR created_at < ?)",
+            (cutoff,) + ACTIVE_STATUSES + (stuck_cutoff,)).fetchall()
+        for row in rows:
+            self.delete_session(row["id"])
+        if rows:
+            stuck = sum(1 for row in rows if row["status"] in ACTIVE_STATUSES)
+            print(f"Session sweep removed {len(rows)} expired sessions"
+                  + (f", {stuck} of them stuck in an active state" if stuck else ""))
+        self._sweep_uploads(cutoff)
+        return len(rows)
+
+    def _sweep_uploads(self, cutoff: float):
+        uploads = self._execute("SELECT id, partial_path FROM uploads WHERE created_at < ?",
+                                (cutoff,)).fetchall()
+        paths = [row["partial_path"] for row in uploads]
+        conn = self._conn()
+        with self.blob_lock:
+            with conn:
+                # Blobs unused since the cutoff and no longer behind any session, checked and
+                # deleted in one write transaction so no session can start using one in between
+                conn.execute("BEGIN IMMEDIATE")
+                conn.executemany("DELETE FROM uploads WHERE id = ?", [(row["id"],) for row in uploads])
+                blobs = conn.execute(
+                    "SELECT file_hash, path FROM blobs WHERE last_used < ? "
+                    "AND file_hash NOT IN (SELECT file_hash FROM sessions WHERE file_hash IS NOT NULL)",
+                    (cutoff,)).fetchall()
+                conn.executemany("DELETE FROM blobs WHERE file_hash = ?", [(row["file_hash"],) for row in blobs])
+            for path in paths + [row["path"] for row in blobs]:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+        if blobs:
+            print(f"Session sweep removed {len(blobs)} unreferenced uploads")
+
+    def start_sweeper(self, interval: Optional[float] = None):
+        """Runs sweep() every interval seconds on a daemon thread."""
+        interval = interval or float(os.getenv("SESSION_SWEEP_SECONDS", "3600"))
+        if self._sweeper is not None or not self.ttl:
+            return
+
+        def loop():
+            while not self._stop.wait(interval):
+                try:
+                    self.sweep()
+                except Exception as e:
+                    print(f"Session sweep failed: {e}")
+
+        self._sweeper = threading.Thread(target=loop, name="session-sweeper", daemon=True)
+        self._sweeper.start()
+
+    def stop_sweeper(self):
+        self._stop.set()
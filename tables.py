@@ -0,0 +1,215 @@
+import re
+from typing import Any, Dict, List, Optional, Union
+
+# Bump whenever extraction changes, so tables stored with cached pages and results are redone
+TABLES_VERSION = "2"
+# Same strategy pymupdf4llm uses, so the tables found here are the ones it renders as pipe blocks
+TABLE_STRATEGY = "lines_strict"
+# A caption this far (in points) above a table is taken as its title
+CAPTION_GAP = 36
+# Column names listed in a table's prompt marker
+MARKER_COLUMNS = 12
+
+# "1,20,000", "-3", "78.5"; anything else (%, units, footnote marks) stays text
+NUMBER_RE = re.compile(r"^[-+]?(?:\d{1,3}(?:,\d{2,3})+|\d+)(?:\.\d+)?$")
+# "007", "09120100101": UDISE, district and PIN codes, kept as text so the zeros survive
+LEADING_ZERO_RE = re.compile(r"^[-+]?0\d")
+CAPTION_RE = re.compile(r"^(?:table|tab\.)\s*[\dIVXA-Z]", re.IGNORECASE)
+PIPE_LINE_RE = re.compile(r"^\s*\|")
+
+Cell = Union[int, float, str, None]
+
+
+def typed_value(text: Optional[str]) -> Cell:
+    """A cell's text as int or float when it is a plain number, None when empty, else the text.
+
+    Digit strings with a leading zero are codes, not numbers, and stay text.
+    """
+    text = " ".join((text or "").split())
+    if not text:
+        return None
+    if NUMBER_RE.match(text) and not LEADING_ZERO_RE.match(text):
+        number = text.replace(",", "")
+        return float(number) if "." in number else int(number)
+    return text
+
+
+def column_types(columns: List[str], data: List[Dict[str, Cell]]) -> Dict[str, str]:
+    """"int", "float" or "text" per column, judged on its non-empty cells."""
+    types = {}
+    for column in columns:
+        values = [row[column] for row in data if row.get(column) is not None]
+        if values and all(isinstance(v, int) for v in values):
+            types[column] = "int"
+        elif values and all(isinstance(v, (int, float)) for v in values):
+            types[column] = "float"
+        else:
+            types[column] = "text"
+    return types
+
+
+def _unique_names(names: List[Optional[str]]) -> List[str]:
+    """Header names with blanks filled in and repeats suffixed, so every row dict keeps every cell."""
+    unique = []
+    for i, name in enumerate(names):
+        name = " ".join((name or "").split()) or f"column_{i + 1}"
+        candidate, n = name, 2
+        while candidate in unique:
+            candidate, n = f"{name}_{n}", n + 1
+        unique.append(candidate)
+    return unique
+
+
+def _cell_texts(cells: list, words: list) -> List[Optional[str]]:
+    """Text of each cell rectangle, built from the page words whose centre falls inside it.
+
+    Words keep PyMuPDF's reading order; None marks a cell merged into its neighbour.
+    """
+    texts: List[Optional[str]] = []
+    for cell in cells:
+        if cell is None:
+            texts.append(None)
+            continue
+        x0, y0, x1, y1 = cell
+        texts.append(" ".join(w[4] for w in words
+                              if x0 <= (w[0] + w[2]) / 2 < x1 and y0 <= (w[1] + w[3]) / 2 < y1))
+    return texts
+
+
+def _caption(bbox, words: list) -> Optional[str]:
+    """The "Table 4.1: ..." line just above bbox, if there is one."""
+    _, y0, x1, _ = bbox
+    lines: Dict[tuple, list] = {}
+    for w in words:
+        if y0 - CAPTION_GAP <= w[3] <= y0 + 1:
+            lines.setdefault((w[5], w[6]), []).append(w)
+    # Captions are often aligned with the page margin rather than the table, so only
+    # lines starting right of the table are ruled out
+    lines = {key: line for key, line in lines.items() if min(w[0] for w in line) < x1}
+    if not lines:
+        return None
+    nearest = max(lines.values(), key=lambda line: max(w[3] for w in line))
+    text = " ".join(w[4] for w in nearest)
+    return text if CAPTION_RE.match(text) else None
+
+
+def page_tables(page) -> List[Optional[Dict[str, Any]]]:
+    """Extracts the tables PyMuPDF finds on a page into typed rows with page provenance.
+
+    Returns one entry per table found, in reading order, so the list lines up
+    with the page's markdown table blocks. Tables with fewer than two columns
+    or no data are None: they are more likely ruled boxes than data, so
+    their text is left for the model.
+    """
+    words = page.get_text("words")
+    found = sorted(page.find_tables(strategy=TABLE_STRATEGY).tables,
+                   key=lambda t: (round(t.bbox[1]), t.bbox[0]))
+    tables = []
+    for table in found:
+        rows = [_cell_texts(row.cells, words) for row in table.rows]
+        if table.header.external:
+            header = _cell_texts(table.header.cells, words)
+        else:
+            header, rows = rows[0], rows[1:]
+        columns = _unique_names(header)
+        data = [{column: typed_value(text) for column, text in zip(columns, row)} for row in rows]
+        data = [row for row in data if any(value is not None for value in row.values())]
+        if len(columns) < 2 or not data:
+            tables.append(None)
+            continue
+        tables.append({
+            "title": _caption(table.bbox, words),
+            "page": page.number + 1,
+            "bbox": [round(v, 1) for v in table.bbox],
+            "columns": columns,
+            "column_types": column_types(columns, data),
+            "data": data,
+            "source": "native",
+        })
+    return tables
+
+
+def table_marker(table: Dict[str, Any]) -> str:
+    """One-line stand-in for an extracted table in the model prompt; its caption stays in the text."""
+    columns = table["columns"][:MARKER_COLUMNS]
+    more = len(table["columns"]) - len(columns)
+    names = ", ".join(columns) + (f" and {more} more" if more > 0 else "")
+    return (f"[Table {table['ref']}, page {table['page']}: already extracted, "
+            f"{len(table['data'])} rows; columns: {names}]")
+
+
+def replace_markdown_tables(markdown: str, tables: List[Optional[Dict[str, Any]]]) -> str:
+    """Replaces a page's markdown table blocks, in order, with the markers of its extracted tables.
+
+    Blocks whose table was not extracted are kept; extracted tables left
+    without a block (the two table finders disagreed) get their marker at
+    the end of the page, so the model still hears of them.
+    """
+    if not any(tables):
+        return markdown
+    out: List[str] = []
+    block = 0
+    in_block = False
+    for line in markdown.split("\n"):
+        if PIPE_LINE_RE.match(line):
+            if not in_block:
+                in_block = True
+                table = tables[block] if block < len(tables) else None
+                block += 1
+                keep = table is None
+                if not keep:
+                    out.append(table_marker(table))
+            if keep:
+                out.append(line)
+            continue
+        in_block = False
+        out.append(line)
+    leftover = [table_marker(t) for t in tables[block:] if t]
+    return "\n".join(out + leftover)
+
+
+def text_without_tables(page, tables: List[Optional[Dict[str, Any]]]) -> str:
+    """Plain page text with each extracted table's text replaced by its marker, in position."""
+    tables = [t for t in tables if t]
+    if not tables:
+        return page.get_text()
+    parts = []
+    for x0, y0, x1, y1, text, *_ in page.get_text("blocks"):
+        cx, cy = (x0 + x1) / 2, (y0 + y1) / 2
+        if not any(t["bbox"][0] <= cx <= t["bbox"][2] and t["bbox"][1] <= cy <= t["bbox"][3] for t in tables):
+            parts.append((y0, text))
+    parts += [(t["bbox"][1], table_marker(t) + "\n") for t in tables]
+    return "".join(text for _, text in sorted(parts, key=lambda part: part[0]))
+
+
+def table_text(tables: List[Dict[str, Any]]) -> str:
+    """Extracted tables as plain lines, for local passes (such as the gazetteer) over their cells."""
+    lines = []
+    for table in tables:
+        lines.append(" ".join(table["columns"]))
+        for row in table["data"]:
+            lines.append(" ".join(str(v) for v in row.values() if v is not None))
+    return "\n".join(lines)
+
+
+def merge_native_tables(result: Dict[str, Any], tables: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Puts extracted tables at the front of result["tables"], titled from the model's table_titles.
+
+    A table the model did not title keeps its caption, or is named after its page.
+    """
+    titles = {}
+    for entry in result.pop("table_titles", None) or []:
+        if isinstance(entry, dict) and entry.get("ref"):
+            titles[str(entry["ref"]).strip()] = entry
+    if not tables:
+        return result
+    native = []
+    for table in tables:
+        table = dict(table)
+        entry = titles.get(table["ref"], {})
+        table["title"] = entry.get("title") or table.get("title") or f"Table on page {table['page']}"
+        if entry.get("notes"):
+            table["notes"] = entry["notes"]
+        native.append(table)
+    result["tables"] = native + [t for t in result.get("tables") or [] if isinstance(t, dict)]
+    return result
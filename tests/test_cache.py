@@ -0,0 +1,70 @@
+import os
+
+import pytest
+
+import cache
+from cache import DiskCache
+
+
+@pytest.fixture
+def listings(monkeypatch):
+    """Counts directory scans made by eviction."""
+    calls = []
+    listdir = os.listdir
+
+    def counting(path):
+        calls.append(path)
+        return listdir(path)
+
+    monkeypatch.setattr(cache.os, "listdir", counting)
+    return calls
+
+
+def _sizes(disk_cache):
+    return sum(entry.stat().st_size for entry in os.scandir(disk_cache.cache_dir) if entry.name.endswith(".json"))
+
+
+def test_round_trip_and_hit_counts(tmp_path):
+    disk_cache = DiskCache(str(tmp_path), name="test")
+    assert disk_cache.get("k") is None
+    disk_cache.put("k", {"a": [1, 2]})
+    assert disk_cache.get("k") == {"a": [1, 2]}
+    stats = disk_cache.stats()
+    assert (stats["hits"], stats["misses"], stats["entries"]) == (1, 1, 1)
+
+
+def test_writes_under_budget_do_not_rescan(tmp_path, listings):
+    disk_cache = DiskCache(str(tmp_path), max_bytes=1_000_000, name="test")
+    for i in range(50):
+        disk_cache.put(f"k{i}", "x" * 100)
+    assert len(listings) == 1
+    assert disk_cache._bytes == _sizes(disk_cache)
+
+
+def test_overwrites_replace_the_old_size(tmp_path, listings):
+    disk_cache = DiskCache(str(tmp_path), max_bytes=1_000_000, name="test")
+    disk_cache.put("k", "x" * 1000)
+    disk_cache.put("k", "x" * 10)
+    assert disk_cache._bytes == _sizes(disk_cache)
+
+
+def test_going_over_budget_evicts_least_recently_used(tmp_path):
+    disk_cache = DiskCache(str(tmp_path), max_bytes=1000, name="test")
+    for i in range(4):
+        disk_cache.put(f"k{i}", "x" * 200)
+        os.utime(disk_cache._path(f"k{i}"), (i, i))
+    disk_cache.get("k0")
+    disk_cache.put("k4", "x" * 200)
+    assert disk_cache.get("k1") is None
+    assert disk_cache.get("k0") is not None
+    assert _sizes(disk_cache) <= 1000 * cache.EVICT_TO
+
+
+def test_scans_again_after_the_interval(tmp_path, listings, monkeypatch):
+    disk_cache = DiskCache(str(tmp_path), max_age=3600, name="test")
+    disk_cache.put("a", 1)
+    disk_cache.put("b", 2)
+    assert len(listings) == 1
+    monkeypatch.setattr(disk_cache, "_scanned_at", disk_cache._scanned_at - cache.EVICT_INTERVAL - 1)
+    disk_cache.put("c", 3)
+    assert len(listings) == 2
@@ -0,0 +1,88 @@
+from chunking import split_markdown, merge_extractions, merge_entities
+
+PAGE = "\n-----\n\n"
+
+
+def make_document(pages=30, edited=None):
+    texts = []
+    for i in range(pages):
+        body = f"Page {i} reports enrolment figures for district {i}. " * 12
+        if i == edited:
+            body = "A rewritten introduction. " + body
+        texts.append(f"## Section {i}\n\n{body}")
+    return PAGE.join(texts)
+
+
+def test_short_text_is_one_chunk():
+    assert split_markdown("# Title\n\nBody", 1000) == ["# Title\n\nBody"]
+    assert split_markdown("   \n", 1000) == []
+
+
+def test_chunks_respect_max_chars_and_keep_all_text():
+    text = make_document()
+    chunks = split_markdown(text, 2000)
+    assert len(chunks) > 1
+    assert all(len(chunk) <= 2000 for chunk in chunks)
+    for i in range(30):
+        assert any(f"district {i}." in chunk for chunk in chunks)
+
+
+def test_oversized_block_is_hard_split():
+    text = "x" * 5000
+    chunks = split_markdown(text, 1000)
+    assert all(len(chunk) <= 1000 for chunk in chunks)
+    assert "".join(chunks) == text
+
+
+def test_anchor_cuts_realign_after_an_edited_page():
+    before = split_markdown(make_document(), 2000)
+    after = split_markdown(make_document(edited=1), 2000)
+    assert before != after
+    # Chunks after the edit line up again, so their cached extractions are reused
+    assert before[-3:] == after[-3:]
+
+
+def test_merge_extractions_concatenates_lists_and_dedupes():
+    merged = merge_extractions([
+        {"summary": "First part.", "states_mentioned": ["Bihar", "Kerala"],
+         "key_statistics": [{"metric": "GER", "value": "98%"}]},
+        {"summary": "Second part.", "states_mentioned": ["bihar ", "Assam"],
+         "key_statistics": [{"metric": "ger", "value": "98%", "context": "2021"}]},
+    ])
+    assert merged["summary"] == "First part. Second part."
+    assert merged["states_mentioned"] == ["Bihar", "Kerala", "Assam"]
+    assert merged["key_statistics"] == [{"metric": "GER", "value": "98%"}]
+
+
+def test_merge_extractions_fills_dict_fields_and_scalars_first_seen():
+    merged = merge_extractions([
+        {"document_type": "", "budget_financials": {"total_budget": "", "currency": "INR"}},
+        {"document_type": "Statistical Report", "budget_financials": {"total_budget": "10 crore"}},
+        {"document_type": "Circular", "budget_financials": {"total_budget": "5 crore"}},
+    ])
+    assert merged["document_type"] == "Statistical Report"
+    assert merged["budget_financials"] == {"total_budget": "10 crore", "currency": "INR"}
+
+
+def test_merge_extractions_skips_empty_and_invalid_parts():
+    assert merge_extractions([{}, None, "oops"]) == {}
+    only = {"summary": "s"}
+    assert merge_extractions([{}, only]) is only
+
+
+def test_merge_table_titles_by_ref():
+    merged = merge_extractions([
+        {"table_titles": [{"ref": "T1", "title": "GER"}]},
+        {"table_titles": [{"ref": "T1", "title": "GER again"}, {"ref": "T2", "title": "Dropout"}]},
+    ])
+    assert [t["ref"] for t in merged["table_titles"]] == ["T1", "T2"]
+
+
+def test_merge_entities_drops_repeats():
+    entities = merge_entities([
+        [{"text": "Bihar", "label": "LOCATION"}, {"text": "NCERT", "label": "ORGANIZATION"}],
+        [{"text": "bihar", "label": "location"}, "junk", {"text": "Bihar", "label": "PERSON"}],
+        None,
+    ])
+    assert entities == [{"text": "Bihar", "label": "LOCATION"}, {"text": "NCERT", "label": "ORGANIZATION"},
+                         {"text": "Bihar", "label": "PERSON"}]
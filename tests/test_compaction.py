@@ -0,0 +1,90 @@
+import pytest
+
+import compaction
+from compaction import compact, count_tokens, truncate_to_tokens, chars_for_tokens, pack_to_budget
+
+PAGE = "\n-----\n\n"
+
+
+@pytest.fixture
+def estimated_tokens(monkeypatch):
+    """Token counts from the 4-characters-per-token estimate, whether or not tiktoken is installed."""
+    monkeypatch.setattr(compaction, "HAS_TIKTOKEN", False)
+    monkeypatch.setattr(compaction, "_ENCODING", None)
+
+
+@pytest.mark.parametrize("line", ["3", "Page 3", "page 12 of 40", "- 7 -", "(iv)", "xii", "[ 5 ]"])
+def test_page_number_lines_are_removed(line):
+    assert compact(f"Enrolment rose.\n{line}\nDropout fell.") == "Enrolment rose.\nDropout fell.\n"
+
+
+def test_lone_numbers_mid_page_are_kept():
+    # Plain-text table cells come out one per line
+    page = "Page 4\nState\nSchools\nYear\nGoa\n42\n17\n2020\nKerala\nEnd of table\nNotes\n- 4 -"
+    assert compact(page) == "State\nSchools\nYear\nGoa\n42\n17\n2020\nKerala\nEnd of table\nNotes\n"
+
+
+@pytest.mark.parametrize("line", ["Class 3 enrolment", "3.5% of schools", "Chapter 4 covers policy", "Kerala 95"])
+def test_lines_with_figures_are_kept(line):
+    assert line in compact(f"Intro.\n{line}\nOutro.")
+
+
+def test_toc_dot_leaders_are_removed():
+    assert compact("Contents\nChapter 1 Introduction ........ 4\nBody text") == "Contents\nBody text\n"
+
+
+DISTRICTS = ["Patna", "Gaya", "Nalanda", "Purnia", "Saran", "Siwan"]
+
+
+def test_running_headers_repeated_across_pages_are_removed():
+    # Digits are ignored when comparing, so headers carrying their page number still match
+    pages = [f"UDISE+ Report 2021-22 | Page {i}\n\nFindings for {name}.\n\nMinistry of Education"
+             for i, name in enumerate(DISTRICTS)]
+    result = compact(PAGE.join(pages))
+    assert "UDISE+ Report" not in result
+    assert "Ministry of Education" not in result
+    for name in DISTRICTS:
+        assert f"Findings for {name}." in result
+    assert result.count("-----") == len(DISTRICTS) - 1
+
+
+def test_lines_repeated_on_too_few_pages_are_kept():
+    pages = [f"Findings for {name}." for name in DISTRICTS]
+    pages[0] = pages[1] = "Draft for comment\n\n" + pages[0]
+    assert compact(PAGE.join(pages)).count("Draft for comment") == 2
+
+
+def test_repeated_headings_and_table_rows_are_kept():
+    pages = ["# Summary\n\n| State | GER |\n\nText {}".format(i) for i in range(4)]
+    result = compact(PAGE.join(pages))
+    assert result.count("# Summary") == 4
+    assert result.count("| State | GER |") == 4
+
+
+def test_duplicate_long_paragraphs_and_image_summaries_are_dropped():
+    paragraph = "This paragraph about school infrastructure is long enough to count as real content here."
+    text = (f"{paragraph}\n\nImage (p1): A bar chart of GER.\n\n-----\n\n"
+            f"{paragraph}\n\nImage (p2): A bar  chart of GER.\n\nShort line\n\nShort line")
+    result = compact(text)
+    assert result.count(paragraph) == 1
+    assert result.count("A bar chart of GER.") == 1
+    assert result.count("Short line") == 2
+
+
+def test_estimated_counts_and_truncation(estimated_tokens):
+    assert count_tokens("") == 0
+    assert count_tokens("abcde") == 2
+    assert truncate_to_tokens("abcdefghij", 2) == "abcdefgh"
+    assert chars_for_tokens("abcdefgh", 10) == 40
+
+
+def test_pack_to_budget_keeps_opening_and_dense_sections_in_order(estimated_tokens):
+    opening = "# Report\n\nAbout this report."
+    filler = "## Notes\n\n" + "and so on " * 20
+    figures = "## Figures\n\n| Bihar | 98.5 |\n| Kerala | 101.2 |\n| Assam | 87.0 |"
+    text = "\n".join([opening, filler, figures])
+    packed = pack_to_budget(text, count_tokens(opening) + count_tokens(figures) + 4)
+    assert packed.startswith("# Report")
+    assert "## Figures" in packed
+    assert "## Notes" not in packed
+    assert pack_to_budget(text, 10_000) == text
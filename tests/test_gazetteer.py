@@ -0,0 +1,104 @@
+import pytest
+
+from gazetteer import AhoCorasick, GazetteerExtractor, entity_category, clean_entity_text
+
+
+@pytest.fixture(scope="module")
+def gazetteer():
+    return GazetteerExtractor()
+
+
+def test_aho_corasick_finds_overlapping_patterns():
+    matcher = AhoCorasick()
+    for pattern in ("he", "she", "his", "hers"):
+        matcher.add(pattern, pattern)
+    found = sorted((start, end, value) for start, end, value in matcher.iter_matches("ushers"))
+    assert found == [(1, 4, "she"), (2, 4, "he"), (2, 6, "hers")]
+
+
+def test_aliases_map_to_canonical_names(gazetteer):
+    texts = [m["text"] for m in gazetteer.find("Schools in Orissa, Bombay and Pondicherry reopened.")]
+    assert texts == ["Odisha", "Mumbai", "Puducherry"]
+
+
+def test_longest_match_wins(gazetteer):
+    matches = gazetteer.find("The Department of Higher Education and the Ministry of Education met.")
+    assert [m["text"] for m in matches] == ["Department of Higher Education", "Ministry of Education"]
+
+
+def test_acronyms_only_match_with_exact_case(gazetteer):
+    assert [m["text"] for m in gazetteer.find("Affiliated to CBSE.")] == ["Central Board of Secondary Education"]
+    assert gazetteer.find("Affiliated to cbse.") == []
+    assert gazetteer.find("Enrolment went up in the hills.") == []
+
+
+def test_ambiguous_state_codes_need_another_state_on_the_line(gazetteer):
+    assert gazetteer.find("The local MP Smith opened the school.") == []
+    text = "Enrolment in UP rose.\nBihar, MP and Assam lagged."
+    assert [m["text"] for m in gazetteer.find(text)] == ["Bihar", "Madhya Pradesh", "Assam"]
+    # The line is left for the model, which can tell the two meanings apart
+    assert gazetteer.residual("MP Smith\n") == "MP Smith\n"
+
+
+def test_earlier_education_policies_are_not_nep_2020(gazetteer):
+    text = "Under the National Education Policy 1986 and NEP 2020"
+    assert [m["text"] for m in gazetteer.find(text)] == ["National Education Policy 2020"]
+    assert gazetteer.residual("National Education Policy 1986\n") == "National Education Policy 1986\n"
+
+
+def test_matches_need_word_boundaries(gazetteer):
+    # "Goa" inside "Goals" and "Kota" inside "Kotak" are not places
+    assert gazetteer.find("Goals for Kotak scholarships") == []
+
+
+def test_dates_are_matched(gazetteer):
+    matches = gazetteer.find("Issued on 15 August 2023 for the 2022-23 session.")
+    assert [(m["text"], m["label"]) for m in matches] == [("15 August 2023", "DATE"), ("2022-23", "DATE")]
+
+
+@pytest.mark.parametrize("text, dates", [
+    ("Notified on 01/04/2022 and 1-4-22.", ["01/04/2022", "1-4-22"]),
+    ("Notified on 01.04.2022.", ["01.04.2022"]),
+    ("See section 3.2.15 and clause 4.1.20.", []),
+])
+def test_numeric_dates(gazetteer, text, dates):
+    assert [m["text"] for m in gazetteer.find(text)] == dates
+
+
+def test_lookup_respects_acronym_case(gazetteer):
+    assert gazetteer.lookup(" Orissa. ")["canonical"] == "Odisha"
+    assert gazetteer.lookup("CBSE")["canonical"] == "Central Board of Secondary Education"
+    assert gazetteer.lookup("cbse") is None
+    assert gazetteer.lookup("UP", "state")["canonical"] == "Uttar Pradesh"
+    assert gazetteer.lookup("up", "state") is None
+    assert gazetteer.lookup("MP") is None
+    assert gazetteer.lookup("Atlantis") is None
+
+
+def test_state_in_returns_the_first_state(gazetteer):
+    assert gazetteer.state_in("GER in Patna district, Bihar and Kerala") == "Bihar"
+    assert gazetteer.state_in("National average") is None
+
+
+def test_extract_dedupes_in_order_of_first_mention(gazetteer):
+    entities = gazetteer.extract("Kerala leads; CBSE schools in Kerala and the Central Board of Secondary Education")
+    assert [(e["text"], e["label"]) for e in entities] == [
+        ("Kerala", "LOCATION"), ("Central Board of Secondary Education", "ORGANIZATION")]
+    assert all(e["source"] == "gazetteer" for e in entities)
+
+
+def test_residual_drops_lines_fully_explained_locally(gazetteer):
+    text = "| Bihar | 98.5% | 1,20,000 |\nDr. Sharma visited Patna.\n\n-----\n| Kerala | 101.2 |\n"
+    assert gazetteer.residual(text) == "Dr. Sharma visited Patna.\n\n-----\n"
+
+
+def test_entity_category_matches_whole_words():
+    assert entity_category("ORGANIZATION") == "organizations"
+    assert entity_category("GPE") == "locations"
+    assert entity_category("POLICY_SCHEME") == "other"
+    assert entity_category(None) == "other"
+
+
+def test_clean_entity_text():
+    assert clean_entity_text('  "Samagra   Shiksha", ') == "Samagra Shiksha"
+    assert clean_entity_text(None) == ""
@@ -0,0 +1,123 @@
+import types
+
+import pytest
+
+pytest.importorskip("dotenv")
+
+import groq_client
+from groq_client import (COMPLETION_TOKEN_ESTIMATE, IMAGE_TOKEN_ESTIMATE, GroqClient, RateLimiter, TokenBucket,
+                         estimate_tokens)
+
+
+class FakeClock:
+    """Stands in for time.monotonic and time.sleep, so waits pass instantly."""
+
+    def __init__(self):
+        self.now = 1000.0
+        self.slept = []
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.slept.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(groq_client.time, "monotonic", clock.monotonic)
+    monkeypatch.setattr(groq_client.time, "sleep", clock.sleep)
+    return clock
+
+
+def test_bucket_starts_full_and_refills_at_its_rate(clock):
+    bucket = TokenBucket(60)
+    assert bucket.wait_time(60, clock.now) == 0.0
+    bucket.take(60)
+    assert bucket.wait_time(1, clock.now) == pytest.approx(1.0)
+    assert bucket.wait_time(1, clock.now + 0.5) == pytest.approx(0.5)
+    assert bucket.wait_time(1, clock.now + 1) == 0.0
+
+
+def test_bucket_never_fills_past_capacity(clock):
+    bucket = TokenBucket(60)
+    bucket.wait_time(1, clock.now + 600)
+    assert bucket.level == 60
+
+
+def test_oversized_request_waits_for_a_full_bucket_only(clock):
+    bucket = TokenBucket(60)
+    bucket.take(30)
+    assert bucket.wait_time(1000, clock.now) == pytest.approx(30.0)
+
+
+def test_overdrawn_bucket_makes_later_callers_wait_longer(clock):
+    bucket = TokenBucket(60)
+    bucket.take(90)
+    assert bucket.level == -30
+    assert bucket.wait_time(10, clock.now) == pytest.approx(40.0)
+
+
+def test_limiter_waits_for_the_request_bucket(clock):
+    limiter = RateLimiter(rpm=2, tpm=0)
+    assert limiter.tokens is None
+    assert limiter.acquire(500) == 0.0
+    assert limiter.acquire(500) == 0.0
+    assert limiter.acquire(500) == pytest.approx(30.0)
+    assert clock.slept == [pytest.approx(30.0)]
+
+
+def test_limiter_waits_for_the_token_bucket(clock):
+    limiter = RateLimiter(rpm=0, tpm=600)
+    limiter.acquire(600)
+    assert limiter.acquire(100) == pytest.approx(10.0)
+
+
+def test_pause_holds_back_callers_with_room_left(clock):
+    limiter = RateLimiter(rpm=100, tpm=10000)
+    limiter.pause(5)
+    limiter.pause(2)
+    assert limiter.acquire(1) == pytest.approx(5.0)
+
+
+def test_settle_charges_the_difference_from_the_estimate(clock):
+    limiter = RateLimiter(rpm=0, tpm=600)
+    limiter.acquire(100)
+    limiter.settle(estimated=100, actual=300)
+    assert limiter.tokens.level == pytest.approx(300)
+    limiter.settle(estimated=300, actual=100)
+    assert limiter.tokens.level == pytest.approx(500)
+    RateLimiter(rpm=10, tpm=0).settle(100, 300)
+
+
+def test_estimate_counts_text_images_and_completion():
+    messages = [
+        {"role": "system", "content": "abcd"},
+        {"role": "user", "content": [{"type": "text", "text": "abcd"},
+                                     {"type": "image_url", "image_url": {"url": "data:"}}]},
+    ]
+    text_tokens = 2 * groq_client.count_tokens("abcd")
+    assert estimate_tokens(messages) == text_tokens + IMAGE_TOKEN_ESTIMATE + COMPLETION_TOKEN_ESTIMATE
+    assert estimate_tokens(messages, max_tokens=10) == text_tokens + IMAGE_TOKEN_ESTIMATE + 10
+
+
+def test_each_model_gets_its_own_limiter():
+    client = GroqClient(api_key="test", rpm=10, tpm=100)
+    assert client.limiter("a") is client.limiter("a")
+    assert client.limiter("a") is not client.limiter("b")
+
+
+def _error(retry_after=None):
+    headers = {} if retry_after is None else {"retry-after": retry_after}
+    return types.SimpleNamespace(status_code=429, response=types.SimpleNamespace(headers=headers))
+
+
+def test_backoff_is_capped_and_honours_retry_after(monkeypatch):
+    monkeypatch.setattr(groq_client.random, "uniform", lambda low, high: high)
+    client = GroqClient(api_key="test", backoff_base=1, backoff_max=8)
+    assert client._backoff(2, _error()) == 4
+    assert client._backoff(10, _error()) == 8
+    assert client._backoff(0, _error("20")) == 20
+    assert client._backoff(0, _error("soon")) == 1
@@ -0,0 +1,97 @@
+import threading
+import contextvars
+
+import pytest
+
+from stages import Stage, StageGraph
+
+
+def test_values_flow_between_stages():
+    graph = StageGraph([
+        Stage("double", lambda source: source * 2, ["source"]),
+        Stage("add", lambda double, source: double + source, ["double", "source"]),
+    ])
+    values = graph.run({"source": 5})
+    assert values["double"] == 10
+    assert values["add"] == 15
+    assert [t["stage"] for t in values["_stage_timings"]] == ["double", "add"]
+
+
+def test_independent_stages_overlap():
+    both_started = threading.Barrier(2, timeout=5)
+
+    def stage(source):
+        # Deadlocks (and times out) unless both stages run at once
+        both_started.wait()
+        return source
+
+    graph = StageGraph([Stage("a", stage, ["source"]), Stage("b", stage, ["source"])])
+    values = graph.run({"source": 1})
+    assert values["a"] == values["b"] == 1
+
+
+def test_duplicate_names_are_rejected():
+    with pytest.raises(ValueError, match="unique"):
+        StageGraph([Stage("a", lambda: 1), Stage("a", lambda: 2)])
+
+
+def test_unknown_input_is_rejected():
+    graph = StageGraph([Stage("a", lambda missing: missing, ["missing"])])
+    with pytest.raises(ValueError, match="unknown inputs"):
+        graph.run()
+
+
+def test_cycle_is_rejected_before_anything_runs():
+    ran = []
+    graph = StageGraph([
+        Stage("start", lambda: ran.append("start")),
+        Stage("a", lambda b: ran.append("a"), ["b"]),
+        Stage("b", lambda a: ran.append("b"), ["a"]),
+    ])
+    with pytest.raises(ValueError, match=r"cycle among: \['a', 'b'\]"):
+        graph.run()
+    assert ran == []
+
+
+def test_initial_values_count_as_completed_stages():
+    graph = StageGraph([
+        Stage("a", lambda: pytest.fail("a was given and must not run")),
+        Stage("b", lambda a: a + 1, ["a"]),
+    ])
+    assert graph.run({"a": 1})["b"] == 2
+
+
+def test_first_error_is_raised_and_dependents_never_start():
+    started = []
+
+    def fail():
+        raise RuntimeError("boom")
+
+    graph = StageGraph([
+        Stage("fail", fail),
+        Stage("after", lambda fail: started.append("after"), ["fail"]),
+    ])
+    with pytest.raises(RuntimeError, match="boom"):
+        graph.run()
+    assert started == []
+
+
+def test_cancel_stops_new_stages_and_calls_on_cancel():
+    cancel = threading.Event()
+    cancelled = []
+
+    def first():
+        cancel.set()
+        return 1
+
+    graph = StageGraph([Stage("first", first), Stage("second", lambda first: first, ["first"])])
+    values = graph.run(cancel_event=cancel, on_cancel=lambda: cancelled.append(True))
+    assert "second" not in values
+    assert cancelled == [True]
+
+
+def test_stages_see_the_callers_context_variables():
+    current = contextvars.ContextVar("current", default=None)
+    current.set("run-1")
+    graph = StageGraph([Stage("read", lambda: current.get())])
+    assert graph.run()["read"] == "run-1"
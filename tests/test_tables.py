@@ -0,0 +1,134 @@
+import pytest
+
+from tables import (MARKER_COLUMNS, column_types, merge_native_tables, replace_markdown_tables, table_marker,
+                    table_text, typed_value, _unique_names)
+
+
+def _table(ref="T1", page=1, columns=("State", "GER"), data=None, title=None):
+    data = data if data is not None else [{"State": "Bihar", "GER": 98.5}, {"State": "Kerala", "GER": 101.2}]
+    return {"ref": ref, "title": title, "page": page, "bbox": [50.0, 100.0, 300.0, 200.0],
+            "columns": list(columns), "column_types": column_types(list(columns), data),
+            "data": data, "source": "native"}
+
+
+@pytest.mark.parametrize("text, value", [
+    ("42", 42), ("-3", -3), ("+3", 3), ("78.5", 78.5), ("0", 0), ("0.5", 0.5),
+    ("10,000", 10000), ("1,20,000", 120000), (" 1,234.5 ", 1234.5),
+])
+def test_plain_numbers_are_typed(text, value):
+    assert typed_value(text) == value
+    assert type(typed_value(text)) is type(value)
+
+
+@pytest.mark.parametrize("text", ["007", "09120100101", "00.5", "-01", "12a", "45%", "1,2", "n/a"])
+def test_codes_and_annotated_figures_stay_text(text):
+    assert typed_value(text) == text
+
+
+def test_blank_cells_are_none_and_whitespace_is_collapsed():
+    assert typed_value(None) is None
+    assert typed_value("  \n ") is None
+    assert typed_value("Uttar\nPradesh ") == "Uttar Pradesh"
+
+
+def test_column_types_ignore_empty_cells():
+    data = [{"a": 1, "b": 1.5, "c": "x", "d": None}, {"a": None, "b": 2, "c": 3, "d": None}]
+    assert column_types(["a", "b", "c", "d"], data) == {"a": "int", "b": "float", "c": "text", "d": "text"}
+
+
+def test_unique_names_fill_blanks_and_suffix_repeats():
+    assert _unique_names(["State", None, " ", "Total", "Total", "Total"]) == [
+        "State", "column_2", "column_3", "Total", "Total_2", "Total_3"]
+    assert _unique_names(["Boys\nEnrolled", "column_1"]) == ["Boys Enrolled", "column_1"]
+
+
+def test_marker_names_the_table_and_truncates_columns():
+    assert table_marker(_table()) == "[Table T1, page 1: already extracted, 2 rows; columns: State, GER]"
+    columns = [f"c{i}" for i in range(MARKER_COLUMNS + 3)]
+    marker = table_marker(_table(columns=columns, data=[{"c0": 1}]))
+    assert f"c{MARKER_COLUMNS - 1} and 3 more]" in marker
+    assert f"c{MARKER_COLUMNS}," not in marker
+
+
+MARKDOWN = "\n".join([
+    "Table 1: Enrolment",
+    "|State|GER|",
+    "|---|---|",
+    "|Bihar|98.5|",
+    "",
+    "Between the tables.",
+    "|Box|",
+    "|---|",
+    "After.",
+])
+
+
+def test_extracted_blocks_become_markers_in_order():
+    result = replace_markdown_tables(MARKDOWN, [_table(), None]).split("\n")
+    assert result[:3] == ["Table 1: Enrolment", table_marker(_table()), ""]
+    # The second block was not extracted, so its text stays for the model
+    assert result[3:] == ["Between the tables.", "|Box|", "|---|", "After."]
+
+
+def test_tables_without_a_block_are_announced_at_the_end():
+    second = _table(ref="T2")
+    result = replace_markdown_tables(MARKDOWN, [None, None, second])
+    assert result == MARKDOWN + "\n" + table_marker(second)
+
+
+def test_pages_without_extracted_tables_are_untouched():
+    assert replace_markdown_tables(MARKDOWN, []) is MARKDOWN
+    assert replace_markdown_tables(MARKDOWN, [None, None]) is MARKDOWN
+
+
+def test_table_text_lists_headers_and_cells():
+    assert table_text([_table(data=[{"State": "Bihar", "GER": None}, {"State": "Goa", "GER": 99}])]) == (
+        "State GER\nBihar\nGoa 99")
+
+
+def test_native_tables_lead_and_take_the_model_titles():
+    tables = [_table("T1", title="Table 1: Enrolment"), _table("T2", page=4), _table("T3")]
+    result = {
+        "table_titles": [{"ref": " T2 ", "title": "Dropout by state", "notes": "Provisional"},
+                         {"ref": "T3"}, "junk", {"title": "no ref"}],
+        "tables": [{"title": "From the model"}, "junk"],
+    }
+    merged = merge_native_tables(result, tables)
+    assert "table_titles" not in merged
+    assert [t["title"] for t in merged["tables"]] == [
+        "Table 1: Enrolment", "Dropout by state", "Table on page 1", "From the model"]
+    assert merged["tables"][1]["notes"] == "Provisional"
+    # The extracted tables themselves are left as they were
+    assert tables[1]["title"] is None and "notes" not in tables[1]
+
+
+def test_merge_without_native_tables_only_drops_the_titles():
+    result = merge_native_tables({"table_titles": [], "tables": [{"title": "x"}]}, [])
+    assert result == {"tables": [{"title": "x"}]}
+
+
+def test_page_tables_reads_a_ruled_table():
+    fitz = pytest.importorskip("fitz")
+    from tables import page_tables
+
+    doc = fitz.open()
+    page = doc.new_page()
+    page.insert_text((50, 85), "Table 2: Schools by state", fontsize=10)
+    rows = [("State", "Schools", "UDISE code"), ("Bihar", "93,165", "09120100101"), ("Goa", "1,480", "")]
+    x_edges, y_edges = [50, 150, 250, 380], [100, 120, 140, 160]
+    for x in x_edges:
+        page.draw_line((x, y_edges[0]), (x, y_edges[-1]))
+    for y in y_edges:
+        page.draw_line((x_edges[0], y), (x_edges[-1], y))
+    for r, row in enumerate(rows):
+        for c, text in enumerate(row):
+            if text:
+                page.insert_text((x_edges[c] + 4, y_edges[r] + 14), text, fontsize=10)
+
+    [table] = page_tables(page)
+    assert table["title"] == "Table 2: Schools by state"
+    assert table["page"] == 1
+    assert table["columns"] == ["State", "Schools", "UDISE code"]
+    assert table["data"] == [{"State": "Bihar", "Schools": 93165, "UDISE code": "09120100101"},
+                             {"State": "Goa", "Schools": 1480, "UDISE code": None}]
+    assert table["column_types"] == {"State": "text", "Schools": "int", "UDISE code": "text"}
@@ -0,0 +1,141 @@
+import hashlib
+import io
+import os
+import threading
+
+import pytest
+
+from store import SessionStore
+from uploads import OffsetMismatch, UploadError, UploadManager
+
+DATA = b"%PDF-1.4 " + bytes(range(256)) * 40
+
+
+@pytest.fixture
+def store(tmp_path):
+    return SessionStore(str(tmp_path / "sessions.db"))
+
+
+@pytest.fixture
+def manager(store, tmp_path):
+    return UploadManager(store, str(tmp_path / "uploads"), max_bytes=len(DATA) * 2, chunk_bytes=1024)
+
+
+def _blobs(manager):
+    return os.listdir(manager.blob_dir)
+
+
+def test_save_stream_stores_a_blob_named_by_its_hash(manager, store):
+    info = manager.save_stream(io.BytesIO(DATA), "report.pdf")
+    file_hash = hashlib.sha256(DATA).hexdigest()
+    assert info["file_hash"] == file_hash
+    session = store.get_session(info["session_id"])
+    assert session["filename"] == "report.pdf"
+    with open(session["upload_path"], "rb") as f:
+        assert f.read() == DATA
+    assert _blobs(manager) == [f"{file_hash}.pdf"]
+    assert os.listdir(manager.partial_dir) == []
+
+
+def test_identical_uploads_share_one_blob(manager, store):
+    first = manager.save_stream(io.BytesIO(DATA), "a.pdf")
+    second = manager.save_stream(io.BytesIO(DATA), "b.pdf")
+    assert first["session_id"] != second["session_id"]
+    assert (store.get_session(first["session_id"])["upload_path"]
+            == store.get_session(second["session_id"])["upload_path"])
+    assert len(_blobs(manager)) == 1
+    assert not store.add_blob(first["file_hash"], "elsewhere.pdf", len(DATA))
+
+
+def test_oversized_stream_is_refused_and_cleaned_up(manager):
+    with pytest.raises(UploadError) as raised:
+        manager.save_stream(io.BytesIO(DATA * 3), "big.pdf")
+    assert raised.value.status == 413
+    assert os.listdir(manager.partial_dir) == []
+    assert _blobs(manager) == []
+
+
+def test_begin_checks_the_declared_size(manager):
+    with pytest.raises(UploadError) as raised:
+        manager.begin("big.pdf", len(DATA) * 3)
+    assert raised.value.status == 413
+    with pytest.raises(UploadError) as raised:
+        manager.begin("empty.pdf", 0)
+    assert raised.value.status == 400
+
+
+def test_chunked_upload_matches_a_single_request(manager):
+    upload = manager.begin("report.pdf", len(DATA))
+    assert upload["offset"] == 0 and upload["chunk_bytes"] == 1024
+    offset = 0
+    while offset < len(DATA):
+        reply = manager.write_chunk(upload["upload_id"], offset, io.BytesIO(DATA[offset:offset + 1024]))
+        offset = reply["offset"]
+    assert reply["file_hash"] == hashlib.sha256(DATA).hexdigest()
+    assert manager.status(upload["upload_id"])["session_id"] == reply["session_id"]
+
+
+def test_resume_after_a_dropped_chunk(manager, tmp_path):
+    upload = manager.begin("report.pdf", len(DATA))
+    upload_id = upload["upload_id"]
+    manager.write_chunk(upload_id, 0, io.BytesIO(DATA[:1000]))
+
+    # The client retries a chunk it already sent, then asks where to resume
+    with pytest.raises(OffsetMismatch) as raised:
+        manager.write_chunk(upload_id, 0, io.BytesIO(DATA[:1000]))
+    assert raised.value.status == 409 and raised.value.offset == 1000
+    assert manager.status(upload_id)["offset"] == 1000
+
+    # A restarted server has no running hash and rebuilds it from the partial file
+    restarted = UploadManager(manager.store, str(tmp_path / "uploads"), max_bytes=manager.max_bytes)
+    reply = restarted.write_chunk(upload_id, 1000, io.BytesIO(DATA[1000:]))
+    assert reply["offset"] == len(DATA)
+    assert reply["file_hash"] == hashlib.sha256(DATA).hexdigest()
+
+
+def test_repeated_final_chunk_returns_the_same_session(manager):
+    upload = manager.begin("report.pdf", len(DATA))
+    done = manager.write_chunk(upload["upload_id"], 0, io.BytesIO(DATA))
+    again = manager.write_chunk(upload["upload_id"], 0, io.BytesIO(DATA))
+    assert again["session_id"] == done["session_id"]
+    assert again["offset"] == len(DATA)
+
+
+def test_chunk_past_the_declared_size_is_refused(manager):
+    upload = manager.begin("report.pdf", 10)
+    with pytest.raises(UploadError) as raised:
+        manager.write_chunk(upload["upload_id"], 0, io.BytesIO(DATA[:11]))
+    assert raised.value.status == 413
+
+
+def test_unknown_and_expired_uploads(manager):
+    with pytest.raises(UploadError) as raised:
+        manager.status("missing")
+    assert raised.value.status == 404
+    upload = manager.begin("report.pdf", len(DATA))
+    os.remove(os.path.join(manager.partial_dir, f"{upload['upload_id']}.part"))
+    with pytest.raises(UploadError) as raised:
+        manager.status(upload["upload_id"])
+    assert raised.value.status == 410
+
+
+def test_sweep_does_not_delete_a_blob_being_reused(manager, store, monkeypatch):
+    first = manager.save_stream(io.BytesIO(DATA), "a.pdf")
+    # The only session is gone and the blob has not been used for ages, so it is due for sweeping
+    store.delete_session(first["session_id"])
+    store._execute("UPDATE blobs SET last_used = 0")
+
+    sweeps = []
+    add_blob = store.add_blob
+
+    def sweep_meanwhile(*args):
+        # The sweeper wakes up after the upload found the blob on disk but before it was linked
+        sweeps.append(threading.Thread(target=store.sweep))
+        sweeps[0].start()
+        sweeps[0].join(0.2)
+        return add_blob(*args)
+
+    monkeypatch.setattr(store, "add_blob", sweep_meanwhile)
+    second = manager.save_stream(io.BytesIO(DATA), "b.pdf")
+    sweeps[0].join()
+    assert os.path.exists(store.get_session(second["session_id"])["upload_path"])
@@ -0,0 +1,187 @@
+import os
+import uuid
+import hashlib
+import threading
+from typing import BinaryIO, Dict, Optional, Any, Tuple
+
+from store import SessionStore
+
+# Bytes read from a request body at a time
+READ_BLOCK_BYTES = 1024 * 1024
+
+
+class UploadError(Exception):
+    """Raised for an upload request the server cannot accept; status is the HTTP code to answer with."""
+
+    def __init__(self, message: str, status: int = 400):
+        super().__init__(message)
+        self.status = status
+
+
+class OffsetMismatch(UploadError):
+    """Raised when a chunk does not start where the stored data ends; offset is where to resume."""
+
+    def __init__(self, offset: int):
+        super().__init__(f"Upload is at byte {offset}", 409)
+        self.offset = offset
+
+
+def _copy_hashed(stream: BinaryIO, f: BinaryIO, digest, limit: int) -> int:
+    """Copies stream into f, feeding digest with exactly what was written. Returns the byte count.
+
+    Raises UploadError if the stream holds more than limit bytes.
+    """
+    written = 0
+    while True:
+        block = stream.read(READ_BLOCK_BYTES)
+        if not block:
+            return written
+        if written + len(block) > limit:
+            raise UploadError("Upload is larger than its declared size", 413)
+        f.write(block)
+        digest.update(block)
+        written += len(block)
+
+
+class UploadManager:
+    """Streams uploads to disk, hashing them on the way, and stores each distinct file once.
+
+    Files are kept as blobs named by their SHA-256 under upload_dir/blobs, so
+    sessions uploading the same bytes share one copy and the hash is known
+    without reading the file again. Large files can be sent in chunks with
+    begin() and write_chunk(); a dropped connection resumes from the offset
+    reported by status(), since everything received so far stays on disk.
+    """
+
+    def __init__(self, store: SessionStore, upload_dir: str, max_bytes: int,
+                 chunk_bytes: Optional[int] = None):
+        self.store = store
+        self.max_bytes = max_bytes
+        self.chunk_bytes = chunk_bytes or int(os.getenv("UPLOAD_CHUNK_BYTES", str(5 * 1024 * 1024)))
+        self.blob_dir = os.path.join(upload_dir, "blobs")
+        self.partial_dir = os.path.join(upload_dir, "partial")
+        for folder in (self.blob_dir, self.partial_dir):
+            os.makedirs(folder, exist_ok=True)
+        # Running hash and the offset it covers, per chunked upload in progress
+        self._digests: Dict[str, Tuple[Any, int]] = {}
+        self._locks: Dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+
+    def _commit(self, tmp_path: str, file_hash: str, size: int) -> str:
+        """Moves a fully received file into the blob store, or drops it if the blob exists."""
+        path = os.path.join(self.blob_dir, f"{file_hash}.pdf")
+        # Once add_blob refreshes last_used the sweeper leaves the blob alone; until then
+        # the store's blob lock keeps it from deleting the file found here
+        with self.store.blob_lock:
+            if os.path.exists(path):
+                os.remove(tmp_path)
+            else:
+                os.replace(tmp_path, path)
+            if not self.store.add_blob(file_hash, path, size):
+                print(f"Upload {file_hash[:12]} already stored, reusing it")
+        return path
+
+    def _create_session(self, filename: str, path: str, file_hash: str) -> Dict[str, Any]:
+        session_id = str(uuid.uuid4())
+        self.store.create_session(session_id, filename, path, file_hash)
+        return {"session_id": session_id, "filename": filename, "file_hash": file_hash}
+
+    def save_stream(self, stream: BinaryIO, filename: str) -> Dict[str, Any]:
+        """Stores a whole file sent in one request and opens a session for it."""
+        tmp_path = os.path.join(self.partial_dir, f"{uuid.uuid4().hex}.part")
+        digest = hashlib.sha256()
+        try:
+            with open(tmp_path, "wb") as f:
+                size = _copy_hashed(stream, f, digest, self.max_bytes)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        file_hash = digest.hexdigest()
+        return self._create_session(filename, self._commit(tmp_path, file_hash, size), file_hash)
+
+    def begin(self, filename: str, size: int) -> Dict[str, Any]:
+        """Opens a chunked upload of size bytes."""
+        if size <= 0:
+            raise UploadError("Upload size must be positive")
+        if size > self.max_bytes:
+            raise UploadError(f"File is larger than the {self.max_bytes // (1024 * 1024)}MB limit", 413)
+        upload_id = uuid.uuid4().hex
+        partial_path = os.path.join(self.partial_dir, f"{upload_id}.part")
+        open(partial_path, "wb").close()
+        self.store.create_upload(upload_id, filename, size, partial_path)
+        return {"upload_id": upload_id, "offset": 0, "size": size, "chunk_bytes": self.chunk_bytes}
+
+    def status(self, upload_id: str) -> Dict[str, Any]:
+        """Bytes received so far, and the session once the upload is complete."""
+        upload = self._get(upload_id)
+        status = {"upload_id": upload_id, "size": upload["size"], "chunk_bytes": self.chunk_bytes,
+                  "offset": upload["size"] if upload["session_id"] else self._received(upload)}
+        if upload["session_id"]:
+            status.update(self._session(upload))
+        return status
+
+    def write_chunk(self, upload_id: str, offset: int, stream: BinaryIO) -> Dict[str, Any]:
+        """Appends a chunk that starts at offset; finishes the upload when the last byte arrives."""
+        self._get(upload_id)
+        with self._upload_lock(upload_id):
+            upload = self._get(upload_id)
+            if upload["session_id"]:
+                # The final chunk was stored but its response was lost
+                return self.status(upload_id)
+            received = self._received(upload)
+            if offset != received:
+                raise OffsetMismatch(received)
+            digest = self._digest(upload, received)
+            try:
+                with open(upload["partial_path"], "ab") as f:
+                    received += _copy_hashed(stream, f, digest, upload["size"] - received)
+            finally:
+                # Whatever reached the file is hashed, even if the client went away mid-chunk
+                self._digests[upload_id] = (digest, self._received(upload))
+            if received < upload["size"]:
+                return {"upload_id": upload_id, "offset": received, "size": upload["size"]}
+            return self._finish(upload, digest)
+
+    def _finish(self, upload: Dict, digest) -> Dict[str, Any]:
+        file_hash = digest.hexdigest()
+        path = self._commit(upload["partial_path"], file_hash, upload["size"])
+        session = self._create_session(upload["filename"], path, file_hash)
+        self.store.finish_upload(upload["id"], session["session_id"])
+        with self._lock:
+            self._digests.pop(upload["id"], None)
+            self._locks.pop(upload["id"], None)
+        return {"upload_id": upload["id"], "offset": upload["size"], "size": upload["size"], **session}
+
+    def _get(self, upload_id: str) -> Dict[str, Any]:
+        upload = self.store.get_upload(upload_id)
+        if upload is None:
+            raise UploadError("Upload not found", 404)
+        return upload
+
+    def _session(self, upload: Dict) -> Dict[str, Any]:
+        record = self.store.get_session(upload["session_id"]) or {}
+        return {"session_id": upload["session_id"], "filename": upload["filename"],
+                "file_hash": record.get("file_hash")}
+
+    @staticmethod
+    def _received(upload: Dict) -> int:
+        try:
+            return os.path.getsize(upload["partial_path"])
+        except OSError:
+            raise UploadError("Upload expired", 410)
+
+    def _digest(self, upload: Dict, received: int):
+        """The running hash for an upload, rebuilt from disk if this process did not see every chunk."""
+        digest, covered = self._digests.get(upload["id"], (None, -1))
+        if covered == received:
+            return digest
+        digest = hashlib.sha256()
+        with open(upload["partial_path"], "rb") as f:
+            for block in iter(lambda: f.read(READ_BLOCK_BYTES), b""):
+                digest.update(block)
+        return digest
+
+    def _upload_lock(self, upload_id: str) -> threading.Lock:
+        with self._lock:
+            return self._locks.setdefault(upload_id, threading.Lock())